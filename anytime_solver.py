@@ -0,0 +1,185 @@
+import math
+import os
+import queue
+import random
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+from distance_matrix import tour_cost
+from local_search import candidate_neighbors, improve_tour
+
+# Anytime tour improvement for overnight planning: iterated local search that kicks
+# the current tour with a double-bridge move inside a short window, repairs it with
+# the 2-opt/Or-opt search around the changed edges only, and accepts worse tours
+# with an annealing probability that cools to zero at the deadline. Independent
+# runs with their own seeds share one distance matrix in shared memory, and every
+# improvement is reported to the parent at once, so the best tour so far is always
+# available, including after a Ctrl+C.
+
+# Cut points of a kick lie within this many positions of each other
+KICK_WINDOW = 50
+
+# Starting temperature as a share of the average edge of the initial tour
+START_TEMPERATURE = 0.05
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def double_bridge(tour, rng, window=KICK_WINDOW):
+    """
+    Double-bridge kick on an open tour (no repeated start): segments B and C
+    between three cut points close to a random position swap places. Returns
+    the new tour and the nodes at the four changed edges.
+    """
+    n = len(tour)
+    i = rng.randrange(n)
+    rotated = tour[i:] + tour[:i]
+    a, b, c = sorted(rng.sample(range(1, min(n, window)), 3))
+    kicked = rotated[:a] + rotated[b:c] + rotated[a:b] + rotated[c:]
+    touched = {rotated[a - 1], rotated[a], rotated[b - 1], rotated[b], rotated[c - 1], rotated[c]}
+    return kicked, list(touched)
+
+
+def anneal(order, D, deadline, seed=0, neighbors=None, report=None):
+    """
+    One seeded run from a closed order (first == last) until the wall-clock deadline
+    (time.time()). report(cost, order, iteration) is called whenever the run's best
+    improves. Returns (best order, best cost, iterations, trace), where trace lists
+    [seconds, iteration, best cost] at each improvement. A KeyboardInterrupt at any
+    point, the first local search included, ends the run with its best tour.
+    """
+    rng = random.Random(seed)
+    started = time.time()
+    start = order[0]
+    best, best_cost = list(order), tour_cost(order, D)
+    trace = [[0.0, 0, best_cost]]
+    iteration = 0
+    try:
+        if neighbors is None:
+            neighbors = candidate_neighbors(D)
+        current = improve_tour(order, D, neighbors=neighbors)
+        current_cost = tour_cost(current, D)
+        best, best_cost = current, current_cost
+        trace = [[round(time.time() - started, 3), 0, best_cost]]
+        if report is not None:
+            report(best_cost, best, 0)
+
+        n = len(current) - 1
+        if n < 8:
+            return best, best_cost, iteration, trace  # too few stops for a double bridge
+        temperature0 = START_TEMPERATURE * current_cost / n
+        while True:
+            now = time.time()
+            if now >= deadline:
+                break
+            iteration += 1
+            kicked, touched = double_bridge(current[:-1], rng)
+            candidate = improve_tour(kicked + [kicked[0]], D, neighbors=neighbors, active=touched)
+            i = candidate.index(start)
+            candidate = candidate[i:-1] + candidate[:i] + [start]
+            cost = tour_cost(candidate, D)
+
+            temperature = temperature0 * (deadline - now) / max(deadline - started, 1e-9)
+            delta = cost - current_cost
+            if delta < 0 or (temperature > 0 and rng.random() < math.exp(-delta / temperature)):
+                current, current_cost = candidate, cost
+                if cost < best_cost - 1e-6:
+                    best, best_cost = candidate, cost
+                    trace.append([round(time.time() - started, 3), iteration, best_cost])
+                    if report is not None:
+                        report(best_cost, best, iteration)
+    except KeyboardInterrupt:
+        pass  # stop early, keeping the best tour found
+    trace.append([round(time.time() - started, 3), iteration, best_cost])
+    return best, best_cost, iteration, trace
+
+
+def _init_worker(shm_name, n, improvements):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm  # keep the mapping alive for the lifetime of the worker
+    _worker["D"] = np.ndarray((n, n), dtype=np.float32, buffer=shm.buf)
+    _worker["improvements"] = improvements
+
+
+def _anneal_worker(run, order, seed, deadline):
+    improvements = _worker["improvements"]
+
+    def report(cost, best, iteration):
+        improvements.put((run, cost, best, iteration))
+    # anneal builds the candidate lists itself, where a Ctrl+C is caught
+    return anneal(order, _worker["D"], deadline, seed, report=report)
+
+
+def solve_anytime(D, order, time_limit, workers=None, seed=0, on_improve=None):
+    """
+    Improve a closed order of positions into D for time_limit seconds with one
+    seeded run per worker process. on_improve(cost, order, seconds) is called in
+    this process each time the overall best improves. Returns (best order, best
+    cost, runs) where runs holds each returned run's seed, iterations, best cost
+    and convergence trace. Ctrl+C ends the search early with the best tour so far;
+    a run lost to the interrupt is left out of runs.
+    """
+    deadline = time.time() + time_limit
+    started = time.time()
+    workers = workers or os.cpu_count() or 1
+    best = [list(order), tour_cost(order, D)]
+
+    def improved(cost, tour):
+        if cost < best[1] - 1e-6:
+            best[0], best[1] = list(tour), cost
+            if on_improve is not None:
+                on_improve(cost, best[0], time.time() - started)
+
+    if workers <= 1:
+        tour, cost, iterations, trace = anneal(order, D, deadline, seed,
+                                               report=lambda cost, tour, _: improved(cost, tour))
+        improved(cost, tour)
+        return best[0], best[1], [{"seed": seed, "iterations": iterations, "best_cost": cost, "trace": trace}]
+
+    n = len(D)
+    shm = shared_memory.SharedMemory(create=True, size=max(n * n, 1) * np.dtype(np.float32).itemsize)
+    improvements = multiprocessing.Queue()
+    try:
+        shared = np.ndarray((n, n), dtype=np.float32, buffer=shm.buf)
+        shared[:] = D
+        shared = None  # drop the view so the block can be closed
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shm.name, n, improvements)) as pool:
+            futures = [pool.submit(_anneal_worker, run, list(order), seed + run, deadline)
+                       for run in range(workers)]
+            try:
+                while not all(f.done() for f in futures):
+                    try:
+                        _, cost, tour, _ = improvements.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    improved(cost, tour)
+            except KeyboardInterrupt:
+                pass  # the workers stop on the same interrupt and return their best
+            # Drain what is left so no worker blocks on a full pipe at shutdown
+            try:
+                while True:
+                    try:
+                        _, cost, tour, _ = improvements.get(timeout=0.1)
+                    except queue.Empty:
+                        break
+                    improved(cost, tour)
+            except KeyboardInterrupt:
+                pass
+            runs = []
+            for run, f in enumerate(futures):
+                try:
+                    tour, cost, iterations, trace = f.result()
+                except (KeyboardInterrupt, BrokenProcessPool):
+                    continue  # an interrupted or lost run; what it reported is already in best
+                improved(cost, tour)
+                runs.append({"seed": seed + run, "iterations": iterations, "best_cost": cost, "trace": trace})
+        return best[0], best[1], runs
+    finally:
+        improvements.close()
+        shm.close()
+        shm.unlink()
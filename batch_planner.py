@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from distance_matrix import compute_distance_matrix
+from matrix_cache import MatrixRowCache
+from contraction_hierarchy import read_hierarchy
+from tour_planner import PlannerSession, solve, tour_distance_time
+from travel_time import objective_matrix
+
+# Non-interactive batch entry point for scheduled jobs. Reads one instance per JSONL
+# line, in the same shape route_service.py accepts:
+#   {"id": "...", "hq": 1, "deliveries": [...], "priorities": {"<node>": 1-10},
+#    "algorithm": "greedy", "optimize": true, "time_weight": 0}
+# solves the instances across a process pool and writes one JSONL result per
+# instance as soon as it finishes (so not necessarily in input order). With a
+# time_weight above 0 the tour minimizes driving time (1) or a mix of time and
+# distance, so the result carries cost and initial_cost in those units in place of
+# cost_m and initial_cost_m, plus the tour's distance_m and time_s.
+
+# Instances read ahead of the pool, per worker
+QUEUE_PER_WORKER = 2
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+def _init_worker(graph, index_path, cache_dir):
+    _worker["graph"] = graph
+    _worker["index"] = read_hierarchy(index_path) if index_path else None
+    _worker["cache"] = MatrixRowCache(graph, cache_dir) if cache_dir and index_path is None else None
+
+
+def solve_instance(line_no, instance, default_hq):
+    """Solve one instance in a worker. Returns the result record (with "error" on bad input)."""
+    start = time.perf_counter()
+    result = {"id": instance.get("id", line_no) if isinstance(instance, dict) else line_no}
+    try:
+        if not isinstance(instance, dict):
+            raise ValueError("instance must be a JSON object")
+        hq = int(instance.get("hq", default_hq))
+        stops = [int(node) for node in instance["deliveries"]]
+        algorithm = instance.get("algorithm", "greedy")
+        priorities = {int(k): v for k, v in instance.get("priorities", {}).items()}
+        priority_map = {node: priorities.get(node, 1) for node in stops}
+        priority_map[hq] = 0
+        time_weight = float(instance.get("time_weight", 0))
+
+        try:
+            D = compute_distance_matrix(_worker["graph"], [hq] + stops, workers=1, cache=_worker["cache"],
+                                        index=_worker["index"], travel_time=time_weight > 0)
+        except KeyError as e:
+            raise ValueError(f"node {e.args[0]} is not in the graph")
+        D_length, T = D if time_weight > 0 else (D, None)
+        D = objective_matrix(D_length, T, time_weight)
+        matrix_done = time.perf_counter()
+
+        tour, cost, initial_cost = solve(hq, stops, D, algorithm, priority_map, instance.get("optimize", True))
+        done = time.perf_counter()
+        result.update({
+            "tour": tour,
+            "cost_m": cost,
+            "initial_cost_m": initial_cost,
+            "algorithm": algorithm,
+            "stops": len(stops),
+            "matrix_ms": round((matrix_done - start) * 1000, 2),
+            "solve_ms": round((done - matrix_done) * 1000, 2),
+        })
+        if T is not None:
+            meters, seconds = tour_distance_time(hq, stops, tour, D_length, T)
+            result["cost"] = result.pop("cost_m")
+            result["initial_cost"] = result.pop("initial_cost_m")
+            result.update({"time_weight": time_weight, "distance_m": meters, "time_s": seconds})
+    except (ValueError, KeyError, TypeError) as e:
+        result["error"] = str(e) if not isinstance(e, KeyError) else f"missing field {e.args[0]!r}"
+    return result
+
+
+def read_instances(f):
+    """Yield (line number, instance) for each non-blank line; unparsable lines yield their error text."""
+    for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, f"invalid JSON: {e}"
+
+
+def run_batch(instances, out, graph, default_hq, workers=None, index=None, cache_dir=None):
+    """
+    Solve (line number, instance) pairs across a process pool, writing each result
+    as one JSON line to out as soon as it is ready. Only a few instances per worker
+    are read ahead, so arbitrarily long inputs stream through. Returns (solved, failed).
+    """
+    workers = workers or os.cpu_count() or 1
+    solved = failed = 0
+
+    def collect(done):
+        for future in done:
+            instance_id = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:  # a crashed solve fails its own instance, not the batch
+                result = {"id": instance_id, "error": repr(e)}
+            emit(result)
+
+    def emit(result):
+        nonlocal solved, failed
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        if "error" in result:
+            failed += 1
+        else:
+            solved += 1
+
+    index_path = index.path if index is not None else None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(graph, index_path, cache_dir)) as pool:
+        pending = {}  # future -> instance id
+        for line_no, instance in instances:
+            if isinstance(instance, str):
+                emit({"id": line_no, "error": instance})
+                continue
+            instance_id = instance.get("id", line_no) if isinstance(instance, dict) else line_no
+            pending[pool.submit(solve_instance, line_no, instance, default_hq)] = instance_id
+            if len(pending) >= workers * QUEUE_PER_WORKER:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        while pending:
+            collect(wait(pending, return_when=FIRST_COMPLETED).done)
+    return solved, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a JSONL stream of delivery instances without prompts.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of instances ('-' for stdin)")
+    parser.add_argument("--output", default="-", help="JSONL file for the results ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="solver processes (default: CPU count)")
+    parser.add_argument("--no-index", action="store_true",
+                        help="ignore the contraction hierarchy index and run plain Dijkstra searches")
+    parser.add_argument("--cache-dir", default=".matrix_cache",
+                        help="on-disk row cache used without the index ('' to disable)")
+    args = parser.parse_args()
+
+    # Loading messages go to stderr so stdout carries nothing but result lines
+    session = PlannerSession(use_index=not args.no_index)
+    with redirect_stdout(sys.stderr):
+        graph, index = session.graph, session.index
+    start = time.perf_counter()
+    src = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        solved, failed = run_batch(read_instances(src), out, graph, session.hq_node,
+                                   args.workers, index, args.cache_dir)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"{solved} instance(s) solved, {failed} failed in {time.perf_counter() - start:.1f} s", file=sys.stderr)
@@ -0,0 +1,262 @@
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from graph_artifact import RoadGraph, load_road_graph, read_graph_artifact, write_graph_artifact
+from distance_matrix import compute_distance_matrix, tour_cost
+
+import tour_planner
+
+# Benchmark harness for the tour builders: seeded synthetic road graphs at growing
+# sizes plus the real delivery lists. Each phase (load, matrix, construct, cost)
+# is timed, construction peak memory is traced and the results are written as JSON
+# so runs from different versions can be compared with --compare.
+
+DEFAULT_SIZES = (20, 50, 100, 200, 500, 1000, 2000, 5000)
+REAL_SETS = ("delivery_nodes_20", "delivery_nodes_200")
+GRID_SPACING_M = 100.0
+METERS_PER_DEGREE = 111320.0
+
+# Synthetic grids are laid out around this (lat, lon) in central Karachi, so they
+# need no prepared data; their lengths do not depend on it
+GRID_ORIGIN = (24.8607, 67.0011)
+
+# Speed classes (km/h) drawn per street when perturbed_grid is asked for travel times
+GRID_SPEEDS_KPH = (20.0, 30.0, 50.0)
+
+# A construct time this many times slower than the baseline is reported as a regression,
+# unless the difference is below MIN_REGRESSION_S (timer noise on tiny instances)
+REGRESSION_RATIO = 1.2
+MIN_REGRESSION_S = 0.001
+DEFAULT_REPEAT = 3
+
+# Delivery data for the real instances, read on first use
+session = tour_planner.PlannerSession()
+
+ALGORITHMS = {
+    "random": lambda hq, stops, G, D, priority_map: tour_planner.random_tour(hq, stops, D),
+    "mst": lambda hq, stops, G, D, priority_map: tour_planner.mst_tour(hq, stops, D),
+    "priority": lambda hq, stops, G, D, priority_map:
+        tour_planner.priority_based_tour(hq, stops, D, priority_map),
+    "dijkstra": lambda hq, stops, G, D, priority_map: tour_planner.dijkstra_tsp_tour(hq, stops, G, D),
+}
+
+
+def perturbed_grid(side, seed=0, drop=0.15, origin=GRID_ORIGIN, spacing=GRID_SPACING_M,
+                   names=False, times=False, isolated=0):
+    """
+    Road-like test graph: a side x side grid of jittered intersections with its
+    corner at origin (lat, lon), edge lengths 0-30% longer than the straight line,
+    and a share of the north-south streets removed. Every east-west street and the
+    first column are kept, so the graph stays connected. Node IDs are 1..side*side,
+    followed by `isolated` extra nodes joined only to each other by spacing-long
+    roads. names=True names the streets ("Street <column>", "Avenue <row>") and
+    times=True draws a speed from GRID_SPEEDS_KPH per street for its travel time.
+    """
+    rng = np.random.default_rng(seed)
+    lat0, lon0 = origin
+    n = side * side
+    gy, gx = np.divmod(np.arange(n), side)
+    ym = (gy + rng.uniform(-0.3, 0.3, n)) * spacing
+    xm = (gx + rng.uniform(-0.3, 0.3, n)) * spacing
+
+    idx = np.arange(n).reshape(side, side)
+    east = np.stack([idx[:, :-1].ravel(), idx[:, 1:].ravel()], axis=1)
+    north = np.stack([idx[:-1, :].ravel(), idx[1:, :].ravel()], axis=1)
+    keep = (rng.random(len(north)) >= drop) | (north[:, 0] % side == 0)
+    edges = np.concatenate([east, north[keep]])
+
+    straight = np.hypot(xm[edges[:, 0]] - xm[edges[:, 1]], ym[edges[:, 0]] - ym[edges[:, 1]])
+    lengths = straight * rng.uniform(1.0, 1.3, len(edges))
+    if names:
+        names = [f"Street {u % side}" if v - u == 1 else f"Avenue {u // side}" for u, v in edges.tolist()]
+
+    if isolated:
+        extra = np.arange(n, n + isolated)
+        xm = np.concatenate([xm, -10 * spacing - spacing * np.arange(isolated)])
+        ym = np.concatenate([ym, np.full(isolated, -10 * spacing)])
+        pairs = np.stack([extra[:-1], extra[1:]], axis=1)
+        edges = np.concatenate([edges, pairs])
+        lengths = np.concatenate([lengths, np.full(len(pairs), spacing)])
+        if names:
+            names += [""] * len(pairs)
+        n += isolated
+
+    seconds = lengths * 3.6 / rng.choice(GRID_SPEEDS_KPH, len(edges)) if times else None
+    return RoadGraph.from_edges(
+        np.arange(1, n + 1),
+        lon0 + xm / (METERS_PER_DEGREE * math.cos(math.radians(lat0))),
+        lat0 + ym / METERS_PER_DEGREE,
+        np.concatenate([edges[:, 0], edges[:, 1]]),
+        np.concatenate([edges[:, 1], edges[:, 0]]),
+        np.concatenate([lengths, lengths]),
+        names=names * 2 if names else None,
+        times=np.concatenate([seconds, seconds]) if times else None,
+    )
+
+
+def _peak_mb(fn, *args):
+    """Peak Python heap allocation (MB) while running fn."""
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    finally:
+        tracemalloc.stop()
+
+
+def run_instance(graph_name, G, load_s, hq, stops, seed, workers=None, trace_memory=True,
+                 repeat=DEFAULT_REPEAT):
+    """Benchmark every algorithm on one instance (best of repeat runs). Returns a result record."""
+    nodes = [hq] + stops
+    start = time.perf_counter()
+    D = compute_distance_matrix(G, nodes, workers=workers)
+    matrix_s = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    priority_map = {node: rng.randint(1, 10) for node in stops}
+    priority_map[hq] = 0
+    position = {node: i for i, node in enumerate(nodes)}
+
+    algorithms = {}
+    for name, build in ALGORITHMS.items():
+        construct_s = float("inf")
+        for _ in range(repeat):
+            random.seed(seed)
+            start = time.perf_counter()
+            tour, _ = build(hq, stops, G, D, priority_map)
+            construct_s = min(construct_s, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        cost = tour_cost([position[node] for node in tour], D)
+        cost_s = time.perf_counter() - start
+
+        result = {"construct_s": round(construct_s, 6), "cost_s": round(cost_s, 6), "cost_m": round(cost, 1)}
+        if trace_memory:
+            random.seed(seed)
+            result["peak_mb"] = round(_peak_mb(build, hq, stops, G, D, priority_map), 3)
+        algorithms[name] = result
+        print(f"  {graph_name:>22} {len(stops):>5} stops  {name:<9} "
+              f"{construct_s * 1000:9.1f} ms  {cost / 1000:10.2f} km")
+
+    return {
+        "graph": graph_name,
+        "graph_nodes": G.num_nodes,
+        "stops": len(stops),
+        "load_s": round(load_s, 6),
+        "matrix_s": round(matrix_s, 6),
+        "matrix_mb": round(D.nbytes / 1024 ** 2, 3),
+        "algorithms": algorithms,
+    }
+
+
+def synthetic_results(sizes, seed, workers, trace_memory, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            side = max(30, math.ceil(math.sqrt(4 * (size + 1))))
+            G = perturbed_grid(side, seed)
+
+            # Load through the same artifact path tour_planner.py uses
+            path = os.path.join(tmp, f"grid-{side}.csr")
+            write_graph_artifact(G, path)
+            start = time.perf_counter()
+            G = read_graph_artifact(path)
+            load_s = time.perf_counter() - start
+
+            rng = random.Random(seed + size)
+            hq = (side // 2) * side + side // 2 + 1
+            stops = rng.sample([node for node in range(1, side * side + 1) if node != hq], size)
+            results.append(run_instance(f"grid-{side}x{side}-s{seed}", G, load_s, hq, stops,
+                                        seed, workers, trace_memory, repeat))
+    return results
+
+
+def real_results(seed, workers, trace_memory, repeat):
+    start = time.perf_counter()
+    G = load_road_graph("karachi_graph.graphml")
+    load_s = time.perf_counter() - start
+    results = []
+    for key in REAL_SETS:
+        if key not in session.data:
+            continue
+        stops = session.delivery_list(key)
+        results.append(run_instance(f"karachi:{key}", G, load_s, session.hq_node, stops,
+                                    seed, workers, trace_memory, repeat))
+    return results
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def compare(report, baseline):
+    """Print construct-time ratios and cost changes against an earlier report."""
+    old = {(r["graph"], r["stops"], name): a
+           for r in baseline["results"] for name, a in r["algorithms"].items()}
+    regressions = 0
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for r in report["results"]:
+        for name, a in r["algorithms"].items():
+            before = old.get((r["graph"], r["stops"], name))
+            if before is None:
+                continue
+            ratio = a["construct_s"] / before["construct_s"] if before["construct_s"] else 1.0
+            cost_change = 100 * (a["cost_m"] / before["cost_m"] - 1) if before["cost_m"] else 0.0
+            flag = ""
+            slower = a["construct_s"] - before["construct_s"] > MIN_REGRESSION_S
+            if (ratio > REGRESSION_RATIO and slower) or cost_change > 0.05:
+                flag = "  <-- regression"
+                regressions += 1
+            print(f"  {r['graph']:>22} {r['stops']:>5} {name:<9} time x{ratio:5.2f}  cost {cost_change:+6.2f}%{flag}")
+    print(f"{regressions} regression(s)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the tour algorithms across instance sizes.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated stop counts for the synthetic graphs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes for the distance matrix")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per algorithm (best kept)")
+    parser.add_argument("--no-real", action="store_true", help="skip the delivery_nodes_20/200 sets")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak-memory runs")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the JSON report")
+    parser.add_argument("--compare", default=None, help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = []
+    if not args.no_real:
+        results += real_results(args.seed, args.workers, not args.no_memory, args.repeat)
+    results += synthetic_results(sizes, args.seed, args.workers, not args.no_memory, args.repeat)
+
+    report = {
+        "commit": _git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
@@ -0,0 +1,168 @@
+import math
+import numpy as np
+from local_search import improve_tour
+import instrumentation
+
+# Cluster-first planning for days with tens of thousands of stops. The stops are cut
+# into geographic clusters (consecutive runs along a Hilbert curve, or k-means
+# started from those runs), every cluster is solved on its own small matrix, and the
+# cluster tours are chained in the order of a tour over the cluster centres from HQ.
+# Each cluster tour is opened where it best joins its neighbours, and a local search
+# started around every junction repairs the seams with road distances. Work per
+# cluster is bounded, so the total grows about linearly with the number of stops.
+
+DEFAULT_CLUSTER_SIZE = 250
+
+# Grid resolution of the Hilbert curve: 2^16 cells per side
+HILBERT_ORDER = 16
+
+KMEANS_ITERATIONS = 15
+
+# Centres considered for each stop per k-means step: those nearest its current one
+KMEANS_CANDIDATES = 8
+
+# Stops on either side of a junction that the boundary repair starts from
+BOUNDARY_WINDOW = 15
+
+
+def hilbert_keys(px, py, order=HILBERT_ORDER):
+    """Position of each point along a Hilbert curve over the points' bounding square."""
+    px = np.asarray(px, dtype=np.float64)
+    py = np.asarray(py, dtype=np.float64)
+    side = 1 << order
+    if not len(px):
+        return np.zeros(0, dtype=np.int64)
+    span = max(px.max() - px.min(), py.max() - py.min(), 1e-9)
+    x = ((px - px.min()) / span * (side - 1)).astype(np.int64)
+    y = ((py - py.min()) / span * (side - 1)).astype(np.int64)
+    keys = np.zeros(len(x), dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = ((x & s) > 0).astype(np.int64)
+        ry = ((y & s) > 0).astype(np.int64)
+        keys += s * s * ((3 * rx) ^ ry)
+        # Rotate the quadrant so the curve inside it has the standard orientation
+        flip = (ry == 0) & (rx == 1)
+        x = np.where(flip, side - 1 - x, x)
+        y = np.where(flip, side - 1 - y, y)
+        swap = ry == 0
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return keys
+
+
+def hilbert_clusters(px, py, size=DEFAULT_CLUSTER_SIZE):
+    """Split points into runs of about size consecutive points along the Hilbert curve."""
+    n = len(px)
+    if n == 0:
+        return []
+    order = np.argsort(hilbert_keys(px, py), kind="stable")
+    return np.array_split(order, math.ceil(n / size))
+
+
+def kmeans_clusters(px, py, size=DEFAULT_CLUSTER_SIZE, iterations=KMEANS_ITERATIONS):
+    """
+    Lloyd's k-means with about size points per cluster, started from the Hilbert
+    runs so the result is deterministic. Each step compares a point only with the
+    centres nearest its current one, which keeps a step linear in the point count.
+    Clusters that grow past twice the size are split again along the curve.
+    """
+    px = np.asarray(px, dtype=np.float64)
+    py = np.asarray(py, dtype=np.float64)
+    groups = hilbert_clusters(px, py, size)
+    k = len(groups)
+    if k <= 1:
+        return groups
+    n = len(px)
+    labels = np.empty(n, dtype=np.int64)
+    for c, group in enumerate(groups):
+        labels[group] = c
+    cx = np.array([px[group].mean() for group in groups])
+    cy = np.array([py[group].mean() for group in groups])
+    m = min(KMEANS_CANDIDATES, k)
+    rows = np.arange(n)
+    for _ in range(iterations):
+        between = (cx[:, None] - cx[None, :]) ** 2 + (cy[:, None] - cy[None, :]) ** 2
+        near = np.argsort(between, axis=1, kind="stable")[:, :m]
+        candidates = near[labels]
+        dist = (px[:, None] - cx[candidates]) ** 2 + (py[:, None] - cy[candidates]) ** 2
+        assigned = candidates[rows, np.argmin(dist, axis=1)]
+        if np.array_equal(assigned, labels):
+            break
+        labels = assigned
+        counts = np.bincount(labels, minlength=k)
+        filled = counts > 0  # an emptied cluster keeps its old centre
+        cx[filled] = np.bincount(labels, weights=px, minlength=k)[filled] / counts[filled]
+        cy[filled] = np.bincount(labels, weights=py, minlength=k)[filled] / counts[filled]
+
+    order = np.argsort(labels, kind="stable")
+    clusters = []
+    for group in np.split(order, np.cumsum(np.bincount(labels, minlength=k))[:-1]):
+        if len(group) > 2 * size:
+            clusters.extend(group[part] for part in hilbert_clusters(px[group], py[group], size))
+        elif len(group):
+            clusters.append(group)
+    return clusters
+
+
+def cluster_order(px, py, clusters, start):
+    """
+    Visiting order of the clusters: a 2-opt/Or-opt tour over their centres by
+    straight line, starting and ending at the point start, begun from the Hilbert
+    order of the centres. Returns cluster numbers in visiting order.
+    """
+    cx = np.array([start[0]] + [np.mean(px[c]) for c in clusters])
+    cy = np.array([start[1]] + [np.mean(py[c]) for c in clusters])
+    W = np.hypot(cx[:, None] - cx[None, :], cy[:, None] - cy[None, :])
+    initial = [0] + (np.argsort(hilbert_keys(cx[1:], cy[1:]), kind="stable") + 1).tolist() + [0]
+    return [i - 1 for i in improve_tour(initial, W)[1:-1]]
+
+
+def open_cycle(cycle, edges, px, py, before, after):
+    """
+    Open a closed cluster tour (first == last) into a path between the points
+    before and after: drop the tour edge, and pick the direction, that minimizes
+    the straight-line joins minus the road length saved. edges[i] is the length
+    of the edge from cycle[i] to cycle[i + 1]. Returns the path.
+    """
+    m = len(cycle) - 1
+    if m <= 1:
+        return list(cycle[:m])
+    ring = np.asarray(cycle[:m])
+    succ = np.roll(ring, -1)
+    # Forward: enter at the successor of the dropped edge, leave at its start
+    forward = (np.hypot(px[succ] - before[0], py[succ] - before[1])
+               + np.hypot(px[ring] - after[0], py[ring] - after[1]))
+    backward = (np.hypot(px[ring] - before[0], py[ring] - before[1])
+                + np.hypot(px[succ] - after[0], py[succ] - after[1]))
+    saved = np.asarray(edges, dtype=np.float64)
+    i_f = int(np.argmin(forward - saved))
+    i_b = int(np.argmin(backward - saved))
+    path = ring.tolist()
+    if forward[i_f] - saved[i_f] <= backward[i_b] - saved[i_b]:
+        return path[i_f + 1:] + path[:i_f + 1]
+    return (path[i_b + 1:] + path[:i_b + 1])[::-1]
+
+
+def repair_boundaries(order, D, junctions, window=BOUNDARY_WINDOW, k=10):
+    """
+    Local search around the seams of a stitched tour. order is closed over the
+    positions of a SparseDistances D; junctions are indices into order where one
+    cluster's path ends and the next begins. The stops within window positions of
+    a junction get their k nearest stops by straight line as extra candidates
+    (across cluster borders), and 2-opt/Or-opt runs from them only.
+    """
+    n = len(order) - 1
+    active = set()
+    for j in junctions:
+        active.update(order[max(j - window, 0):min(j + window, n)])
+    active = sorted(active)
+    k = min(k, len(D) - 1)
+    with instrumentation.phase("clusters: boundary candidates"):
+        us, vs = [], []
+        for a in active:
+            for b in (D.grid.nearest(a, k) if k > 0 else []):
+                us.append(a)
+                vs.append(b)
+        D.add_pairs(us, vs)
+    return improve_tour(order, D, active=active)
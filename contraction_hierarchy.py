@@ -0,0 +1,345 @@
+import argparse
+import os
+import time
+from heapq import heapify, heappush, heappop
+import numpy as np
+from graph_artifact import graph_fingerprint, load_road_graph, map_array_file, read_array_file_header, write_array_file
+import instrumentation
+
+# Contraction-hierarchy index over the (undirected) road graph, saved next to the
+# graph artifact as karachi_graph.ch. Nodes are contracted one at a time in order of
+# importance; shortcuts keep shortest distances between the remaining nodes. A query
+# then only searches upwards in rank from both ends, which touches a few hundred
+# nodes instead of most of the network.
+CH_MAGIC = b"MLTPCH01"
+CH_VERSION = 2  # 2: travel times on every upward edge
+
+# Witness searches give up after settling this many nodes (a few extra shortcuts,
+# but a much faster build)
+WITNESS_SETTLE_LIMIT = 60
+
+INF = float('inf')
+
+
+class ContractionHierarchy:
+    """Upward graph of a contraction hierarchy in CSR form.
+
+    up_offsets[i]:up_offsets[i+1] indexes the edges from node index i to nodes of
+    higher rank, original edges and shortcuts alike. up_via is the contracted node a
+    shortcut bypasses (-1 for an original road edge). up_times holds the driving
+    seconds along each edge's road path.
+    """
+
+    def __init__(self, rank, up_offsets, up_neighbors, up_weights, up_via, fingerprint, path=None,
+                 up_times=None):
+        self.rank = rank
+        self.up_offsets = up_offsets
+        self.up_neighbors = up_neighbors
+        self.up_weights = up_weights
+        self.up_via = up_via
+        self.up_times = up_times
+        self.fingerprint = fingerprint
+        self.path = path
+        self._lists = None
+        self._time_list = None
+
+    @property
+    def num_nodes(self):
+        return len(self.rank)
+
+    @property
+    def num_shortcuts(self):
+        return int(np.count_nonzero(np.asarray(self.up_via) >= 0))
+
+    def _upward_lists(self):
+        if self._lists is None:
+            self._lists = (self.up_offsets.tolist(), self.up_neighbors.tolist(), self.up_weights.tolist())
+        return self._lists
+
+    def upward_search(self, source, travel_time=False):
+        """
+        Distances from a node index to the nodes its upward search settles: {index: dist}.
+        Stall-on-demand: a node reached more cheaply through a higher-ranked neighbour
+        cannot be on a shortest up-down path, so it is neither expanded nor returned.
+        With travel_time=True also returns {index: seconds} along the same paths.
+        """
+        offsets, neighbors, weights = self._upward_lists()
+        times = self._upward_times() if travel_time else None
+        dist = {source: 0.0}
+        seconds = {source: 0.0}
+        heap = [(0.0, source)]
+        space = {}
+        while heap:
+            d, u = heappop(heap)
+            if d > dist[u] or u in space:
+                continue
+            edges = range(offsets[u], offsets[u + 1])
+            # The graph is undirected, so u's upward edges are also the downward edges into u
+            if any(dist.get(neighbors[k], INF) + weights[k] < d for k in edges):
+                continue
+            space[u] = d
+            for k in edges:
+                v = neighbors[k]
+                nd = d + weights[k]
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    heappush(heap, (nd, v))
+                    if times is not None:
+                        seconds[v] = seconds[u] + times[k]
+        instrumentation.add("hierarchy nodes settled", len(space))
+        if travel_time:
+            return space, {u: seconds[u] for u in space}
+        return space
+
+    def _upward_times(self):
+        if self._time_list is None:
+            if self.up_times is None:
+                raise ValueError("this hierarchy index has no travel times; rebuild it")
+            self._time_list = self.up_times.tolist()
+        return self._time_list
+
+    def distance(self, source, target):
+        """Road distance between two node indices (inf if no path), by a bidirectional upward search."""
+        if source == target:
+            return 0.0
+        offsets, neighbors, weights = self._upward_lists()
+        dist = ({source: 0.0}, {target: 0.0})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        best = INF
+        side = 0
+        while heaps[0] or heaps[1]:
+            if not heaps[side]:
+                side = 1 - side
+            d, u = heappop(heaps[side])
+            if d >= best:
+                heaps[side].clear()  # nothing cheaper left in this direction
+                continue
+            if d > dist[side][u]:
+                continue
+            other = dist[1 - side].get(u)
+            if other is not None and d + other < best:
+                best = d + other
+            edges = range(offsets[u], offsets[u + 1])
+            if any(dist[side].get(neighbors[k], INF) + weights[k] < d for k in edges):
+                side = 1 - side
+                continue  # stalled, see upward_search
+            for k in edges:
+                v = neighbors[k]
+                nd = d + weights[k]
+                if nd < dist[side].get(v, INF):
+                    dist[side][v] = nd
+                    heappush(heaps[side], (nd, v))
+            side = 1 - side
+        return best
+
+    def matrix(self, sources, travel_time=False):
+        """
+        Many-to-many distances between node indices (float64, inf = unreachable).
+        Each node's upward search space is computed once and stored in per-node
+        buckets; row i is then the minimum over the meeting nodes of search i.
+        With travel_time=True returns (D, T), T holding the driving seconds along
+        the shortest path of each pair, taken from the same meeting node.
+        """
+        m = len(sources)
+        spaces = []
+        for s in sources:
+            if travel_time:
+                space, seconds = self.upward_search(int(s), travel_time=True)
+            else:
+                space, seconds = self.upward_search(int(s)), {}
+            spaces.append((np.fromiter(space.keys(), dtype=np.int64, count=len(space)),
+                           np.fromiter(space.values(), dtype=np.float64, count=len(space)),
+                           np.fromiter(seconds.values(), dtype=np.float64, count=len(seconds))))
+        instrumentation.add("hierarchy searches", m)
+        if not m:
+            return (np.zeros((0, 0)), np.zeros((0, 0))) if travel_time else np.zeros((0, 0))
+
+        # Buckets: for every node, the (target, distance) pairs whose search reached it
+        b_nodes = np.concatenate([nodes for nodes, _, _ in spaces])
+        b_dist = np.concatenate([dist for _, dist, _ in spaces])
+        b_target = np.repeat(np.arange(m), [len(nodes) for nodes, _, _ in spaces])
+        order = np.argsort(b_nodes, kind="stable")
+        b_nodes, b_dist, b_target = b_nodes[order], b_dist[order], b_target[order]
+        b_start = np.searchsorted(b_nodes, np.arange(self.num_nodes + 1))
+        if travel_time:
+            b_time = np.concatenate([seconds for _, _, seconds in spaces])[order]
+
+        D = np.full((m, m), np.inf)
+        T = np.full((m, m), np.inf) if travel_time else None
+        for i, (nodes, dist, seconds) in enumerate(spaces):
+            starts = b_start[nodes]
+            counts = b_start[nodes + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                continue
+            # Flat indices of every bucket entry at the nodes this search settled
+            first = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+            idx = first + np.arange(total)
+            lengths = np.repeat(dist, counts) + b_dist[idx]
+            if not travel_time:
+                np.minimum.at(D[i], b_target[idx], lengths)
+                continue
+            # Shortest meeting node per target, and the time along that path
+            targets = b_target[idx]
+            best = np.lexsort((lengths, targets))
+            firsts = best[np.flatnonzero(np.diff(targets[best], prepend=-1))]
+            D[i, targets[firsts]] = lengths[firsts]
+            T[i, targets[firsts]] = np.repeat(seconds, counts)[firsts] + b_time[idx][firsts]
+        return (D, T) if travel_time else D
+
+
+def _witness_distances(adj, source, excluded, limit, max_settled):
+    """Bounded Dijkstra from source that never passes through excluded."""
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    while heap and settled < max_settled:
+        d, u = heappop(heap)
+        if d > dist[u]:
+            continue
+        if d > limit:
+            break
+        settled += 1
+        for v, (w, _, _) in adj[u].items():
+            if v == excluded:
+                continue
+            nd = d + w
+            if nd < dist.get(v, INF):
+                dist[v] = nd
+                heappush(heap, (nd, v))
+    return dist
+
+
+def _shortcuts_for(adj, v, max_settled):
+    """Shortcuts (u, x, length, seconds) needed to keep distances when v is removed."""
+    nbrs = list(adj[v].items())
+    shortcuts = []
+    for i, (u, (wu, tu, _)) in enumerate(nbrs[:-1]):
+        rest = nbrs[i + 1:]
+        limit = wu + max(wx for _, (wx, _, _) in rest)
+        dist = _witness_distances(adj, u, v, limit, max_settled)
+        for x, (wx, tx, _) in rest:
+            if dist.get(x, INF) > wu + wx:
+                shortcuts.append((u, x, wu + wx, tu + tx))
+    return shortcuts
+
+
+def build_hierarchy(graph, max_settled=WITNESS_SETTLE_LIMIT):
+    """
+    Contract every node of a RoadGraph, least important first (edge difference plus
+    the number of already-contracted neighbours, updated lazily). Returns a
+    ContractionHierarchy.
+    """
+    n = graph.num_nodes
+    offsets, neighbors, lengths = graph.adjacency_lists()
+    times = graph.time_list()
+    adj = [{} for _ in range(n)]  # remaining graph: node -> {neighbor: (length, seconds, via)}
+    for u in range(n):
+        for k in range(offsets[u], offsets[u + 1]):
+            v = neighbors[k]
+            if v != u and (v not in adj[u] or lengths[k] < adj[u][v][0]):
+                adj[u][v] = (lengths[k], times[k], -1)
+
+    deleted = [0] * n
+    heap = [(len(_shortcuts_for(adj, v, max_settled)) - len(adj[v]), v) for v in range(n)]
+    heapify(heap)
+    rank = np.full(n, -1, dtype=np.int32)
+    upward = [None] * n
+    next_rank = 0
+    while heap:
+        _, v = heappop(heap)
+        if rank[v] >= 0:
+            continue
+        shortcuts = _shortcuts_for(adj, v, max_settled)
+        priority = len(shortcuts) - len(adj[v]) + deleted[v]
+        if heap and priority > heap[0][0]:
+            heappush(heap, (priority, v))
+            continue
+
+        rank[v] = next_rank
+        next_rank += 1
+        upward[v] = [(u, w, t, via) for u, (w, t, via) in adj[v].items()]
+        for u in adj[v]:
+            del adj[u][v]
+            deleted[u] += 1
+        for u, x, w, t in shortcuts:
+            if x not in adj[u] or w < adj[u][x][0]:
+                adj[u][x] = (w, t, v)
+                adj[x][u] = (w, t, v)
+        adj[v] = {}
+
+    counts = np.array([len(edges) for edges in upward], dtype=np.int64)
+    up_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=up_offsets[1:])
+    flat = [edge for edges in upward for edge in edges]
+    return ContractionHierarchy(
+        rank,
+        up_offsets,
+        np.array([u for u, _, _, _ in flat], dtype=np.int32),
+        np.array([w for _, w, _, _ in flat], dtype=np.float64),
+        np.array([via for _, _, _, via in flat], dtype=np.int32),
+        graph_fingerprint(graph),
+        up_times=np.array([t for _, _, t, _ in flat], dtype=np.float64),
+    )
+
+
+def hierarchy_path(graph):
+    """Default index file for a graph: next to its artifact, with a .ch extension."""
+    if graph.path is not None:
+        return os.path.splitext(graph.path)[0] + ".ch"
+    return "karachi_graph.ch"
+
+
+def write_hierarchy(index, filename):
+    header = {"version": CH_VERSION, "num_nodes": index.num_nodes, "fingerprint": index.fingerprint}
+    arrays = {
+        "rank": np.ascontiguousarray(index.rank, dtype=np.int32),
+        "up_offsets": np.ascontiguousarray(index.up_offsets, dtype=np.int64),
+        "up_neighbors": np.ascontiguousarray(index.up_neighbors, dtype=np.int32),
+        "up_weights": np.ascontiguousarray(index.up_weights, dtype=np.float64),
+        "up_via": np.ascontiguousarray(index.up_via, dtype=np.int32),
+        "up_times": np.ascontiguousarray(index.up_times, dtype=np.float64),
+    }
+    return write_array_file(filename, CH_MAGIC, header, arrays)
+
+
+def read_hierarchy(filename):
+    """Memory-map a saved index."""
+    header, arrays = map_array_file(filename, CH_MAGIC)
+    return ContractionHierarchy(arrays["rank"], arrays["up_offsets"], arrays["up_neighbors"],
+                                arrays["up_weights"], arrays["up_via"], header["fingerprint"],
+                                path=os.path.abspath(filename), up_times=arrays["up_times"])
+
+
+def load_hierarchy(graph, filename=None):
+    """Return the saved index for this exact graph, or None if it is missing or stale."""
+    filename = filename or hierarchy_path(graph)
+    header, _ = read_array_file_header(filename, CH_MAGIC)
+    if header is None or header.get("version") != CH_VERSION:
+        return None
+    if header.get("fingerprint") != graph_fingerprint(graph):
+        print(f"Ignoring {filename}: it was built for a different graph")
+        return None
+    with instrumentation.phase("load: map hierarchy index"):
+        return read_hierarchy(filename)
+
+
+def build_and_save(graph, filename=None):
+    """Build the index for a graph and write it next to the graph artifact."""
+    filename = filename or hierarchy_path(graph)
+    start = time.perf_counter()
+    with instrumentation.phase("hierarchy: contract nodes"):
+        index = build_hierarchy(graph)
+    with instrumentation.phase("hierarchy: write index"):
+        write_hierarchy(index, filename)
+    print(f"Contraction hierarchy: {index.num_shortcuts} shortcuts over {graph.num_edges // 2} roads, "
+          f"built in {time.perf_counter() - start:.1f} s -> {filename}")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the contraction-hierarchy index for the road graph.")
+    parser.add_argument("graphml", nargs="?", default="karachi_graph.graphml")
+    parser.add_argument("--output", default=None, help="index file (default: next to the graph artifact)")
+    args = parser.parse_args()
+    build_and_save(load_road_graph(args.graphml), args.output)
@@ -1,6 +1,21 @@
-import osmnx as ox
-import networkx as nx
+import argparse
 import json
+import sys
+from graph_artifact import RoadGraph, read_graph_artifact, write_graph_artifact
+from contraction_hierarchy import build_and_save
+import instrumentation
+
+parser = argparse.ArgumentParser(description="Build the road graph and delivery data around the HQ.")
+parser.add_argument("--osm", default=None,
+                    help="build offline from a local .osm XML extract instead of downloading from Overpass")
+parser.add_argument("--target-nodes", type=int, default=10000, help="number of nodes in the graph")
+parser.add_argument("--no-hierarchy", action="store_true",
+                    help="skip building the contraction-hierarchy index (karachi_graph.ch)")
+parser.add_argument("--profile", nargs="?", const="data_prep_profile.json", default=None,
+                    help="time each build phase and write a report (default: data_prep_profile.json)")
+args = parser.parse_args()
+if args.profile:
+    instrumentation.enable()
 
 # 1. Define HQ coordinates
 hq_latitude, hq_longitude = 24.83804595801298, 67.08121751599609
@@ -9,20 +24,59 @@ hq_address = "Iqra University - Main Campus, Karachi, Pakistan"
 print(f"HQ Location: {hq_address}")
 print(f"Latitude: {hq_latitude}, Longitude: {hq_longitude}")
 
+target_node_count = args.target_nodes
+
+# Offline import: stream the extract, grow the region around the HQ and write
+# karachi_graph.graphml and karachi_graph.csr directly, without networkx copies
+if args.osm:
+    from osm_import import import_osm_extract
+
+    hq_node, region, num_edges = import_osm_extract(args.osm, hq_latitude, hq_longitude, target_node_count)
+    delivery_info = {
+        "hq_node": 1,
+        "delivery_nodes": list(range(2, len(region) + 1)),
+        "hq_coordinates": (hq_latitude, hq_longitude),
+        "hq_address": hq_address
+    }
+    with open("delivery_nodes.json", "w") as f:
+        json.dump(delivery_info, f, indent=2)
+
+    print(f"HQ Node ID (Original): {hq_node}")
+    print(f"HQ Node ID (Simplified): 1")
+    print(f"Number of Delivery Nodes: {len(region) - 1}")
+    print(f"Total Nodes in Graph: {len(region)} (HQ + Deliveries)")
+    print(f"Number of Edges: {num_edges}")
+    print(f"Files created:")
+    print(f"  - karachi_graph.graphml (node IDs 1-{len(region)}, edge IDs edge1-edge{num_edges})")
+    print(f"  - karachi_graph.csr (CSR adjacency, lengths in meters, memory-mapped by tour_planner.py)")
+    if not args.no_hierarchy:
+        print(f"  - karachi_graph.ch (contraction-hierarchy index for fast distance queries)")
+    print(f"  - delivery_nodes.json (node mapping and delivery info)")
+    print("✓ Graph is connected - good for TSP/routing algorithms")
+    if not args.no_hierarchy:
+        build_and_save(read_graph_artifact("karachi_graph.csr"))
+    if args.profile:
+        instrumentation.write_report(args.profile)
+    sys.exit(0)
+
+import osmnx as ox
+import networkx as nx
+
 # 2. Download road network
 radius = 1000  # Start radius
-target_node_count = 10000
 max_attempts = 10
 
 for attempt in range(max_attempts):
     print(f"Attempt {attempt+1}: Fetching graph within {radius} meters")
-    G = ox.graph_from_point(
-        (hq_latitude, hq_longitude),
-        dist=radius,
-        network_type="drive",
-        simplify=True,
-        retain_all=False
-    )
+    with instrumentation.phase("download: Overpass"):
+        G = ox.graph_from_point(
+            (hq_latitude, hq_longitude),
+            dist=radius,
+            network_type="drive",
+            simplify=True,
+            retain_all=False
+        )
+    instrumentation.add("download attempts")
 
     # 3. Convert to undirected for traversal (but keep as MultiGraph for OSMnx compatibility)
     G_undir = G.to_undirected()
@@ -31,7 +85,8 @@ for attempt in range(max_attempts):
     hq_node = ox.distance.nearest_nodes(G, hq_longitude, hq_latitude)
 
     # 5. Build BFS tree from HQ to get connected 100 nodes
-    bfs_nodes = list(nx.bfs_tree(G_undir, hq_node).nodes())
+    with instrumentation.phase("bfs region"):
+        bfs_nodes = list(nx.bfs_tree(G_undir, hq_node).nodes())
     if len(bfs_nodes) >= target_node_count:
         selected_nodes = bfs_nodes[:target_node_count]
         
@@ -79,7 +134,8 @@ def clean_graph_data(graph):
                 del edge_data[attr]
 
 # Clean the graph data
-clean_graph_data(G)
+with instrumentation.phase("clean attributes"):
+    clean_graph_data(G)
 
 # Save graph using NetworkX (skip this for now, use manual method instead)
 # nx.write_graphml(G, "karachi_hq_area.graphml")
@@ -147,7 +203,8 @@ def create_clean_graphml(graph, hq_node, filename="clean_karachi_graph.graphml")
     return clean_graph, node_mapping
 
 # Create clean GraphML
-clean_graph, node_mapping = create_clean_graphml(G, hq_node)
+with instrumentation.phase("renumber nodes"):
+    clean_graph, node_mapping = create_clean_graphml(G, hq_node)
 
 # Create manual GraphML with proper edge IDs for yEd compatibility
 def create_manual_graphml(graph, filename="karachi_graph.graphml"):
@@ -221,7 +278,16 @@ def create_manual_graphml(graph, filename="karachi_graph.graphml"):
         f.write('</graphml>\n')
 
 # Create the manual GraphML
-create_manual_graphml(clean_graph)
+with instrumentation.phase("write GraphML"):
+    create_manual_graphml(clean_graph)
+
+# Compile the same graph into a memory-mappable CSR artifact for tour_planner.py
+with instrumentation.phase("write graph artifact"):
+    write_graph_artifact(RoadGraph.from_networkx(clean_graph), "karachi_graph.csr", source="karachi_graph.graphml")
+
+# Precompute the contraction hierarchy so tour_planner.py answers distance queries from it
+if not args.no_hierarchy:
+    build_and_save(read_graph_artifact("karachi_graph.csr"))
 
 # 8. Save delivery info using only the new IDs
 delivery_info = {
@@ -244,6 +310,9 @@ print(f"Files created:")
 print(f"  - karachi_hq_area.graphml (original node IDs)")
 print(f"  - clean_karachi_graph.graphml (simplified node IDs 1-{len(G.nodes())})")
 print(f"  - manual_karachi_graph.graphml (manually formatted with unique edge IDs)")
+print(f"  - karachi_graph.csr (CSR adjacency, lengths in meters, memory-mapped by tour_planner.py)")
+if not args.no_hierarchy:
+    print(f"  - karachi_graph.ch (contraction-hierarchy index for fast distance queries)")
 print(f"  - delivery_nodes.json (node mapping and delivery info)")
 print(f"\nRecommended file for yEd: manual_karachi_graph.graphml")
 print(f"  - Node IDs: 1, 2, 3, ..., {len(clean_graph.nodes())}")
@@ -257,4 +326,7 @@ else:
     print("⚠ Warning: Graph has disconnected components")
     components = list(nx.connected_components(G))
     print(f"  Number of components: {len(components)}")
-    print(f"  Largest component size: {len(max(components, key=len))}")
\ No newline at end of file
+    print(f"  Largest component size: {len(max(components, key=len))}")
+
+if args.profile:
+    instrumentation.write_report(args.profile)
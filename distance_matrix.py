@@ -0,0 +1,186 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from routing import dijkstra, path_edges
+import instrumentation
+
+# Distance used for unreachable pairs instead of infinity (keeps sums finite)
+UNREACHABLE = 1e9
+
+# Below this many sources per worker the pool start-up costs more than it saves
+MIN_ROWS_PER_WORKER = 16
+ROWS_PER_TASK = 8
+
+# Per-process state set up by _init_worker
+_worker = {}
+
+
+class PredecessorTrees:
+    """Shortest-path trees kept by compute_distance_matrix(..., predecessors=True).
+
+    pred[i, v] is the CSR position of the last edge on the shortest path from
+    sources[i] to node index v (-1 for the source itself and nodes not reached).
+    int32 per graph node and source, so a 200-stop matrix over 10,000 nodes keeps 8 MB.
+    """
+
+    def __init__(self, graph, sources, pred):
+        self.graph = graph
+        self.sources = sources
+        self.pred = pred
+
+    def path(self, a, b):
+        """Edges (CSR positions) of the road path between positions a and b, without a new search."""
+        return path_edges(self.graph, self.pred[a], self.sources[a], self.sources[b])
+
+
+def _init_worker(graph, blocks, sources, cache, profiling=False):
+    if profiling:
+        instrumentation.enable()
+    instrumentation.take_counters()  # drop counts inherited from a forked parent
+    _worker["graph"] = graph
+    _worker["sources"] = sources
+    _worker["cache"] = cache
+    _worker["shm"] = []  # keep the mappings alive for the lifetime of the worker
+    _worker["outputs"] = {}
+    for name, (shm_name, shape, dtype) in blocks.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker["shm"].append(shm)
+        _worker["outputs"][name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _gather_row(full_row, sources):
+    row = np.array([full_row[t] for t in sources], dtype=np.float64)
+    row[np.isinf(row)] = UNREACHABLE
+    return row
+
+
+def _fill_rows(graph, sources, outputs, rows, cache=None):
+    """Run one search per row and write the distances to the other sources into outputs["matrix"].
+
+    With a cache the search runs over the whole graph so the full row can be
+    stored and reused by any later delivery list. If outputs has "pred" or
+    "times", the same search also fills pred[i] with its predecessor edges and
+    times[i] with the driving seconds along the shortest paths.
+    """
+    targets = None if cache is not None else set(sources)
+    pred, times = outputs.get("pred"), outputs.get("times")
+    for i in rows:
+        result = dijkstra(graph, sources[i], targets=targets,
+                          predecessors=pred is not None, travel_time=times is not None)
+        if pred is None and times is None:
+            dist = result
+        else:
+            dist, *extras = result
+            if pred is not None:
+                pred[i] = extras.pop(0)
+            if times is not None:
+                times[i] = _gather_row(extras.pop(0), sources)
+        if cache is not None:
+            cache.put(sources[i], dist)
+        outputs["matrix"][i] = _gather_row(dist, sources)
+
+
+def _fill_rows_worker(rows):
+    _fill_rows(_worker["graph"], _worker["sources"], _worker["outputs"], rows, _worker["cache"])
+    return instrumentation.take_counters()
+
+
+def compute_distance_matrix(graph, nodes, workers=None, cache=None, index=None, predecessors=False,
+                            travel_time=False):
+    """Compute all-pairs road distances for the given node IDs.
+
+    Returns a dense float32 array where D[i, j] is the distance from nodes[i] to
+    nodes[j]. Sources are spread across a process pool that writes straight into
+    a shared-memory matrix. With a MatrixRowCache, rows already on disk are read
+    from their memory maps and only the missing sources are searched. With a
+    ContractionHierarchy index the whole matrix comes from its bucket query
+    instead, and neither the pool nor the cache is used.
+
+    With predecessors=True every row is searched (the index and cached rows hold
+    no paths) and a PredecessorTrees is returned with D, so tours can be expanded
+    to street level later without new searches.
+
+    With travel_time=True a float32 matrix T of driving seconds along each
+    shortest path comes back too, from the same searches (or the same hierarchy
+    query); cached rows hold no times, so they are not read. The return value is
+    D, (D, T), (D, trees) or (D, T, trees).
+    """
+    sources = graph.indices(nodes).tolist()
+    n = len(sources)
+    if index is not None and not predecessors:
+        with instrumentation.phase("matrix: hierarchy query"):
+            result = index.matrix(sources, travel_time=True) if travel_time else (index.matrix(sources),)
+        result = tuple(M.astype(np.float32) for M in result)
+        for M in result:
+            M[np.isinf(M)] = UNREACHABLE
+        return result if travel_time else result[0]
+    gather = np.asarray(sources, dtype=np.int64)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    shapes = {"matrix": ((n, n), np.float32)}
+    if travel_time:
+        shapes["times"] = ((n, n), np.float32)
+    if predecessors:
+        shapes["pred"] = ((n, graph.num_nodes), np.int32)
+    shared = n and workers > 1 and n // MIN_ROWS_PER_WORKER > 1
+    blocks = {}
+    outputs = {}
+    for name, (shape, dtype) in shapes.items():
+        if shared:
+            blocks[name] = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)), 1) * np.dtype(dtype).itemsize)
+            outputs[name] = np.ndarray(shape, dtype=dtype, buffer=blocks[name].buf)
+        else:
+            outputs[name] = np.empty(shape, dtype=dtype)
+    D = outputs["matrix"]
+
+    try:
+        missing = []
+        with instrumentation.phase("matrix: read cached rows"):
+            for i, source in enumerate(sources):
+                row = cache.get(source) if cache is not None and not predecessors and not travel_time else None
+                if row is None:
+                    missing.append(i)
+                else:
+                    D[i] = row[gather]
+            D[np.isinf(D)] = UNREACHABLE
+        instrumentation.add("matrix rows from cache", n - len(missing))
+        instrumentation.add("matrix rows computed", len(missing))
+
+        workers = max(1, min(workers, len(missing) // MIN_ROWS_PER_WORKER))
+        with instrumentation.phase("matrix: shortest-path searches"):
+            if not blocks or workers == 1:
+                _fill_rows(graph, sources, outputs, missing, cache)
+            else:
+                chunks = [missing[i:i + ROWS_PER_TASK] for i in range(0, len(missing), ROWS_PER_TASK)]
+                names = {name: (shm.name, shapes[name][0], shapes[name][1]) for name, shm in blocks.items()}
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(graph, names, sources, cache,
+                                                   instrumentation.is_enabled())) as pool:
+                    for counts in pool.map(_fill_rows_worker, chunks):
+                        instrumentation.merge_counters(counts)
+        if cache is not None and missing:
+            cache.evict()
+        if blocks:
+            outputs = {name: array.copy() for name, array in outputs.items()}
+        result = [outputs["matrix"]]
+        if travel_time:
+            result.append(outputs["times"])
+        if predecessors:
+            result.append(PredecessorTrees(graph, sources, outputs["pred"]))
+        return tuple(result) if len(result) > 1 else result[0]
+    finally:
+        if blocks:
+            D = outputs = None  # drop the views so the shared blocks can be closed
+            for shm in blocks.values():
+                shm.close()
+                shm.unlink()
+
+
+def tour_cost(order, D):
+    """Total length of a tour given as positions into D (one vectorized gather)."""
+    order = np.asarray(order, dtype=np.int64)
+    if len(order) < 2:
+        return 0.0
+    return float(D[order[:-1], order[1:]].sum(dtype=np.float64))
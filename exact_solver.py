@@ -0,0 +1,180 @@
+import math
+import time
+import numpy as np
+from local_search import improve_tour
+
+# Held-Karp is refused above this many bytes of working memory
+DEFAULT_MEMORY_LIMIT = 2 * 1024 ** 3
+DEFAULT_TIME_LIMIT = 60.0
+
+
+def held_karp_memory(n):
+    """
+    Estimated peak bytes for held_karp on n positions (depot included): the tables
+    plus the largest temporaries of either the popcount pass or one subset layer.
+    """
+    m = n - 1
+    if m <= 0:
+        return 0
+    subsets = 1 << m
+    # float64 cost + int8 parent per (subset, last) pair, plus the int64 mask and popcount arrays
+    tables = subsets * m * 9 + subsets * 16
+    # Popcount pass: the (masks >> j) & 1 temporaries
+    popcount = subsets * 16
+    # One column j of a layer of size s: the layer's masks, and for the C(m-1, s-1)
+    # subsets holding j the gathered costs and the candidate sums, while the previous
+    # column's candidates are still referenced, plus a few index arrays
+    layer = max((8 * math.comb(m, s) + math.comb(m - 1, s - 1) * (24 * m + 64) for s in range(2, m + 1)),
+                default=0)
+    # The copied matrix and other small arrays
+    overhead = 1 << 20
+    return tables + max(popcount, layer) + overhead
+
+
+def held_karp(D):
+    """
+    Exact TSP by bitmask dynamic programming over subsets of positions 1..n-1,
+    vectorized with NumPy one subset size at a time. Position 0 is the depot.
+    Returns (closed order, cost).
+    """
+    n = len(D)
+    if n <= 3:
+        order = list(range(n)) + [0]
+        return order, float(sum(D[order[i], order[i + 1]] for i in range(len(order) - 1)))
+
+    m = n - 1
+    W = np.asarray(D, dtype=np.float64)
+    inner = W[1:, 1:]
+    subsets = 1 << m
+    dp = np.full((subsets, m), np.inf)
+    parent = np.full((subsets, m), -1, dtype=np.int8)
+    masks = np.arange(subsets, dtype=np.int64)
+    popcount = np.zeros(subsets, dtype=np.int64)
+    for j in range(m):
+        popcount += (masks >> j) & 1
+    singles = 1 << np.arange(m)
+    dp[singles, np.arange(m)] = W[0, 1:]
+
+    for size in range(2, m + 1):
+        layer = masks[popcount == size]
+        for j in range(m):
+            sel = layer[(layer >> j) & 1 == 1]
+            cand = dp[sel ^ (1 << j)] + inner[:, j]
+            best = np.argmin(cand, axis=1)
+            dp[sel, j] = cand[np.arange(len(sel)), best]
+            parent[sel, j] = best
+
+    full = subsets - 1
+    closing = dp[full] + W[1:, 0]
+    last = int(np.argmin(closing))
+    cost = float(closing[last])
+
+    path = []
+    mask = full
+    while last >= 0:
+        path.append(last + 1)
+        prev = int(parent[mask, last])
+        mask ^= 1 << last
+        last = prev
+    return [0] + path[::-1] + [0], cost
+
+
+def _mst_weight(W, nodes):
+    """Weight of a minimum spanning tree over the given positions (dense Prim)."""
+    k = len(nodes)
+    if k <= 1:
+        return 0.0
+    sub = W[np.ix_(nodes, nodes)]
+    in_tree = np.zeros(k, dtype=bool)
+    in_tree[0] = True
+    best = sub[0].copy()
+    total = 0.0
+    for _ in range(k - 1):
+        best[in_tree] = np.inf
+        v = int(np.argmin(best))
+        total += best[v]
+        in_tree[v] = True
+        best = np.minimum(best, sub[v])
+    return total
+
+
+def branch_and_bound(D, time_limit=DEFAULT_TIME_LIMIT, initial=None):
+    """
+    Depth-first branch-and-bound from position 0. A partial tour is pruned when its
+    cost plus the MST over {current, unvisited, depot} reaches the best tour found.
+    The search keeps its own stack, one frame per stop on the current path, so its
+    depth is not bound by the recursion limit. Memory stays O(n^2). Returns (closed
+    order, cost, proven_optimal); when the time limit is hit the best tour so far
+    is returned with proven_optimal False.
+    """
+    n = len(D)
+    W = np.asarray(D, dtype=np.float64)
+    if initial is None:
+        initial = improve_tour(_nearest_neighbor(W), D)
+    best_order = list(initial)
+    best_cost = float(sum(W[best_order[i], best_order[i + 1]] for i in range(n)))
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    timed_out = False
+
+    visited = [False] * n
+    visited[0] = True
+    path = [0]
+
+    def branches(current, cost):
+        """Unvisited positions to try after current, nearest first; none if the bound prunes."""
+        unvisited = [v for v in range(n) if not visited[v]]
+        if cost + _mst_weight(W, [current] + unvisited + [0]) >= best_cost:
+            return iter(())
+        return iter(sorted(unvisited, key=lambda v: W[current, v]))
+
+    # One frame (position, cost so far, remaining branches) per position on path
+    stack = [(0, 0.0, branches(0, 0.0))] if n > 1 else []
+    while stack:
+        if deadline is not None and time.perf_counter() > deadline:
+            timed_out = True
+            break
+        current, cost, remaining = stack[-1]
+        v = next(remaining, None)
+        if v is None or cost + W[current, v] >= best_cost:
+            # Exhausted, or every later branch is at least as long (they are sorted)
+            stack.pop()
+            visited[path.pop()] = False
+            continue
+        next_cost = cost + W[current, v]
+        if len(path) == n - 1:
+            total = next_cost + W[v, 0]
+            if total < best_cost:
+                best_cost = total
+                best_order = path + [v, 0]
+            continue
+        visited[v] = True
+        path.append(v)
+        stack.append((v, next_cost, branches(v, next_cost)))
+
+    return best_order, best_cost, not timed_out
+
+
+def _nearest_neighbor(W):
+    n = len(W)
+    order = [0]
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, W[order[-1]])
+        nxt = int(np.argmin(row))
+        visited[nxt] = True
+        order.append(nxt)
+    return order + [0]
+
+
+def solve_exact(D, memory_limit=DEFAULT_MEMORY_LIMIT, time_limit=DEFAULT_TIME_LIMIT):
+    """
+    Solve the tour exactly, choosing the strategy from an up-front memory estimate:
+    Held-Karp when it fits in memory_limit, otherwise branch-and-bound.
+    Returns (closed order, cost, proven_optimal, method).
+    """
+    if held_karp_memory(len(D)) <= memory_limit:
+        order, cost = held_karp(D)
+        return order, cost, True, "held-karp"
+    order, cost, optimal = branch_and_bound(D, time_limit=time_limit)
+    return order, cost, optimal, "branch-and-bound"
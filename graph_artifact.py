@@ -0,0 +1,334 @@
+import os
+import json
+import hashlib
+import numpy as np
+from travel_time import DEFAULT_SPEED_KPH, travel_seconds
+import instrumentation
+
+# Binary graph artifact written by data-prep.py and memory-mapped by tour_planner.py.
+# Layout: 8-byte magic, 8-byte little-endian header length, JSON header, then each
+# array stored raw and aligned to ARTIFACT_ALIGN bytes (offsets are in the header).
+# Version 2 added the street names of the edges, version 3 their travel times.
+ARTIFACT_MAGIC = b"MLTPCSR1"
+ARTIFACT_VERSION = 3
+ARTIFACT_ALIGN = 64
+LENGTH_UNIT = "m"
+
+
+class RoadGraph:
+    """Road network stored as a compressed sparse row (CSR) adjacency.
+
+    offsets[i]:offsets[i+1] indexes the neighbors/lengths of node index i.
+    Lengths are float32 meters and times float32 seconds (from travel_time.py's
+    speeds). node_ids maps node index -> GraphML node ID. Street names are a table (UTF-8 bytes in name_blob, sliced by name_offsets)
+    referenced per edge by name_ids, -1 for unnamed; all three are empty when the
+    graph has no names.
+    """
+
+    def __init__(self, offsets, neighbors, lengths, x, y, node_ids, path=None, fingerprint=None,
+                 name_ids=None, name_blob=None, name_offsets=None, times=None):
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.lengths = lengths
+        if times is None:
+            times = np.asarray(lengths, dtype=np.float32) * np.float32(3.6 / DEFAULT_SPEED_KPH)
+        self.times = times
+        self.x = x
+        self.y = y
+        self.node_ids = node_ids
+        self.path = path
+        self.fingerprint = fingerprint
+        self.name_ids = name_ids if name_ids is not None else np.zeros(0, dtype=np.int32)
+        self.name_blob = name_blob if name_blob is not None else np.zeros(0, dtype=np.uint8)
+        self.name_offsets = name_offsets if name_offsets is not None else np.zeros(1, dtype=np.int64)
+        self._index = None
+        self._adjacency = None
+        self._times = None
+
+    @property
+    def num_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.neighbors)
+
+    def index(self, node_id):
+        """Return the array index of a GraphML node ID."""
+        if self._index is None:
+            self._index = {node: i for i, node in enumerate(self.node_ids.tolist())}
+        return self._index[int(node_id)]
+
+    def indices(self, node_ids):
+        """Return the array indices of several GraphML node IDs."""
+        return np.array([self.index(node) for node in node_ids], dtype=np.int64)
+
+    def edge_source(self, k):
+        """Node index an edge (CSR position k) starts from."""
+        return int(np.searchsorted(self.offsets, k, side="right")) - 1
+
+    def street_name(self, k):
+        """Street name of the edge at CSR position k ("" if unnamed)."""
+        if not len(self.name_ids):
+            return ""
+        j = int(self.name_ids[k])
+        if j < 0:
+            return ""
+        return bytes(self.name_blob[self.name_offsets[j]:self.name_offsets[j + 1]]).decode("utf-8")
+
+    def adjacency_lists(self):
+        """Return (offsets, neighbors, lengths) as Python lists for the search loops."""
+        if self._adjacency is None:
+            self._adjacency = (self.offsets.tolist(), self.neighbors.tolist(), self.lengths.tolist())
+        return self._adjacency
+
+    def time_list(self):
+        """Return the edge travel times as a Python list for the search loops."""
+        if self._times is None:
+            self._times = self.times.tolist()
+        return self._times
+
+    def __reduce__(self):
+        # Memory-mapped graphs travel to worker processes as a path and are re-mapped there
+        if self.path is not None:
+            return (read_graph_artifact, (self.path,))
+        return (RoadGraph, (self.offsets, self.neighbors, self.lengths, self.x, self.y, self.node_ids,
+                            None, self.fingerprint, self.name_ids, self.name_blob, self.name_offsets, self.times))
+
+    @classmethod
+    def from_networkx(cls, graph):
+        """Build a RoadGraph from an undirected networkx graph (e.g. read from GraphML)."""
+        edges_sample = list(graph.edges(data=True))[:1]
+        if not edges_sample:
+            raise ValueError("Graph has no edges! Please check the GraphML file.")
+
+        # Determine which attribute to use for edge weight: 'd10', else 'length'
+        sample_edge_attrs = edges_sample[0][2]
+        if 'd10' in sample_edge_attrs:
+            weight_attr, name_attr, highway_attr, maxspeed_attr = 'd10', 'd13', 'd7', 'd12'
+        elif 'length' in sample_edge_attrs:
+            weight_attr, name_attr, highway_attr, maxspeed_attr = 'length', 'name', 'highway', 'maxspeed'
+        else:
+            raise ValueError("No usable weight attribute ('d10' or 'length') found in graph edges.")
+
+        nodes = sorted(graph.nodes(data=True), key=lambda item: int(item[0]))
+        node_ids = np.array([int(n) for n, _ in nodes], dtype=np.int64)
+        x = np.array([float(d.get('x', 0)) for _, d in nodes], dtype=np.float64)
+        y = np.array([float(d.get('y', 0)) for _, d in nodes], dtype=np.float64)
+        index = {node: i for i, node in enumerate(node_ids.tolist())}
+
+        sources, targets, weights, names, times = [], [], [], [], []
+        skipped = 0
+        for u, v, edge_data in graph.edges(data=True):
+            if weight_attr not in edge_data:
+                skipped += 1
+                continue
+            iu, iv = index[int(u)], index[int(v)]
+            length = float(edge_data[weight_attr])
+            sources += [iu, iv]
+            targets += [iv, iu]
+            weights += [length, length]
+            name = str(edge_data.get(name_attr, ''))
+            names += [name, name]
+            seconds = travel_seconds(length, edge_data.get(highway_attr), edge_data.get(maxspeed_attr))
+            times += [seconds, seconds]
+        if skipped:
+            print(f"Removing {skipped} edges without '{weight_attr}'...")
+
+        return cls.from_edges(node_ids, x, y, sources, targets, weights, names, times)
+
+    @classmethod
+    def from_edges(cls, node_ids, x, y, sources, targets, lengths, names=None, times=None):
+        """
+        Build a RoadGraph from directed (source index, target index, length) edge lists,
+        with an optional street name and travel time (seconds) per edge.
+        """
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.argsort(sources, kind="stable")
+        offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(node_ids)), out=offsets[1:])
+
+        name_ids = name_blob = name_offsets = None
+        if names is not None:
+            table = {}
+            ids = np.array([table.setdefault(name, len(table)) if name else -1 for name in names],
+                           dtype=np.int32)
+            encoded = [name.encode("utf-8") for name in table]
+            name_ids = ids[order]
+            name_blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+            name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(b) for b in encoded], out=name_offsets[1:])
+
+        return cls(offsets,
+                   np.asarray(targets, dtype=np.int32)[order],
+                   np.asarray(lengths, dtype=np.float32)[order],
+                   np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), node_ids,
+                   name_ids=name_ids, name_blob=name_blob, name_offsets=name_offsets,
+                   times=np.asarray(times, dtype=np.float32)[order] if times is not None else None)
+
+
+def _source_stamp(source):
+    """Size and modification time of the file an artifact was built from."""
+    if source is None or not os.path.exists(source):
+        return None
+    st = os.stat(source)
+    return {"path": os.path.basename(source), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _artifact_arrays(graph):
+    return {
+        "offsets": np.ascontiguousarray(graph.offsets, dtype=np.int64),
+        "neighbors": np.ascontiguousarray(graph.neighbors, dtype=np.int32),
+        "lengths": np.ascontiguousarray(graph.lengths, dtype=np.float32),
+        "times": np.ascontiguousarray(graph.times, dtype=np.float32),
+        "x": np.ascontiguousarray(graph.x, dtype=np.float64),
+        "y": np.ascontiguousarray(graph.y, dtype=np.float64),
+        "node_ids": np.ascontiguousarray(graph.node_ids, dtype=np.int64),
+    }
+
+
+def graph_fingerprint(graph):
+    """
+    SHA-1 over the routing arrays; identical graphs get identical fingerprints.
+    Street names are left out, so renaming a street keeps cached rows and indexes.
+    """
+    if graph.fingerprint is not None:
+        return graph.fingerprint
+    digest = hashlib.sha1()
+    for name, arr in _artifact_arrays(graph).items():
+        digest.update(name.encode())
+        digest.update(arr.tobytes())
+    graph.fingerprint = digest.hexdigest()
+    return graph.fingerprint
+
+
+def write_array_file(filename, magic, header, arrays):
+    """
+    Write named arrays as one memory-mappable file: magic, header length, JSON
+    header (given fields plus the array layout), then the aligned raw arrays.
+    """
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset += -(-arr.nbytes // ARTIFACT_ALIGN) * ARTIFACT_ALIGN
+
+    header = dict(header, arrays=layout)
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(16 + len(header_bytes)) // ARTIFACT_ALIGN) * ARTIFACT_ALIGN
+
+    # Write to a temporary file first so a crashed run never leaves a torn file
+    tmp_name = filename + ".tmp"
+    with open(tmp_name, "wb") as f:
+        f.write(magic)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(arr.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_name, filename)
+    return header
+
+
+def read_array_file_header(filename, magic):
+    """Return (header, data_start) of a file written by write_array_file, or (None, 0)."""
+    try:
+        with open(filename, "rb") as f:
+            if f.read(8) != magic:
+                return None, 0
+            header_len = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_len).decode("utf-8"))
+    except (OSError, ValueError):
+        return None, 0
+    data_start = -(-(16 + header_len) // ARTIFACT_ALIGN) * ARTIFACT_ALIGN
+    return header, data_start
+
+
+def map_array_file(filename, magic):
+    """Memory-map every array of a file written by write_array_file. Returns (header, arrays)."""
+    header, data_start = read_array_file_header(filename, magic)
+    if header is None:
+        raise ValueError(f"{filename} is not a {magic.decode()} file")
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        shape = tuple(spec["shape"])
+        if shape[0] == 0:
+            arrays[name] = np.zeros(shape, dtype=np.dtype(spec["dtype"]))
+            continue
+        arrays[name] = np.memmap(filename, dtype=np.dtype(spec["dtype"]), mode="r",
+                                 offset=data_start + spec["offset"], shape=shape)
+    return header, arrays
+
+
+def write_graph_artifact(graph, filename="karachi_graph.csr", source=None):
+    """Write a RoadGraph as a single memory-mappable binary file."""
+    arrays = _artifact_arrays(graph)
+    arrays["name_ids"] = np.ascontiguousarray(graph.name_ids, dtype=np.int32)
+    arrays["name_blob"] = np.ascontiguousarray(graph.name_blob, dtype=np.uint8)
+    arrays["name_offsets"] = np.ascontiguousarray(graph.name_offsets, dtype=np.int64)
+    header = {
+        "version": ARTIFACT_VERSION,
+        "unit": LENGTH_UNIT,
+        "num_nodes": int(len(arrays["node_ids"])),
+        "num_edges": int(len(arrays["neighbors"])),
+        "fingerprint": graph_fingerprint(graph),
+        "source": _source_stamp(source),
+    }
+    return write_array_file(filename, ARTIFACT_MAGIC, header, arrays)
+
+
+def read_artifact_header(filename):
+    """Return (header, data_start) of a graph artifact, or (None, 0) if unreadable."""
+    return read_array_file_header(filename, ARTIFACT_MAGIC)
+
+
+def read_graph_artifact(filename="karachi_graph.csr"):
+    """Memory-map a graph artifact; arrays are read-only views into the file."""
+    header, arrays = map_array_file(filename, ARTIFACT_MAGIC)
+    return RoadGraph(arrays["offsets"], arrays["neighbors"], arrays["lengths"],
+                     arrays["x"], arrays["y"], arrays["node_ids"],
+                     path=os.path.abspath(filename), fingerprint=header["fingerprint"],
+                     name_ids=arrays["name_ids"], name_blob=arrays["name_blob"],
+                     name_offsets=arrays["name_offsets"], times=arrays["times"])
+
+
+def artifact_is_fresh(artifact, source):
+    """True if the artifact exists, has the current format and matches its source file."""
+    header, _ = read_artifact_header(artifact)
+    if header is None or header.get("version") != ARTIFACT_VERSION:
+        return False
+    if not os.path.exists(source):
+        return True  # artifact alone is enough to route on
+    stamp = header.get("source")
+    current = _source_stamp(source)
+    return stamp is not None and stamp["size"] == current["size"] and stamp["mtime_ns"] == current["mtime_ns"]
+
+
+def load_road_graph(graphml="karachi_graph.graphml", artifact=None):
+    """Load the road graph, preferring the binary artifact over re-parsing GraphML.
+
+    Falls back to GraphML when the artifact is missing or stale, and rewrites the
+    artifact so the next run can memory-map it.
+    """
+    if artifact is None:
+        artifact = os.path.splitext(graphml)[0] + ".csr"
+    if artifact_is_fresh(artifact, graphml):
+        with instrumentation.phase("load: map graph artifact"):
+            return read_graph_artifact(artifact)
+
+    import networkx as nx
+    print(f"Graph artifact {artifact} missing or stale, parsing {graphml}...")
+    with instrumentation.phase("load: parse GraphML"):
+        nx_graph = nx.read_graphml(graphml)
+    with instrumentation.phase("load: build CSR adjacency"):
+        graph = RoadGraph.from_networkx(nx_graph)
+    try:
+        with instrumentation.phase("load: write graph artifact"):
+            write_graph_artifact(graph, artifact, source=graphml)
+    except OSError as e:
+        print(f"Could not write graph artifact: {e}")
+        return graph
+    with instrumentation.phase("load: map graph artifact"):
+        return read_graph_artifact(artifact)
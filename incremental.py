@@ -0,0 +1,103 @@
+import numpy as np
+from distance_matrix import UNREACHABLE, tour_cost
+from local_search import improve_tour, LazyNeighbors
+from routing import dijkstra
+
+# Extra matrix slots reserved up front so most additions never reallocate
+SPARE_SLOTS = 64
+
+
+class IncrementalTour:
+    """
+    A planned tour that absorbs added and cancelled stops during the day.
+
+    Stops live in slots of a distance matrix that grows by doubling, so an
+    addition costs one search for the new row/column, a vectorized
+    cheapest-insertion scan and a local repair around the changed positions,
+    never a full matrix rebuild or re-plan. Slot 0 is always the HQ.
+    """
+
+    def __init__(self, graph, hq, delivery_nodes, D, tour):
+        n = len(delivery_nodes) + 1
+        self.graph = graph
+        self.D = np.empty((n + SPARE_SLOTS, n + SPARE_SLOTS), dtype=np.float32)
+        self.D[:n, :n] = D
+        self.nodes = [hq] + list(delivery_nodes)      # slot -> node ID (None when free)
+        self.slot = {node: i for i, node in enumerate(self.nodes)}
+        self.free = []
+        self.order = [self.slot[node] for node in tour]
+
+    @property
+    def tour(self):
+        return [self.nodes[i] for i in self.order]
+
+    @property
+    def cost(self):
+        return tour_cost(self.order, self.D)
+
+    def _active_slots(self):
+        return [i for i, node in enumerate(self.nodes) if node is not None]
+
+    def _new_slot(self):
+        if self.free:
+            return self.free.pop()
+        size = len(self.nodes)
+        if size == len(self.D):
+            grown = np.empty((2 * size, 2 * size), dtype=np.float32)
+            grown[:size, :size] = self.D
+            self.D = grown
+        self.nodes.append(None)
+        return size
+
+    def _repair(self, dirty):
+        members = self._active_slots()
+        self.order = improve_tour(self.order, self.D, neighbors=LazyNeighbors(self.D, members),
+                                  active=dirty)
+
+    def add(self, node):
+        """Insert a new stop at its cheapest position and repair locally. Returns (tour, cost)."""
+        node = int(node)
+        if node in self.slot:
+            return self.tour, self.cost
+        source = self.graph.index(node)
+        members = self._active_slots()
+
+        # The road graph is undirected, so the forward search also gives the new column
+        targets = [self.graph.index(self.nodes[i]) for i in members]
+        dist = dijkstra(self.graph, source, targets=targets)
+        row = np.array([dist[t] for t in targets], dtype=np.float64)
+        row[np.isinf(row)] = UNREACHABLE
+
+        s = self._new_slot()
+        self.nodes[s] = node
+        self.slot[node] = s
+        self.D[s, members] = row
+        self.D[members, s] = row
+        self.D[s, s] = 0.0
+
+        # Cheapest insertion: one vectorized pass over the tour's edges
+        prev = np.asarray(self.order[:-1])
+        nxt = np.asarray(self.order[1:])
+        delta = self.D[prev, s].astype(np.float64) + self.D[s, nxt] - self.D[prev, nxt]
+        k = int(np.argmin(delta))
+        self.order.insert(k + 1, s)
+
+        self._repair([self.order[k], s, self.order[k + 2]])
+        return self.tour, self.cost
+
+    def remove(self, node):
+        """Cancel a stop, close the gap and repair locally. Returns (tour, cost)."""
+        node = int(node)
+        s = self.slot.get(node)
+        if s is None:
+            return self.tour, self.cost
+        if s == 0:
+            raise ValueError("the HQ cannot be removed from its own tour")
+        del self.slot[node]
+        k = self.order.index(s)
+        del self.order[k]
+        self.nodes[s] = None
+        self.free.append(s)
+
+        self._repair([self.order[k - 1], self.order[k]])
+        return self.tour, self.cost
@@ -0,0 +1,92 @@
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+# Opt-in phase timers and counters for the planning pipeline. Everything here is a
+# no-op until enable() is called: phase() hands back a shared null context and
+# add() returns straight away, so instrumented code costs one function call when
+# profiling is off. Counters gathered in pool workers are returned with
+# take_counters() and folded back in the parent with merge_counters().
+
+_enabled = False
+_phase_seconds = defaultdict(float)
+_phase_calls = Counter()
+_phase_order = []
+_counters = Counter()
+_started = time.perf_counter()
+_NULL_PHASE = nullcontext()
+
+
+def enable():
+    """Turn profiling on for this process and restart the run clock."""
+    global _enabled, _started
+    _enabled = True
+    _started = time.perf_counter()
+
+
+def is_enabled():
+    return _enabled
+
+
+def phase(name):
+    """Context manager timing a named phase (nested phases are timed inclusively)."""
+    if not _enabled:
+        return _NULL_PHASE
+    return _timed_phase(name)
+
+
+@contextmanager
+def _timed_phase(name):
+    if name not in _phase_calls:
+        _phase_order.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phase_seconds[name] += time.perf_counter() - start
+        _phase_calls[name] += 1
+
+
+def add(name, value=1):
+    """Add value to a named counter."""
+    if _enabled:
+        _counters[name] += value
+
+
+def take_counters():
+    """Return the counters gathered so far and reset them (used to ship worker counts)."""
+    counts = dict(_counters)
+    _counters.clear()
+    return counts
+
+
+def merge_counters(counts):
+    """Fold counters returned by a worker process into this process's totals."""
+    if _enabled and counts:
+        _counters.update(counts)
+
+
+def report():
+    """Return the run's phases and counters as a JSON-serializable dict."""
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "wall_s": round(time.perf_counter() - _started, 6),
+        "phases": [{"name": name, "seconds": round(_phase_seconds[name], 6), "calls": _phase_calls[name]}
+                   for name in _phase_order],
+        "counters": dict(_counters),
+    }
+
+
+def write_report(filename):
+    """Print the profile summary and write it to filename as JSON."""
+    data = report()
+    print(f"\n--- Profile ({data['wall_s']:.3f} s wall) ---")
+    for entry in data["phases"]:
+        print(f"  {entry['name']:<32} {entry['seconds']:10.4f} s  x{entry['calls']}")
+    for name, value in sorted(data["counters"].items()):
+        print(f"  {name:<32} {value:>12,}")
+    with open(filename, "w") as f:
+        json.dump(data, f, indent=2)
+    print(f"Profile report written to {filename}")
+    return data
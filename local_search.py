@@ -0,0 +1,181 @@
+from collections import deque
+import numpy as np
+from sparse_distances import SparseDistances
+
+# Smallest gain treated as an improvement (guards against float32 round-off loops)
+MIN_GAIN = 1e-6
+
+
+def candidate_neighbors(D, k=10):
+    """Return each position's k nearest other positions, nearest first."""
+    n = len(D)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+    masked = np.array(D, dtype=np.float64)
+    np.fill_diagonal(masked, np.inf)
+    near = np.argpartition(masked, k - 1, axis=1)[:, :k]
+    rows = np.arange(n)[:, None]
+    near = np.take_along_axis(near, np.argsort(masked[rows, near], axis=1), axis=1)
+    return near.tolist()
+
+
+class LazyNeighbors:
+    """Candidate lists computed on first use, over a subset of D's positions.
+
+    For repairs that only touch a few nodes, this avoids an O(n^2) pass over D.
+    """
+
+    def __init__(self, D, members, k=10):
+        self.D = D
+        self.members = np.asarray(members, dtype=np.int64)
+        self.k = k
+        self.lists = {}
+
+    def __getitem__(self, a):
+        near = self.lists.get(a)
+        if near is None:
+            row = np.array(self.D[a, self.members], dtype=np.float64)
+            row[self.members == a] = np.inf
+            k = min(self.k, len(row) - 1)
+            if k <= 0:
+                near = []
+            else:
+                idx = np.argpartition(row, k - 1)[:k]
+                near = self.members[idx[np.argsort(row[idx])]].tolist()
+            self.lists[a] = near
+        return near
+
+
+def improve_tour(order, D, k=10, neighbors=None, active=None):
+    """
+    Improve a closed tour (list of positions into D, first == last) with 2-opt
+    and Or-opt moves until no improving move remains.
+
+    Moves are only tried towards each node's k nearest neighbours, every delta is
+    evaluated in O(1) from the edges it replaces, and don't-look bits keep the
+    search on nodes whose surroundings changed. active limits the nodes whose
+    bits start cleared (default: all). D is assumed symmetric; a SparseDistances
+    supplies its own candidate lists. Returns a new closed order starting and
+    ending at the same position as the input.
+    """
+    if len(order) < 2:
+        return list(order)
+    start = order[0]
+    tour = list(order[:-1])
+    n = len(tour)
+    if n < 5:
+        return list(order)
+
+    d = D.item
+    if neighbors is None:
+        neighbors = D.neighbors if isinstance(D, SparseDistances) else candidate_neighbors(D, k)
+    pos = [0] * len(D)
+    for i, node in enumerate(tour):
+        pos[node] = i
+
+    def reindex(lo, hi):
+        for i in range(lo, hi + 1):
+            pos[tour[i]] = i
+
+    def two_opt_move(i, j):
+        """Replace edges (tour[i], tour[i+1]) and (tour[j], tour[j+1]) by reversing one side."""
+        if i > j:
+            i, j = j, i
+        inner = j - i
+        if inner <= n - inner:
+            tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+            reindex(i + 1, j)
+        else:
+            # Reverse the wrap-around side instead; the cycle is the same, mirrored
+            outer = (tour[j + 1:] + tour[:i + 1])[::-1]
+            split = n - j - 1
+            tour[j + 1:] = outer[:split]
+            tour[:i + 1] = outer[split:]
+            reindex(j + 1, n - 1)
+            reindex(0, i)
+
+    def or_opt_move(seg, u, reverse):
+        """Move the node list seg so it sits between u and its successor."""
+        nonlocal tour
+        i = pos[seg[0]]
+        if i + len(seg) > n:
+            tour = tour[i:] + tour[:i]
+            reindex(0, n - 1)
+            i = 0
+        del tour[i:i + len(seg)]
+        j = pos[u] - len(seg) if pos[u] > i else pos[u]
+        tour[j + 1:j + 1] = seg[::-1] if reverse else seg
+        reindex(min(i, j + 1), max(i + len(seg) - 1, j + len(seg)))
+
+    def try_two_opt(a):
+        i = pos[a]
+        for forward in (True, False):
+            b = tour[(i + 1) % n] if forward else tour[i - 1]
+            d_ab = d(a, b)
+            for c in neighbors[a]:
+                d_ac = d(a, c)
+                if d_ac >= d_ab:
+                    break
+                j = pos[c]
+                e = tour[(j + 1) % n] if forward else tour[j - 1]
+                if c == b or e == a:
+                    continue
+                delta = d_ac + d(b, e) - d_ab - d(c, e)
+                if delta < -MIN_GAIN:
+                    if forward:
+                        two_opt_move(i, j)
+                    else:
+                        two_opt_move((i - 1) % n, (j - 1) % n)
+                    return (a, b, c, e)
+        return None
+
+    def try_or_opt(a):
+        for length in (1, 2, 3):
+            if length + 3 > n:
+                break
+            i = pos[a]
+            seg = [tour[(i + m) % n] for m in range(length)]
+            s1, s2 = seg[0], seg[-1]
+            p = tour[i - 1]
+            nx = tour[(i + length) % n]
+            removal_gain = d(p, s1) + d(s2, nx) - d(p, nx)
+            if removal_gain <= MIN_GAIN:
+                continue
+            in_seg = set(seg)
+            for s in (s1, s2):
+                for c in neighbors[s]:
+                    if d(s, c) >= removal_gain:
+                        break
+                    if c in in_seg:
+                        continue
+                    j = pos[c]
+                    for u, v in ((c, tour[(j + 1) % n]), (tour[j - 1], c)):
+                        if u in in_seg or v in in_seg:
+                            continue
+                        d_uv = d(u, v)
+                        forward_add = d(u, s1) + d(s2, v) - d_uv
+                        reverse_add = d(u, s2) + d(s1, v) - d_uv
+                        reverse = reverse_add < forward_add
+                        if min(forward_add, reverse_add) - removal_gain < -MIN_GAIN:
+                            or_opt_move(seg, u, reverse)
+                            return (p, nx, u, v, s1, s2)
+        return None
+
+    # Don't-look bits: only nodes in the queue are examined
+    queue = deque(tour if active is None else active)
+    queued = [False] * len(D)
+    for node in queue:
+        queued[node] = True
+    while queue:
+        a = queue.popleft()
+        queued[a] = False
+        touched = try_two_opt(a) or try_or_opt(a)
+        if touched:
+            for node in touched:
+                if not queued[node]:
+                    queued[node] = True
+                    queue.append(node)
+
+    i = pos[start]
+    return tour[i:] + tour[:i] + [start]
@@ -0,0 +1,73 @@
+import os
+import numpy as np
+from graph_artifact import graph_fingerprint
+
+DEFAULT_CACHE_DIR = ".matrix_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class MatrixRowCache:
+    """On-disk cache of single-source distance rows over the whole road graph.
+
+    Each row is a float32 .npy file (inf = unreachable) stored under
+    <directory>/<graph fingerprint>/<source node index>.npy, so rows are only
+    reused for the exact graph they were computed on. Reads are memory-mapped.
+    The directory is kept under max_bytes by deleting least-recently-used rows;
+    a row's mtime is bumped every time it is read.
+    """
+
+    def __init__(self, graph, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fingerprint = graph_fingerprint(graph)
+        self.row_dir = os.path.join(directory, self.fingerprint[:16])
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.row_dir, exist_ok=True)
+
+    def _path(self, source):
+        return os.path.join(self.row_dir, f"{source}.npy")
+
+    def get(self, source):
+        """Return the memory-mapped row for a source node index, or None on a miss."""
+        path = self._path(source)
+        try:
+            row = np.load(path, mmap_mode="r")
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row
+
+    def put(self, source, row):
+        """Store a full distance row for a source node index."""
+        path = self._path(source)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(row, dtype=np.float32))
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Delete least-recently-used rows (across all fingerprints) until under max_bytes."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+                total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        return total
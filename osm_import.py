@@ -0,0 +1,278 @@
+import math
+import os
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import Counter, defaultdict, deque
+from xml.sax.saxutils import escape
+import numpy as np
+from graph_artifact import RoadGraph, write_graph_artifact
+from travel_time import travel_seconds
+import instrumentation
+
+# Offline counterpart of ox.graph_from_point(..., network_type="drive", simplify=True):
+# reads a local .osm XML extract in two streaming passes (ways, then the coordinates of
+# the nodes they use), keeps drivable ways, splits them at intersections and grows the
+# connected region around the HQ breadth-first until it holds the requested node count.
+
+EARTH_RADIUS_M = 6371009.0
+
+# Same exclusions as OSMnx's "drive" network filter
+EXCLUDED_HIGHWAYS = {
+    "abandoned", "bridleway", "bus_guideway", "construction", "corridor", "cycleway",
+    "elevator", "escalator", "footway", "no", "path", "pedestrian", "planned", "platform",
+    "proposed", "raceway", "razed", "steps", "track",
+}
+EXCLUDED_SERVICES = {"alley", "driveway", "emergency_access", "parking", "parking_aisle", "private"}
+
+# Way tags carried onto the exported edges
+KEPT_TAGS = ("highway", "name", "maxspeed", "lanes", "oneway", "width")
+
+GRAPHML_KEYS = (
+    ("d0", "graph", "created_date"), ("d1", "graph", "created_with"), ("d2", "graph", "crs"),
+    ("d3", "node", "y"), ("d4", "node", "x"), ("d5", "node", "street_count"),
+    ("d6", "edge", "osmid"), ("d7", "edge", "highway"), ("d8", "edge", "oneway"),
+    ("d9", "edge", "reversed"), ("d10", "edge", "length"), ("d11", "edge", "lanes"),
+    ("d12", "edge", "maxspeed"), ("d13", "edge", "name"), ("d14", "edge", "width"),
+)
+
+
+def is_drivable(tags):
+    """True if a way's tags describe a public road a car may use."""
+    highway = tags.get("highway")
+    if highway is None or highway in EXCLUDED_HIGHWAYS:
+        return False
+    if tags.get("area") == "yes" or tags.get("access") == "private":
+        return False
+    if tags.get("motor_vehicle") == "no" or tags.get("motorcar") == "no":
+        return False
+    return tags.get("service") not in EXCLUDED_SERVICES
+
+
+def _iter_elements(path, tag):
+    """Yield each finished top-level element with the given tag, then drop it from memory."""
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event != "end" or elem.tag not in ("node", "way", "relation"):
+            continue
+        if elem.tag == tag:
+            yield elem
+        root.clear()
+
+
+def read_drivable_ways(path):
+    """First pass: return [(way ID, node refs, kept tags)] for every drivable way."""
+    ways = []
+    for elem in _iter_elements(path, "way"):
+        tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+        if not is_drivable(tags):
+            continue
+        refs = array("q", (int(nd.get("ref")) for nd in elem.iter("nd")))
+        if len(refs) >= 2:
+            ways.append((int(elem.get("id")), refs, {k: tags[k] for k in KEPT_TAGS if k in tags}))
+    return ways
+
+
+def read_node_coordinates(path, wanted):
+    """Second pass: return {node ID: (lat, lon)} for the node IDs in wanted."""
+    coords = {}
+    for elem in _iter_elements(path, "node"):
+        node = int(elem.get("id"))
+        if node in wanted:
+            coords[node] = (float(elem.get("lat")), float(elem.get("lon")))
+    return coords
+
+
+def haversine(a, b):
+    """Great-circle distance in meters between two (lat, lon) points."""
+    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
+    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(h))
+
+
+def build_street_graph(ways, coords):
+    """
+    Split ways into edges between street nodes (way ends and nodes shared by several
+    ways), summing segment lengths over the points in between, like OSMnx's simplify.
+    Ways clipped by the extract boundary are split where their nodes go missing.
+    Returns {node: [(neighbor, length m, way index)]} in both directions.
+    """
+    uses = Counter()
+    for _, refs, _ in ways:
+        uses.update(refs)
+        uses[refs[0]] += 1
+        uses[refs[-1]] += 1
+
+    adjacency = defaultdict(list)
+    for w, (_, refs, _) in enumerate(ways):
+        segment = []  # (node, meters from the segment's first node)
+        for node in refs:
+            if node not in coords:
+                segment = []
+                continue
+            if not segment:
+                segment = [(node, 0.0)]
+                continue
+            prev, length = segment[-1]
+            segment.append((node, length + haversine(coords[prev], coords[node])))
+            if uses[node] > 1:
+                _add_segment(adjacency, segment, w)
+                segment = [(node, 0.0)]
+    return adjacency
+
+
+def _add_segment(adjacency, segment, w):
+    """
+    Add the edge for one street segment in both directions. A segment that comes
+    back to its own first node (a ring road or loop meeting nothing else on the
+    way) is split at its middle point into two edges instead of being dropped.
+    """
+    (start, _), (end, length) = segment[0], segment[-1]
+    if start != end:
+        edges = [(start, end, length)]
+    elif len(segment) > 2:
+        middle, split = segment[len(segment) // 2]
+        edges = [(start, middle, split), (middle, end, length - split)]
+    else:
+        return
+    for u, v, d in edges:
+        adjacency[u].append((v, d, w))
+        adjacency[v].append((u, d, w))
+
+
+def nearest_node(adjacency, coords, lat, lon):
+    """Street node closest to (lat, lon)."""
+    nodes = np.fromiter(adjacency.keys(), dtype=np.int64, count=len(adjacency))
+    points = np.radians(np.array([coords[n] for n in nodes.tolist()]))
+    lat0, lon0 = math.radians(lat), math.radians(lon)
+    h = (np.sin((points[:, 0] - lat0) / 2) ** 2
+         + np.cos(lat0) * np.cos(points[:, 0]) * np.sin((points[:, 1] - lon0) / 2) ** 2)
+    return int(nodes[np.argmin(h)])
+
+
+def grow_region(adjacency, start, target_node_count):
+    """Breadth-first region around start, grown until it holds target_node_count nodes."""
+    region = [start]
+    seen = {start}
+    queue = deque([start])
+    while queue and len(region) < target_node_count:
+        for neighbor, _, _ in adjacency[queue.popleft()]:
+            if neighbor not in seen:
+                seen.add(neighbor)
+                region.append(neighbor)
+                queue.append(neighbor)
+                if len(region) == target_node_count:
+                    break
+    return region
+
+
+def _data(key, value):
+    return f'      <data key="{key}">{escape(str(value))}</data>\n'
+
+
+def write_region(region, adjacency, coords, ways, graphml="karachi_graph.graphml",
+                 artifact="karachi_graph.csr", created_date=""):
+    """
+    Write the region's induced subgraph as GraphML (same layout as data-prep.py's
+    manual writer, node IDs 1..n in region order) and as the CSR graph artifact,
+    in one pass over its nodes and edges. Parallel edges keep the shortest.
+    Returns the number of undirected edges written.
+    """
+    new_id = {node: i + 1 for i, node in enumerate(region)}
+    best = {}
+    for node in region:
+        for neighbor, length, w in adjacency[node]:
+            if neighbor in new_id:
+                pair = (min(new_id[node], new_id[neighbor]), max(new_id[node], new_id[neighbor]))
+                if pair not in best or length < best[pair][0]:
+                    best[pair] = (length, w)
+
+    n = len(region)
+    x = np.empty(n, dtype=np.float64)
+    y = np.empty(n, dtype=np.float64)
+    sources = np.empty(2 * len(best), dtype=np.int64)
+    targets = np.empty(2 * len(best), dtype=np.int64)
+    lengths = np.empty(2 * len(best), dtype=np.float64)
+    names = [""] * (2 * len(best))
+    times = np.empty(2 * len(best), dtype=np.float64)
+
+    tmp_name = graphml + ".tmp"
+    with open(tmp_name, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+                'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+                'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n')
+        f.write("".join(f'  <key id="{key}" for="{kind}" attr.name="{name}" attr.type="string" />\n'
+                        for key, kind, name in GRAPHML_KEYS))
+        f.write('  <graph edgedefault="undirected">\n')
+
+        for i, node in enumerate(region):
+            y[i], x[i] = coords[node]
+            f.write(f'    <node id="{i + 1}">\n' + _data("d3", y[i]) + _data("d4", x[i])
+                    + _data("d5", len(adjacency[node])) + '    </node>\n')
+
+        for e, ((u, v), (length, w)) in enumerate(best.items()):
+            osmid, _, tags = ways[w]
+            oneway = tags.get("oneway") in ("yes", "true", "1", "-1")
+            f.write(f'    <edge source="{u}" target="{v}" id="edge{e + 1}">\n'
+                    + _data("d6", osmid) + _data("d7", tags.get("highway", "residential"))
+                    + _data("d8", oneway) + _data("d9", False) + _data("d10", length)
+                    + _data("d11", tags.get("lanes", "1")) + _data("d12", tags.get("maxspeed", ""))
+                    + _data("d13", tags.get("name", "")) + _data("d14", tags.get("width", ""))
+                    + '    </edge>\n')
+            sources[2 * e], targets[2 * e] = u - 1, v - 1
+            sources[2 * e + 1], targets[2 * e + 1] = v - 1, u - 1
+            lengths[2 * e] = lengths[2 * e + 1] = length
+            names[2 * e] = names[2 * e + 1] = tags.get("name", "")
+            times[2 * e] = times[2 * e + 1] = travel_seconds(length, tags.get("highway"), tags.get("maxspeed"))
+
+        f.write(f'    <data key="d0">{created_date}</data>\n'
+                '    <data key="d1">OSM extract + Custom Script</data>\n'
+                '    <data key="d2">epsg:4326</data>\n')
+        f.write('  </graph>\n</graphml>\n')
+    os.replace(tmp_name, graphml)
+
+    graph = RoadGraph.from_edges(np.arange(1, n + 1), x, y, sources, targets, lengths, names, times)
+    write_graph_artifact(graph, artifact, source=graphml)
+    return len(best)
+
+
+def import_osm_extract(osm_path, hq_latitude, hq_longitude, target_node_count=10000,
+                       graphml="karachi_graph.graphml", artifact="karachi_graph.csr"):
+    """
+    Build the routing graph from a local .osm extract without network access.
+    Returns (HQ OSM node ID, region as OSM node IDs in new-ID order, number of edges).
+    """
+    print(f"Reading drivable ways from {osm_path}...")
+    with instrumentation.phase("osm: read ways"):
+        ways = read_drivable_ways(osm_path)
+    wanted = set()
+    for _, refs, _ in ways:
+        wanted.update(refs)
+    print(f"  {len(ways)} drivable ways over {len(wanted)} nodes")
+    instrumentation.add("osm ways", len(ways))
+    instrumentation.add("osm way nodes", len(wanted))
+
+    print("Reading node coordinates...")
+    with instrumentation.phase("osm: read node coordinates"):
+        coords = read_node_coordinates(osm_path, wanted)
+    del wanted
+    with instrumentation.phase("osm: split ways into edges"):
+        adjacency = build_street_graph(ways, coords)
+    if not adjacency:
+        raise ValueError(f"No drivable roads found in {osm_path}")
+
+    with instrumentation.phase("osm: grow region"):
+        hq_node = nearest_node(adjacency, coords, hq_latitude, hq_longitude)
+        region = grow_region(adjacency, hq_node, target_node_count)
+    if len(region) < target_node_count:
+        raise ValueError(f"The road network connected to the HQ in {osm_path} has only "
+                         f"{len(region)} nodes; {target_node_count} were requested.")
+
+    created_date = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(os.path.getmtime(osm_path)))
+    with instrumentation.phase("osm: write GraphML and artifact"):
+        num_edges = write_region(region, adjacency, coords, ways, graphml, artifact, created_date)
+    return hq_node, region, num_edges
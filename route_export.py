@@ -0,0 +1,92 @@
+import csv
+import json
+import os
+
+# Street-level export of a planned tour. Each leg between consecutive stops is
+# expanded into the road edges it drives along, taken from a path provider
+# (PredecessorTrees from the distance matrix, or a SparseDistances, which searches
+# per leg), and written out straight away: one GeoJSON feature or a few CSV rows
+# at a time, so memory stays flat however many stops the tour has.
+
+CSV_COLUMNS = ("leg", "step", "from_node", "to_node", "street", "length_m", "distance_m", "lat", "lon")
+
+
+def iter_legs(order, paths):
+    """
+    Yield (leg number, from position, to position, edges) for each leg of a tour
+    given as positions, with edges as CSR positions in driving order.
+    """
+    for leg, (a, b) in enumerate(zip(order[:-1], order[1:]), start=1):
+        yield leg, a, b, paths.path(a, b) if a != b else []
+
+
+def street_sequence(graph, edges):
+    """Street names along a path, with repeats and unnamed stretches dropped."""
+    streets = []
+    for k in edges:
+        name = graph.street_name(k)
+        if name and (not streets or streets[-1] != name):
+            streets.append(name)
+    return streets
+
+
+def _point(graph, v):
+    return [float(graph.x[v]), float(graph.y[v])]
+
+
+def write_geojson(filename, graph, nodes, order, paths):
+    """
+    Write the tour as a GeoJSON FeatureCollection: a Point per stop (in visiting
+    order) followed by the LineString of the leg leaving it. Returns the total length in meters.
+    """
+    total = 0.0
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        first = True
+        for leg, a, b, edges in iter_legs(order, paths):
+            start = graph.index(nodes[a])
+            coords = [_point(graph, start)]
+            length = 0.0
+            for k in edges:
+                coords.append(_point(graph, int(graph.neighbors[k])))
+                length += float(graph.lengths[k])
+            total += length
+            stop = {"type": "Feature", "geometry": {"type": "Point", "coordinates": coords[0]},
+                    "properties": {"stop": leg - 1, "node": int(nodes[a])}}
+            line = {"type": "Feature", "geometry": {"type": "LineString", "coordinates": coords},
+                    "properties": {"leg": leg, "from": int(nodes[a]), "to": int(nodes[b]),
+                                   "length_m": round(length, 1), "streets": street_sequence(graph, edges)}}
+            f.write(("" if first else ",\n") + json.dumps(stop) + ",\n" + json.dumps(line))
+            first = False
+        f.write("\n]}\n")
+    return total
+
+
+def write_csv(filename, graph, nodes, order, paths):
+    """
+    Write the tour as CSV, one row per road edge driven: leg, step within the leg,
+    edge end nodes (GraphML IDs), street, edge length, distance so far and the
+    coordinates reached. Returns the total length in meters.
+    """
+    total = 0.0
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for leg, a, b, edges in iter_legs(order, paths):
+            for step, k in enumerate(edges, start=1):
+                u, v = graph.edge_source(k), int(graph.neighbors[k])
+                total += float(graph.lengths[k])
+                writer.writerow((leg, step, int(graph.node_ids[u]), int(graph.node_ids[v]), graph.street_name(k),
+                                 round(float(graph.lengths[k]), 1), round(total, 1),
+                                 float(graph.y[v]), float(graph.x[v])))
+    return total
+
+
+def export_tour(filename, graph, nodes, order, paths):
+    """Write a tour as GeoJSON (.geojson/.json) or CSV (.csv), by file extension."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in (".geojson", ".json"):
+        return write_geojson(filename, graph, nodes, order, paths)
+    if ext == ".csv":
+        return write_csv(filename, graph, nodes, order, paths)
+    raise ValueError(f"Unknown export format {ext!r}: use .geojson, .json or .csv")
@@ -0,0 +1,274 @@
+import asyncio
+import argparse
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from distance_matrix import UNREACHABLE
+from matrix_cache import MatrixRowCache, DEFAULT_MAX_BYTES
+from routing import dijkstra
+from tour_planner import PlannerSession, TOUR_BUILDERS, solve, tour_distance_time
+from travel_time import objective_matrix
+
+DEFAULT_HOT_ROWS = 2048
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# The on-disk row cache is trimmed back under its size limit after this many writes
+EVICT_EVERY = 32
+
+# Per-process state for pool workers
+_worker = {}
+
+
+def _init_worker(graph):
+    _worker["graph"] = graph
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def _full_row(source, travel_time=False):
+    """
+    Distances from one node index to every node of the graph (float32, inf =
+    unreachable), or (distances, driving seconds along those paths) with travel_time.
+    """
+    if not travel_time:
+        return np.array(dijkstra(_worker["graph"], source), dtype=np.float32)
+    dist, seconds = dijkstra(_worker["graph"], source, travel_time=True)
+    return np.array(dist, dtype=np.float32), np.array(seconds, dtype=np.float32)
+
+
+def _gather_matrix(rows, sources):
+    """The sources' columns of full rows as a float32 matrix, inf replaced by UNREACHABLE."""
+    M = np.stack([row[sources] for row in rows]).astype(np.float32)
+    M[np.isinf(M)] = UNREACHABLE
+    return M
+
+
+class HotRows:
+    """
+    In-memory LRU of full distance rows in front of the on-disk MatrixRowCache.
+    put() only touches memory; save() writes a row to disk and trims the cache
+    every EVICT_EVERY writes, and is meant to run off the event loop.
+    """
+
+    def __init__(self, disk, max_rows=DEFAULT_HOT_ROWS):
+        self.disk = disk
+        self.max_rows = max_rows
+        self.rows = OrderedDict()
+        self.saved = 0
+
+    def get(self, source):
+        row = self.rows.get(source)
+        if row is not None:
+            self.rows.move_to_end(source)
+            return row
+        row = self.disk.get(source) if self.disk is not None else None
+        if row is not None:
+            self._remember(source, row)
+        return row
+
+    def put(self, source, row):
+        self._remember(source, row)
+
+    def save(self, source, row):
+        if self.disk is None:
+            return
+        self.disk.put(source, row)
+        self.saved += 1
+        if self.saved % EVICT_EVERY == 0:
+            self.disk.evict()
+
+    def _remember(self, source, row):
+        self.rows[source] = row
+        self.rows.move_to_end(source)
+        while len(self.rows) > self.max_rows:
+            self.rows.popitem(last=False)
+
+
+class RouteService:
+    """Keeps the graph, a hot row cache and a worker pool alive between requests."""
+
+    def __init__(self, graph, hq, workers=None, cache_dir=None, hot_rows=DEFAULT_HOT_ROWS,
+                 cache_bytes=DEFAULT_MAX_BYTES):
+        self.graph = graph
+        self.hq = hq
+        disk = MatrixRowCache(graph, cache_dir, cache_bytes) if cache_dir else None
+        self.rows = HotRows(disk, hot_rows)
+        # (distances, seconds) pairs for time-weighted requests; the disk cache holds no times
+        self.time_rows = HotRows(None, hot_rows)
+        # One thread writes rows to disk and evicts, in order, without blocking the loop
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(graph,))
+        # Start every worker now, before any client socket is open: a worker forked
+        # while a request is in flight would inherit the connection and keep it open
+        # after the handler closes it, so clients reading to EOF would hang
+        for future in [self.pool.submit(_worker_ready) for _ in range(workers)]:
+            future.result()
+        # (source index, travel_time) -> future, so concurrent requests share a search
+        self.pending = {}
+        self.served = 0
+
+    async def row(self, source, travel_time=False):
+        """Full distance row of a node index, or (distances, seconds) with travel_time."""
+        rows = self.time_rows if travel_time else self.rows
+        row = rows.get(source)
+        if row is not None:
+            return row
+        key = (source, travel_time)
+        future = self.pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.pool, _full_row, source, travel_time)
+            self.pending[key] = future
+            try:
+                row = await future
+                rows.put(source, row)
+                dist = row[0] if travel_time else row
+                if travel_time:
+                    self.rows.put(source, dist)
+                loop.run_in_executor(self.writer, self.rows.save, source, dist)
+            finally:
+                del self.pending[key]
+            return row
+        return await future
+
+    async def matrix(self, nodes, travel_time=False):
+        """Distance matrix between node IDs, or (D, T) with the travel-time matrix."""
+        sources = self.graph.indices(nodes)
+        rows = await asyncio.gather(*(self.row(int(s), travel_time) for s in sources))
+        if not travel_time:
+            return _gather_matrix(rows, sources)
+        return _gather_matrix([d for d, _ in rows], sources), _gather_matrix([t for _, t in rows], sources)
+
+    async def route(self, request):
+        """
+        Plan one tour for a request in batch_planner.py's instance shape. With a
+        time_weight above 0 the tour minimizes objective_matrix's mix of driving
+        time and distance; the result then carries cost and initial_cost in those
+        units in place of cost_m and initial_cost_m, plus distance_m and time_s.
+        """
+        start = time.perf_counter()
+        hq = int(request.get("hq", self.hq))
+        stops = [int(node) for node in request["deliveries"]]
+        algorithm = request.get("algorithm", "greedy")
+        if algorithm not in TOUR_BUILDERS:
+            raise ValueError(f"unknown algorithm {algorithm!r}")
+        priorities = {int(k): v for k, v in request.get("priorities", {}).items()}
+        priority_map = {node: priorities.get(node, 1) for node in stops}
+        priority_map[hq] = 0
+        time_weight = float(request.get("time_weight", 0))
+
+        try:
+            D = await self.matrix([hq] + stops, travel_time=time_weight > 0)
+        except KeyError as e:
+            raise ValueError(f"node {e.args[0]} is not in the graph")
+        D_length, T = D if time_weight > 0 else (D, None)
+        D = objective_matrix(D_length, T, time_weight)
+        matrix_done = time.perf_counter()
+        tour, cost, initial_cost = await asyncio.get_running_loop().run_in_executor(
+            self.pool, solve, hq, stops, D, algorithm, priority_map, request.get("optimize", True))
+        done = time.perf_counter()
+        self.served += 1
+        result = {
+            "tour": tour,
+            "cost_m": cost,
+            "initial_cost_m": initial_cost,
+            "algorithm": algorithm,
+            "latency_ms": round((done - start) * 1000, 2),
+            "matrix_ms": round((matrix_done - start) * 1000, 2),
+            "solve_ms": round((done - matrix_done) * 1000, 2),
+        }
+        if T is not None:
+            meters, seconds = tour_distance_time(hq, stops, tour, D_length, T)
+            result["cost"] = result.pop("cost_m")
+            result["initial_cost"] = result.pop("initial_cost_m")
+            result.update({"time_weight": time_weight, "distance_m": meters, "time_s": seconds})
+        return result
+
+    def status(self):
+        return {"status": "ok", "nodes": self.graph.num_nodes, "hot_rows": len(self.rows.rows),
+                "requests_served": self.served}
+
+    async def handle(self, reader, writer):
+        """Minimal HTTP/1.1: POST /route with a JSON body, GET /health."""
+        try:
+            status, body = 200, None
+            try:
+                request_line = (await reader.readline()).decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    raise ValueError("request body too large")
+                payload = await reader.readexactly(length) if length else b""
+
+                if len(request_line) < 2:
+                    status, body = 400, {"error": "malformed request line"}
+                elif request_line[0] == "GET" and request_line[1] == "/health":
+                    body = self.status()
+                elif request_line[0] == "POST" and request_line[1] == "/route":
+                    body = await self.route(json.loads(payload or b"{}"))
+                else:
+                    status, body = 404, {"error": "not found"}
+            except (ValueError, KeyError, TypeError) as e:
+                status, body = 400, {"error": str(e)}
+            except Exception as e:
+                status, body = 500, {"error": repr(e)}
+
+            data = json.dumps(body).encode("utf-8")
+            reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}[status]
+            writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def close(self):
+        self.pool.shutdown()
+        self.writer.shutdown()
+        if self.rows.disk is not None:
+            self.rows.disk.evict()
+
+
+async def serve(service, host="127.0.0.1", port=8080, unix_path=None):
+    if unix_path:
+        server = await asyncio.start_unix_server(service.handle, path=unix_path)
+        print(f"Route service listening on unix:{unix_path}")
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+        print(f"Route service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resident JSON route service over the prepared road graph.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix", default=None, help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="solver processes (default: CPU count)")
+    parser.add_argument("--cache-dir", default=".matrix_cache", help="on-disk row cache ('' to disable)")
+    parser.add_argument("--hot-rows", type=int, default=DEFAULT_HOT_ROWS, help="distance rows kept in memory")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2,
+                        help="size limit of the on-disk row cache")
+    args = parser.parse_args()
+
+    session = PlannerSession()
+    service = RouteService(session.graph, session.hq_node, args.workers, args.cache_dir, args.hot_rows,
+                           int(args.cache_max_mb * 1024 ** 2))
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,94 @@
+from heapq import heappush, heappop
+import instrumentation
+
+INF = float('inf')
+
+
+def dijkstra(graph, source, targets=None, predecessors=False, travel_time=False):
+    """Single-source Dijkstra over a RoadGraph, using array indices (not node IDs).
+
+    Returns a list of distances (inf if unreachable). If targets is given the search
+    stops once every target is settled; only those entries are then guaranteed final.
+    predecessors=True adds pred, where pred[v] is the CSR position of the last edge
+    on the path to v (-1 for the source and unreached nodes). travel_time=True adds
+    the driving seconds along each shortest path, summed in the same pass. Extras
+    are returned after dist in that order: (dist, pred), (dist, time) or (dist, pred, time).
+    """
+    offsets, neighbors, lengths = graph.adjacency_lists()
+    dist = [INF] * graph.num_nodes
+    pred = [-1] * graph.num_nodes if predecessors else None
+    times = graph.time_list() if travel_time else None
+    time = [INF] * graph.num_nodes if travel_time else None
+    if time is not None:
+        time[source] = 0.0
+    settled = bytearray(graph.num_nodes)
+    remaining = set(targets) if targets is not None else None
+
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    num_settled = num_relaxed = 0
+    while heap:
+        d, u = heappop(heap)
+        if settled[u]:
+            continue
+        settled[u] = 1
+        num_settled += 1
+        if remaining is not None:
+            remaining.discard(u)
+            if not remaining:
+                break
+        start, end = offsets[u], offsets[u + 1]
+        num_relaxed += end - start
+        for k in range(start, end):
+            v = neighbors[k]
+            nd = d + lengths[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                heappush(heap, (nd, v))
+                if pred is not None:
+                    pred[v] = k
+                if time is not None:
+                    time[v] = time[u] + times[k]
+
+    if instrumentation.is_enabled():
+        instrumentation.add("dijkstra searches")
+        instrumentation.add("nodes settled", num_settled)
+        instrumentation.add("edges relaxed", num_relaxed)
+    extras = [extra for extra in (pred, time) if extra is not None]
+    if extras:
+        return (dist, *extras)
+    return dist
+
+
+def path_edges(graph, pred, source, target):
+    """
+    Edges (CSR positions, in driving order) of the shortest path from source to
+    target, read back from a predecessor array filled by dijkstra. Raises
+    ValueError if target was not reached.
+    """
+    edges = []
+    v = target
+    while v != source:
+        k = int(pred[v])
+        if k < 0:
+            raise ValueError(f"No road path from node {graph.node_ids[source]} to {graph.node_ids[target]}")
+        edges.append(k)
+        v = graph.edge_source(k)
+    edges.reverse()
+    return edges
+
+
+def shortest_path(graph, source, target):
+    """Edges (CSR positions) of the shortest path between two node indices, by a new search."""
+    _, pred = dijkstra(graph, source, targets=[target], predecessors=True)
+    return path_edges(graph, pred, source, target)
+
+
+def shortest_path_length(graph, source, target, index=None):
+    """Point-to-point road distance between two node indices (inf if no path).
+
+    Answered from a ContractionHierarchy when one is given.
+    """
+    if index is not None:
+        return index.distance(source, target)
+    return dijkstra(graph, source, targets=[target])[target]
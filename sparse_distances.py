@@ -0,0 +1,208 @@
+import math
+from collections import defaultdict
+import numpy as np
+from distance_matrix import UNREACHABLE
+from routing import dijkstra, shortest_path
+import instrumentation
+
+METERS_PER_DEGREE = 111320.0
+DEFAULT_K = 10
+
+
+class GridIndex:
+    """Uniform grid over planar points for k-nearest-neighbour queries.
+
+    Cells are sized for about two points each; a query scans rings of cells
+    outwards until the k-th best distance found is inside the scanned square.
+    """
+
+    def __init__(self, px, py):
+        self.px = np.asarray(px, dtype=np.float64)
+        self.py = np.asarray(py, dtype=np.float64)
+        n = len(self.px)
+        span = max(self.px.max() - self.px.min(), self.py.max() - self.py.min(), 1.0) if n else 1.0
+        self.cell = max(span / math.sqrt(max(n / 2, 1)), 1e-9)
+        self.x0 = self.px.min() if n else 0.0
+        self.y0 = self.py.min() if n else 0.0
+        cx = ((self.px - self.x0) // self.cell).astype(np.int64)
+        cy = ((self.py - self.y0) // self.cell).astype(np.int64)
+        self.cells = {}
+        order = np.lexsort((cy, cx))
+        keys = np.stack([cx[order], cy[order]], axis=1)
+        if n:
+            breaks = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+            for group in np.split(order, breaks):
+                self.cells[(int(cx[group[0]]), int(cy[group[0]]))] = group
+        self.max_ring = int(max(cx.max(), cy.max()) + 1) if n else 0
+
+    def nearest(self, i, k):
+        """Positions of the k points closest to point i (straight line), nearest first."""
+        qx, qy = self.px[i], self.py[i]
+        cx = int((qx - self.x0) // self.cell)
+        cy = int((qy - self.y0) // self.cell)
+        found = []
+        for ring in range(self.max_ring + 1):
+            for gx in range(cx - ring, cx + ring + 1):
+                for gy in (range(cy - ring, cy + ring + 1) if abs(gx - cx) == ring else (cy - ring, cy + ring)):
+                    group = self.cells.get((gx, gy))
+                    if group is not None:
+                        found.append(group)
+            if found:
+                candidates = np.concatenate(found)
+                candidates = candidates[candidates != i]
+                if len(candidates) >= k:
+                    dist = np.hypot(self.px[candidates] - qx, self.py[candidates] - qy)
+                    kth = np.partition(dist, k - 1)[k - 1]
+                    if kth <= ring * self.cell:
+                        break
+        else:
+            if not found:
+                return []
+            candidates = np.concatenate(found)
+            candidates = candidates[candidates != i]
+            dist = np.hypot(self.px[candidates] - qx, self.py[candidates] - qy)
+        best = np.argsort(dist, kind="stable")[:k]
+        return candidates[best].tolist()
+
+
+class SparseDistances:
+    """
+    Road distances between positions of [hq] + delivery_nodes without an n x n matrix.
+
+    Each position gets road distances to its k nearest stops by straight line (picked
+    with a GridIndex over the graph's x/y), from one search per stop that stops as
+    soon as those k are settled. Any other pair is computed on first use through
+    item() and kept. Supports len(), item(a, b) and D[rows, cols] indexing, so
+    tour_cost and the local search accept it in place of a dense matrix.
+    """
+
+    def __init__(self, graph, nodes, k=DEFAULT_K, index=None):
+        self.graph = graph
+        self.nodes = list(nodes)
+        self.sources = graph.indices(self.nodes).tolist()
+        self.index = index
+        n = len(self.nodes)
+        self.rows = [{} for _ in range(n)]
+
+        # Equirectangular projection to meters is plenty for picking neighbours
+        x = np.asarray(graph.x)[self.sources]
+        y = np.asarray(graph.y)[self.sources]
+        lat0 = math.radians(float(np.mean(y))) if n else 0.0
+        self.grid = GridIndex(x * METERS_PER_DEGREE * math.cos(lat0), y * METERS_PER_DEGREE)
+
+        k = min(k, n - 1)
+        self.k = k
+        with instrumentation.phase("sparse: bounded searches"):
+            for a in range(n):
+                near = self.grid.nearest(a, k) if k > 0 else []
+                missing = [b for b in near if b not in self.rows[a]]
+                if missing:
+                    dist = dijkstra(graph, self.sources[a], targets=[self.sources[b] for b in missing])
+                    for b in missing:
+                        self._store(a, b, dist[self.sources[b]])
+        # Candidate lists: the pairs already known for each position, nearest by road first
+        self.neighbors = [sorted(row, key=row.get) for row in self.rows]
+        instrumentation.add("sparse pairs", self.num_pairs)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def num_pairs(self):
+        return sum(len(row) for row in self.rows) // 2
+
+    def _store(self, a, b, d):
+        d = UNREACHABLE if d == float('inf') else float(d)
+        self.rows[a][b] = d
+        self.rows[b][a] = d
+        return d
+
+    def item(self, a, b):
+        """Road distance between positions a and b, searched for on first use."""
+        if a == b:
+            return 0.0
+        d = self.rows[a].get(b)
+        if d is None:
+            instrumentation.add("sparse lazy pairs")
+            if self.index is not None:
+                d = self.index.distance(self.sources[a], self.sources[b])
+            else:
+                d = dijkstra(self.graph, self.sources[a], targets=[self.sources[b]])[self.sources[b]]
+            d = self._store(a, b, d)
+        return d
+
+    def fill(self, us, vs):
+        """Make sure every pair (us[i], vs[i]) is known, with one search per source position."""
+        groups = defaultdict(list)
+        for u, v in zip(us, vs):
+            if u != v and v not in self.rows[u]:
+                groups[u].append(v)
+        if not groups:
+            return
+        instrumentation.add("sparse lazy pairs", sum(len(targets) for targets in groups.values()))
+        for u, targets in groups.items():
+            targets = [v for v in targets if v not in self.rows[u]]
+            if self.index is not None:
+                for v in targets:
+                    self._store(u, v, self.index.distance(self.sources[u], self.sources[v]))
+                continue
+            dist = dijkstra(self.graph, self.sources[u], targets=[self.sources[v] for v in targets])
+            for v in targets:
+                self._store(u, v, dist[self.sources[v]])
+
+    def add_pairs(self, us, vs, dists=None):
+        """
+        Add each pair (us[i], vs[i]) to both positions' candidate lists, with its road
+        distance from dists when already known elsewhere (e.g. a cluster's matrix),
+        otherwise searched for here.
+        """
+        if dists is None:
+            self.fill(us, vs)
+            dists = [self.item(u, v) for u, v in zip(us, vs)]
+        added = defaultdict(set)
+        for u, v, d in zip(us, vs, dists):
+            if u != v:
+                self._store(u, v, d)
+                added[u].add(v)
+                added[v].add(u)
+        for a, near in added.items():
+            row = self.rows[a]
+            self.neighbors[a] = sorted(near.union(self.neighbors[a]), key=row.get)
+
+    def __getitem__(self, key):
+        a, b = key
+        if np.ndim(a) == 0 and np.ndim(b) == 0:
+            return self.item(int(a), int(b))
+        a, b = np.broadcast_arrays(np.asarray(a), np.asarray(b))
+        us, vs = a.ravel().tolist(), b.ravel().tolist()
+        self.fill(us, vs)
+        return np.array([self.item(u, v) for u, v in zip(us, vs)], dtype=np.float64).reshape(a.shape)
+
+    def path(self, a, b):
+        """Edges (CSR positions) of the road path between positions a and b, by a new search."""
+        return shortest_path(self.graph, self.sources[a], self.sources[b])
+
+    def candidate_pairs(self):
+        """
+        Pairs (u < v) of the candidate lists as two int64 arrays. Pairs filled in
+        on demand later are left out, so constructions do not depend on earlier use.
+        """
+        pairs = sorted({(min(u, v), max(u, v)) for u, near in enumerate(self.neighbors) for v in near})
+        return (np.array([u for u, _ in pairs], dtype=np.int64),
+                np.array([v for _, v in pairs], dtype=np.int64))
+
+    def nearest_among(self, members, k):
+        """
+        For each position in members, its k nearest other members by straight line.
+        Returns (us, vs) pairs with u < v, used to join fragments without all pairs.
+        """
+        members = np.asarray(members, dtype=np.int64)
+        sub = GridIndex(self.grid.px[members], self.grid.py[members])
+        pairs = set()
+        for i in range(len(members)):
+            for j in sub.nearest(i, min(k, len(members) - 1)):
+                u, v = int(members[i]), int(members[j])
+                pairs.add((min(u, v), max(u, v)))
+        pairs = sorted(pairs)
+        return (np.array([u for u, _ in pairs], dtype=np.int64),
+                np.array([v for _, v in pairs], dtype=np.int64))
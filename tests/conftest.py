@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+import numpy as np
+import pytest
+
+# The modules live side by side at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import perturbed_grid  # noqa: E402
+from graph_artifact import write_graph_artifact  # noqa: E402
+from tour_planner import PlannerSession  # noqa: E402
+
+def road_grid(side=8, seed=0, drop=0.2, spacing=100.0, isolated=0):
+    """
+    Small seeded road graph: benchmark.perturbed_grid with street names and travel
+    times, plus `isolated` extra nodes joined only to each other.
+    """
+    return perturbed_grid(side, seed, drop, spacing=spacing, names=True, times=True, isolated=isolated)
+
+
+def all_pairs(graph, weights=None):
+    """Floyd-Warshall distances between all node indices, as the reference for the searches."""
+    n = graph.num_nodes
+    W = np.full((n, n), np.inf)
+    np.fill_diagonal(W, 0.0)
+    weights = np.asarray(graph.lengths if weights is None else weights, dtype=np.float64)
+    for u in range(n):
+        for k in range(graph.offsets[u], graph.offsets[u + 1]):
+            v = int(graph.neighbors[k])
+            W[u, v] = min(W[u, v], weights[k])
+    for k in range(n):
+        W = np.minimum(W, W[:, k:k + 1] + W[k:k + 1, :])
+    return W
+
+
+def random_matrix(n, seed=0):
+    """Symmetric float32 Euclidean distance matrix over n random points."""
+    points = np.random.default_rng(seed).random((n, 2)) * 1000.0
+    return np.hypot(points[:, None, 0] - points[None, :, 0],
+                    points[:, None, 1] - points[None, :, 1]).astype(np.float32)
+
+
+@pytest.fixture(scope="session")
+def grid():
+    return road_grid()
+
+
+@pytest.fixture(scope="session")
+def planner_session(tmp_path_factory, grid):
+    """PlannerSession over the test grid's artifact (no GraphML) with HQ 1 and a few delivery lists."""
+    folder = tmp_path_factory.mktemp("planner")
+    write_graph_artifact(grid, str(folder / "grid.csr"))
+    with open(folder / "deliveries.json", "w") as f:
+        json.dump({"hq_node": 1, "delivery_nodes_20": list(range(3, 63, 3))}, f)
+    return PlannerSession(str(folder / "grid.graphml"), str(folder / "deliveries.json"))
@@ -0,0 +1,85 @@
+import random
+import time
+import pytest
+import anytime_solver
+from anytime_solver import double_bridge, anneal, solve_anytime
+from distance_matrix import tour_cost
+from tour_planner import greedy_edge_order
+from conftest import random_matrix
+
+
+def is_closed_tour(order, n, start=0):
+    return order[0] == order[-1] == start and sorted(order[:-1]) == list(range(n))
+
+
+def test_double_bridge_keeps_a_permutation():
+    rng = random.Random(1)
+    tour = list(range(100))
+    for _ in range(50):
+        kicked, touched = double_bridge(tour, rng, window=20)
+        assert sorted(kicked) == tour and kicked != tour
+        assert 3 <= len(touched) <= 6 and set(touched) <= set(tour)
+
+
+def test_anneal_is_seeded_and_never_worse():
+    D = random_matrix(60, seed=3)
+    order = greedy_edge_order(D)
+    best, cost, iterations, trace = anneal(order, D, time.time() + 0.3, seed=4)
+    assert is_closed_tour(best, 60) and iterations > 0
+    assert cost == pytest.approx(tour_cost(best, D), rel=1e-6)
+    assert cost <= tour_cost(order, D) + 1e-3
+    assert [entry[2] for entry in trace] == sorted((entry[2] for entry in trace), reverse=True)
+
+
+def test_anneal_skips_kicks_below_eight_stops():
+    D = random_matrix(5, seed=1)
+    best, cost, iterations, _ = anneal([0, 1, 2, 3, 4, 0], D, time.time() + 5)
+    assert is_closed_tour(best, 5) and iterations == 0
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_solve_anytime_reports_improvements_and_keeps_the_start(workers):
+    D = random_matrix(80, seed=5)
+    order = greedy_edge_order(D)
+    order = order[7:-1] + order[:7] + [order[7]]
+    seen = []
+    best, cost, runs = solve_anytime(D, order, 0.5, workers=workers, seed=2,
+                                     on_improve=lambda cost, tour, seconds: seen.append(cost))
+    assert is_closed_tour(best, 80, start=order[0])
+    assert cost <= tour_cost(order, D) + 1e-3
+    assert cost == pytest.approx(tour_cost(best, D), rel=1e-6)
+    assert len(runs) == workers and [run["seed"] for run in runs] == list(range(2, 2 + workers))
+    assert seen == sorted(seen, reverse=True) and (not seen or seen[-1] == cost)
+
+
+def interrupt(*args, **kwargs):
+    raise KeyboardInterrupt
+
+
+def test_anneal_keeps_the_input_when_interrupted_during_the_first_search(monkeypatch):
+    D = random_matrix(30, seed=6)
+    order = greedy_edge_order(D)
+    monkeypatch.setattr(anytime_solver, "improve_tour", interrupt)
+    best, cost, iterations, _ = anneal(order, D, time.time() + 5)
+    assert best == order and iterations == 0
+    assert cost == pytest.approx(tour_cost(order, D))
+
+
+def test_solve_anytime_survives_interrupted_workers(monkeypatch):
+    # Pool workers are forked with the patched anneal: odd seeds die with the
+    # KeyboardInterrupt a Ctrl+C raises before anneal's own guard
+    real_anneal = anytime_solver.anneal
+
+    def flaky_anneal(order, D, deadline, seed=0, neighbors=None, report=None):
+        if seed % 2:
+            raise KeyboardInterrupt
+        return real_anneal(order, D, deadline, seed, neighbors, report)
+    monkeypatch.setattr(anytime_solver, "anneal", flaky_anneal)
+    D = random_matrix(40, seed=7)
+    order = greedy_edge_order(D)
+    best, cost, runs = solve_anytime(D, order, 0.3, workers=2, seed=0)
+    assert is_closed_tour(best, 40) and cost <= tour_cost(order, D) + 1e-3
+    assert [run["seed"] for run in runs] == [0]
+    best, cost, runs = solve_anytime(D, order, 0.3, workers=2, seed=1)
+    assert is_closed_tour(best, 40) and cost <= tour_cost(order, D) + 1e-3
+    assert [run["seed"] for run in runs] == [2]
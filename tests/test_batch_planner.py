@@ -0,0 +1,65 @@
+import io
+import json
+import pytest
+import batch_planner
+from batch_planner import solve_instance, read_instances, run_batch
+from contraction_hierarchy import build_hierarchy, write_hierarchy, read_hierarchy
+
+HQ = 1
+
+
+@pytest.fixture
+def worker(grid, monkeypatch):
+    """Set up this process as a batch worker over the test grid."""
+    monkeypatch.setattr(batch_planner, "_worker", {})
+    batch_planner._init_worker(grid, None, None)
+
+
+def test_solves_an_instance(worker):
+    result = solve_instance(1, {"id": "a", "deliveries": [5, 18, 33, 47], "algorithm": "mst"}, HQ)
+    assert result["id"] == "a" and "error" not in result
+    assert result["tour"][0] == result["tour"][-1] == HQ and sorted(result["tour"][1:-1]) == [5, 18, 33, 47]
+    assert result["cost_m"] <= result["initial_cost_m"] + 1e-3
+
+
+def test_time_weight_reports_distance_and_time(worker):
+    result = solve_instance(1, {"deliveries": [5, 18, 33, 47], "time_weight": 1}, HQ)
+    assert result["id"] == 1 and "cost_m" not in result
+    assert result["cost"] == pytest.approx(result["time_s"], rel=1e-5)
+    assert result["distance_m"] > 0
+
+
+@pytest.mark.parametrize("instance, message", [
+    ([5, 18], "JSON object"),
+    ({"hq": 1}, "missing field 'deliveries'"),
+    ({"deliveries": [5, 999]}, "999"),
+    ({"deliveries": ["north"]}, "north"),
+    ({"deliveries": [5], "algorithm": "fastest"}, "fastest"),
+])
+def test_bad_input_returns_an_error_record(worker, instance, message):
+    result = solve_instance(7, instance, HQ)
+    assert result["id"] == 7 and message in result["error"] and "tour" not in result
+
+
+def test_read_instances_skips_blank_lines_and_keeps_bad_json():
+    lines = io.StringIO('{"id": "a", "deliveries": [5]}\n\n{not json\n')
+    parsed = list(read_instances(lines))
+    assert parsed[0] == (1, {"id": "a", "deliveries": [5]})
+    assert parsed[1][0] == 3 and parsed[1][1].startswith("invalid JSON")
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_run_batch_streams_a_result_per_instance(tmp_path, grid, use_index):
+    index = None
+    if use_index:
+        write_hierarchy(build_hierarchy(grid), str(tmp_path / "grid.ch"))
+        index = read_hierarchy(str(tmp_path / "grid.ch"))
+    lines = [json.dumps({"id": f"i{n}", "deliveries": list(range(2 + n, 40, 5))}) for n in range(5)]
+    lines += ['{"id": "bad", "deliveries": [999]}', "not json"]
+    out = io.StringIO()
+    solved, failed = run_batch(read_instances(io.StringIO("\n".join(lines))), out, grid, HQ, workers=2,
+                               index=index, cache_dir=str(tmp_path / "cache"))
+    assert (solved, failed) == (5, 2)
+    results = {r["id"]: r for r in map(json.loads, out.getvalue().splitlines())}
+    assert set(results) == {"i0", "i1", "i2", "i3", "i4", "bad", 7}
+    assert all("tour" in results[f"i{n}"] for n in range(5))
@@ -0,0 +1,45 @@
+import math
+import numpy as np
+import pytest
+import benchmark
+from routing import dijkstra
+
+
+def test_perturbed_grid_is_connected_and_seeded():
+    G = benchmark.perturbed_grid(12, seed=3)
+    assert G.num_nodes == 144
+    assert not np.isinf(dijkstra(G, 0)).any()
+    again = benchmark.perturbed_grid(12, seed=3)
+    assert np.array_equal(G.lengths, again.lengths) and np.array_equal(G.x, again.x)
+    assert not np.array_equal(G.lengths, benchmark.perturbed_grid(12, seed=4).lengths)
+
+
+def test_perturbed_grid_sits_at_the_origin():
+    G = benchmark.perturbed_grid(10, seed=0, origin=(10.0, 20.0))
+    assert math.isclose(float(np.min(G.y)), 10.0, abs_tol=0.001)
+    assert math.isclose(float(np.min(G.x)), 20.0, abs_tol=0.001)
+
+
+def test_synthetic_results_need_no_prepared_data(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    [result] = benchmark.synthetic_results([20], seed=0, workers=1, trace_memory=True, repeat=1)
+    assert result["stops"] == 20 and result["graph_nodes"] == 900
+    assert set(result["algorithms"]) == set(benchmark.ALGORITHMS)
+    for record in result["algorithms"].values():
+        assert record["cost_m"] > 0 and record["peak_mb"] >= 0
+    assert list(tmp_path.iterdir()) == []
+
+
+def report(construct_s, cost_m):
+    return {"results": [{"graph": "grid", "stops": 20,
+                         "algorithms": {"mst": {"construct_s": construct_s, "cost_m": cost_m}}}]}
+
+
+@pytest.mark.parametrize("construct_s, cost_m, regressions", [
+    (0.010, 1000.0, 0),
+    (0.030, 1000.0, 1),    # three times slower
+    (0.0101, 1000.0, 0),   # within timer noise
+    (0.010, 1100.0, 1),    # longer tour
+])
+def test_compare_flags_regressions(construct_s, cost_m, regressions):
+    assert benchmark.compare(report(construct_s, cost_m), report(0.010, 1000.0)) == regressions
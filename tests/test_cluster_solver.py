@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+from cluster_solver import (hilbert_keys, hilbert_clusters, kmeans_clusters, cluster_order, open_cycle,
+                            repair_boundaries)
+from distance_matrix import compute_distance_matrix, tour_cost
+from sparse_distances import SparseDistances
+from tour_planner import plan_clustered
+
+
+def random_points(n, seed=0):
+    points = np.random.default_rng(seed).random((n, 2)) * 10000.0
+    return points[:, 0], points[:, 1]
+
+
+def assert_partition(clusters, n):
+    assert sorted(np.concatenate(clusters).tolist()) == list(range(n))
+
+
+def test_hilbert_curve_visits_every_cell_once_through_neighbours():
+    gy, gx = np.divmod(np.arange(256), 16)
+    keys = hilbert_keys(gx, gy, order=4)
+    assert sorted(keys.tolist()) == list(range(256))
+    walk = np.argsort(keys)
+    steps = np.abs(np.diff(gx[walk])) + np.abs(np.diff(gy[walk]))
+    assert (steps == 1).all()
+
+
+@pytest.mark.parametrize("n, size", [(0, 10), (5, 10), (100, 10), (101, 25)])
+def test_hilbert_clusters_split_into_even_runs(n, size):
+    px, py = random_points(n, seed=n)
+    clusters = hilbert_clusters(px, py, size)
+    if n == 0:
+        assert clusters == []
+        return
+    assert_partition(clusters, n)
+    assert len(clusters) == -(-n // size)
+    assert max(map(len, clusters)) - min(map(len, clusters)) <= 1
+
+
+def test_kmeans_clusters_partition_and_stay_bounded():
+    px, py = random_points(500, seed=3)
+    clusters = kmeans_clusters(px, py, size=40)
+    assert_partition(clusters, 500)
+    assert all(0 < len(c) <= 80 for c in clusters)
+    again = kmeans_clusters(px, py, size=40)
+    assert all(np.array_equal(a, b) for a, b in zip(clusters, again))
+
+
+def test_kmeans_tightens_the_hilbert_runs():
+    px, py = random_points(800, seed=4)
+
+    def spread(clusters):
+        return sum(((px[c] - px[c].mean()) ** 2 + (py[c] - py[c].mean()) ** 2).sum() for c in clusters)
+    assert spread(kmeans_clusters(px, py, size=50)) <= spread(hilbert_clusters(px, py, size=50))
+
+
+def test_cluster_order_visits_every_cluster():
+    px, py = random_points(300, seed=5)
+    clusters = hilbert_clusters(px, py, 30)
+    sequence = cluster_order(px, py, clusters, (5000.0, 5000.0))
+    assert sorted(sequence) == list(range(len(clusters)))
+
+
+def test_open_cycle_drops_the_edge_between_the_neighbours():
+    # A unit square: coming from the left, leaving to the right, the path should
+    # enter at a left corner and leave at a right corner, dropping a vertical edge
+    px = np.array([0.0, 1.0, 1.0, 0.0])
+    py = np.array([0.0, 0.0, 1.0, 1.0])
+    cycle = [0, 1, 2, 3, 0]
+    edges = [1.0, 1.0, 1.0, 1.0]
+    path = open_cycle(cycle, edges, px, py, (-10.0, 0.5), (11.0, 0.5))
+    assert sorted(path) == [0, 1, 2, 3]
+    assert px[path[0]] == 0.0 and px[path[-1]] == 1.0
+    assert open_cycle([7, 7], [0.0], px, py, (0, 0), (1, 1)) == [7]
+
+
+def test_repair_boundaries_never_lengthens_the_tour(grid):
+    nodes = list(range(1, 65, 2))
+    D = SparseDistances(grid, nodes, k=3)
+    order = [0] + list(range(1, len(nodes), 2)) + list(range(2, len(nodes), 2)) + [0]
+    before = tour_cost(order, D)
+    repaired = repair_boundaries(order, D, junctions=[1, len(nodes) // 2 + 1], window=4, k=5)
+    assert sorted(repaired[:-1]) == list(range(len(nodes)))
+    assert tour_cost(repaired, D) <= before + 1e-3
+
+
+@pytest.mark.parametrize("method, workers", [("hilbert", 1), ("kmeans", 1), ("hilbert", 2)])
+def test_plan_clustered_returns_one_valid_tour(planner_session, grid, method, workers):
+    stops = [node for node in range(2, 65) if node % 7]
+    tour, cost, stitched, num_clusters, D = plan_clustered(planner_session, 1, stops, method,
+                                                          cluster_size=12, workers=workers)
+    assert tour[0] == tour[-1] == 1 and sorted(tour[1:-1]) == stops
+    assert num_clusters >= 4 and cost <= stitched + 1e-3
+    dense = compute_distance_matrix(grid, [1] + stops, workers=1)
+    position = {node: i for i, node in enumerate([1] + stops)}
+    assert cost == pytest.approx(tour_cost([position[node] for node in tour], dense), rel=1e-5)
+    with pytest.raises(ValueError):
+        plan_clustered(planner_session, 1, stops, "spectral")
@@ -0,0 +1,70 @@
+import math
+import numpy as np
+import pytest
+from contraction_hierarchy import build_hierarchy, write_hierarchy, read_hierarchy, load_hierarchy
+from distance_matrix import compute_distance_matrix
+from routing import dijkstra
+from conftest import road_grid, all_pairs
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return road_grid(side=12, seed=5, drop=0.3)
+
+
+@pytest.fixture(scope="module")
+def hierarchy(graph):
+    return build_hierarchy(graph)
+
+
+def test_every_node_gets_a_rank(graph, hierarchy):
+    assert sorted(np.asarray(hierarchy.rank).tolist()) == list(range(graph.num_nodes))
+    assert hierarchy.num_shortcuts > 0
+
+
+def test_distances_match_dijkstra(graph, hierarchy):
+    reference = all_pairs(graph)
+    for source, target in ((0, 143), (5, 77), (30, 30), (100, 12), (143, 1)):
+        assert hierarchy.distance(source, target) == pytest.approx(reference[source, target], rel=1e-9)
+
+
+def test_matrix_matches_dijkstra(graph, hierarchy):
+    sources = [0, 11, 40, 77, 100, 132, 143]
+    reference = all_pairs(graph)
+    assert np.allclose(hierarchy.matrix(sources), reference[np.ix_(sources, sources)], rtol=1e-9)
+
+
+def test_matrix_times_follow_the_shortest_paths(graph, hierarchy):
+    sources = [3, 50, 90, 141]
+    D, T = hierarchy.matrix(sources, travel_time=True)
+    for i, source in enumerate(sources):
+        dist, seconds = dijkstra(graph, source, travel_time=True)
+        assert np.allclose(D[i], [dist[s] for s in sources], rtol=1e-9)
+        assert np.allclose(T[i], [seconds[s] for s in sources], rtol=1e-9)
+
+
+def test_unreachable_pairs_are_infinite():
+    graph = road_grid(side=4, isolated=3)
+    index = build_hierarchy(graph)
+    assert math.isinf(index.distance(0, 17))
+    D = index.matrix([0, 5, 16, 18])
+    assert math.isinf(D[0, 2]) and math.isinf(D[3, 1])
+    assert D[2, 3] == pytest.approx(200.0)
+
+
+def test_distance_matrix_uses_the_index(graph, hierarchy):
+    nodes = [1, 30, 66, 99, 144]
+    assert np.allclose(compute_distance_matrix(graph, nodes, workers=1, index=hierarchy),
+                       compute_distance_matrix(graph, nodes, workers=1), rtol=1e-6)
+
+
+def test_saved_index_round_trips(tmp_path, graph, hierarchy):
+    path = str(tmp_path / "graph.ch")
+    write_hierarchy(hierarchy, path)
+    mapped = read_hierarchy(path)
+    assert np.array_equal(mapped.rank, hierarchy.rank)
+    assert np.array_equal(mapped.up_times, hierarchy.up_times)
+    assert mapped.distance(7, 120) == hierarchy.distance(7, 120)
+    assert load_hierarchy(graph, path) is not None
+    assert load_hierarchy(road_grid(side=12, seed=6), path) is None
+    assert load_hierarchy(graph, str(tmp_path / "missing.ch")) is None
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from distance_matrix import compute_distance_matrix, tour_cost, UNREACHABLE
+from conftest import road_grid, all_pairs
+
+
+def test_matrix_matches_all_pairs(grid):
+    nodes = [1, 9, 30, 64, 12]
+    D = compute_distance_matrix(grid, nodes, workers=1)
+    idx = grid.indices(nodes)
+    assert D.dtype == np.float32
+    assert np.allclose(D, all_pairs(grid)[np.ix_(idx, idx)], rtol=1e-5)
+
+
+def test_process_pool_matches_serial(grid):
+    nodes = list(range(1, 49))  # enough rows for the pool to be used
+    serial = compute_distance_matrix(grid, nodes, workers=1)
+    pooled = compute_distance_matrix(grid, nodes, workers=2)
+    assert np.array_equal(serial, pooled)
+
+
+def test_unreachable_pairs_use_the_sentinel():
+    graph = road_grid(side=4, isolated=2)
+    D = compute_distance_matrix(graph, [1, 17, 18], workers=1)
+    assert D[0, 1] == UNREACHABLE and D[1, 0] == UNREACHABLE
+    assert D[1, 2] == pytest.approx(100.0)
+
+
+def test_tour_cost_sums_the_legs():
+    D = np.array([[0, 1, 4], [1, 0, 2], [4, 2, 0]], dtype=np.float32)
+    assert tour_cost([0, 1, 2, 0], D) == pytest.approx(7.0)
+    assert tour_cost([0], D) == 0.0
+
+
+def test_predecessor_trees_expand_each_pair(grid):
+    nodes = [2, 20, 41, 63]
+    D, trees = compute_distance_matrix(grid, nodes, workers=1, predecessors=True)
+    for a in range(len(nodes)):
+        for b in range(len(nodes)):
+            length = sum(float(grid.lengths[k]) for k in trees.path(a, b))
+            assert length == pytest.approx(float(D[a, b]), rel=1e-5)
+
+
+def test_travel_time_comes_from_the_same_searches(grid):
+    nodes = list(range(1, 49))
+    D, T, trees = compute_distance_matrix(grid, nodes, workers=2, travel_time=True, predecessors=True)
+    assert np.array_equal(D, compute_distance_matrix(grid, nodes, workers=1))
+    for a, b in ((0, 5), (7, 40), (47, 3)):
+        assert T[a, b] == pytest.approx(sum(float(grid.times[k]) for k in trees.path(a, b)), rel=1e-5)
@@ -0,0 +1,73 @@
+import itertools
+import random
+import sys
+import tracemalloc
+import numpy as np
+import pytest
+from distance_matrix import tour_cost
+from exact_solver import held_karp, branch_and_bound, solve_exact, held_karp_memory
+from conftest import random_matrix
+
+
+def brute_force(D):
+    n = len(D)
+    return min(tour_cost([0, *perm, 0], D) for perm in itertools.permutations(range(1, n)))
+
+
+@pytest.mark.parametrize("n", [2, 3, 4, 6, 8])
+def test_held_karp_matches_brute_force(n):
+    for seed in range(3):
+        D = random_matrix(n, seed=seed)
+        order, cost = held_karp(D)
+        assert sorted(order[:-1]) == list(range(n)) and order[0] == order[-1] == 0
+        assert cost == pytest.approx(brute_force(D), rel=1e-5)
+        assert tour_cost(order, D) == pytest.approx(cost, rel=1e-5)
+
+
+@pytest.mark.parametrize("n", [3, 5, 7, 8])
+def test_branch_and_bound_matches_brute_force(n):
+    for seed in range(3):
+        D = random_matrix(n, seed=10 + seed)
+        order, cost, optimal = branch_and_bound(D)
+        assert optimal
+        assert sorted(order[:-1]) == list(range(n))
+        assert cost == pytest.approx(brute_force(D), rel=1e-5)
+
+
+def test_branch_and_bound_is_not_limited_by_recursion_depth():
+    # Stops on a line with a shuffled incumbent: the nearest-first dive
+    # reaches the optimal leaf only by going deeper than the recursion limit
+    n = 300
+    x = np.arange(n, dtype=np.float64) * 10.0
+    D = np.abs(x[:, None] - x[None, :]).astype(np.float32)
+    rest = list(range(1, n))
+    random.Random(0).shuffle(rest)
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(200)
+    try:
+        order, cost, _ = branch_and_bound(D, time_limit=1.0, initial=[0, *rest, 0])
+    finally:
+        sys.setrecursionlimit(limit)
+    assert sorted(order[:-1]) == list(range(n))
+    assert cost == pytest.approx(2 * x[-1])
+
+
+def test_solve_exact_falls_back_to_branch_and_bound():
+    D = random_matrix(9, seed=4)
+    _, hk_cost, _, method = solve_exact(D)
+    assert method == "held-karp"
+    _, bb_cost, optimal, method = solve_exact(D, memory_limit=held_karp_memory(9) - 1)
+    assert method == "branch-and-bound" and optimal
+    assert bb_cost == pytest.approx(hk_cost, rel=1e-5)
+
+
+@pytest.mark.parametrize("n", [16, 18, 20])
+def test_memory_estimate_covers_the_measured_peak(n):
+    D = random_matrix(n, seed=n)
+    tracemalloc.start()
+    try:
+        held_karp(D)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak <= held_karp_memory(n) <= 1.5 * peak
@@ -0,0 +1,65 @@
+import pickle
+import numpy as np
+from graph_artifact import (RoadGraph, graph_fingerprint, write_graph_artifact, read_graph_artifact,
+                            artifact_is_fresh, load_road_graph)
+from conftest import road_grid
+
+
+def test_from_edges_builds_csr(grid):
+    assert grid.num_nodes == 64
+    assert grid.offsets[0] == 0 and grid.offsets[-1] == grid.num_edges
+    for u in range(grid.num_nodes):
+        for k in range(grid.offsets[u], grid.offsets[u + 1]):
+            assert grid.edge_source(k) == u
+
+
+def test_node_ids_map_to_indices(grid):
+    assert grid.index(1) == 0
+    assert grid.indices([64, 2, 1]).tolist() == [63, 1, 0]
+
+
+def test_artifact_round_trip(tmp_path, grid):
+    path = tmp_path / "grid.csr"
+    write_graph_artifact(grid, str(path))
+    mapped = read_graph_artifact(str(path))
+    for name in ("offsets", "neighbors", "lengths", "times", "x", "y", "node_ids"):
+        assert np.array_equal(np.asarray(getattr(mapped, name)), np.asarray(getattr(grid, name)))
+    assert mapped.fingerprint == graph_fingerprint(grid)
+    assert [mapped.street_name(k) for k in range(10)] == [grid.street_name(k) for k in range(10)]
+
+
+def test_fingerprint_tracks_lengths_not_names():
+    a, b = road_grid(seed=1), road_grid(seed=1)
+    b.name_ids = np.full_like(b.name_ids, -1)
+    assert graph_fingerprint(a) == graph_fingerprint(b)
+    assert graph_fingerprint(a) != graph_fingerprint(road_grid(seed=2))
+
+
+def test_mapped_graph_pickles_as_its_path(tmp_path, grid):
+    path = tmp_path / "grid.csr"
+    write_graph_artifact(grid, str(path))
+    mapped = read_graph_artifact(str(path))
+    assert len(pickle.dumps(mapped)) < 1000
+    assert np.array_equal(pickle.loads(pickle.dumps(mapped)).lengths, grid.lengths)
+
+
+def test_stale_artifact_is_detected(tmp_path, grid):
+    source = tmp_path / "grid.graphml"
+    source.write_text("<graphml/>")
+    artifact = tmp_path / "grid.csr"
+    write_graph_artifact(grid, str(artifact), source=str(source))
+    assert artifact_is_fresh(str(artifact), str(source))
+    source.write_text("<graphml></graphml>")
+    assert not artifact_is_fresh(str(artifact), str(source))
+
+
+def test_load_prefers_fresh_artifact(tmp_path, grid):
+    artifact = tmp_path / "grid.csr"
+    write_graph_artifact(grid, str(artifact))
+    graph = load_road_graph(str(tmp_path / "missing.graphml"), str(artifact))
+    assert graph.path == str(artifact)
+
+
+def test_default_times_follow_lengths():
+    graph = RoadGraph.from_edges([1, 2], [0.0, 0.001], [0.0, 0.0], [0, 1], [1, 0], [300.0, 300.0])
+    assert np.allclose(graph.times, 300.0 * 3.6 / 30.0)
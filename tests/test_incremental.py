@@ -0,0 +1,59 @@
+import pytest
+import incremental
+from distance_matrix import compute_distance_matrix, tour_cost
+from incremental import IncrementalTour
+from tour_planner import solve
+
+
+def start(grid, hq=1, stops=(10, 20, 30, 40, 50)):
+    stops = list(stops)
+    D = compute_distance_matrix(grid, [hq] + stops, workers=1)
+    tour, _, _ = solve(hq, stops, D)
+    return IncrementalTour(grid, hq, stops, D, tour)
+
+
+def assert_consistent(plan, grid, stops, hq=1):
+    tour = plan.tour
+    assert tour[0] == tour[-1] == hq and sorted(tour[1:-1]) == sorted(stops)
+    # The incremental matrix must agree with a fresh one over the current stops
+    nodes = tour[:-1]
+    D = compute_distance_matrix(grid, nodes, workers=1)
+    assert plan.cost == pytest.approx(tour_cost(list(range(len(nodes))) + [0], D), rel=1e-6)
+
+
+def test_add_inserts_the_stop(grid):
+    plan = start(grid)
+    tour, cost = plan.add(64)
+    assert 64 in tour and cost == plan.cost
+    assert_consistent(plan, grid, [10, 20, 30, 40, 50, 64])
+
+
+def test_remove_closes_the_gap_and_reuses_the_slot(grid):
+    plan = start(grid)
+    before = plan.cost
+    slot = plan.slot[30]
+    tour, cost = plan.remove(30)
+    assert 30 not in tour and cost <= before + 1e-3
+    assert_consistent(plan, grid, [10, 20, 40, 50])
+    plan.add(33)
+    assert plan.slot[33] == slot
+    assert_consistent(plan, grid, [10, 20, 33, 40, 50])
+
+
+def test_matrix_grows_past_the_spare_slots(grid, monkeypatch):
+    monkeypatch.setattr(incremental, "SPARE_SLOTS", 1)
+    plan = start(grid)
+    added = [3, 17, 26, 44, 58, 61]
+    for node in added:
+        plan.add(node)
+    assert len(plan.D) >= 6 + len(added)
+    assert_consistent(plan, grid, [10, 20, 30, 40, 50] + added)
+
+
+def test_repeated_and_unknown_changes_are_ignored(grid):
+    plan = start(grid)
+    tour = plan.tour
+    assert plan.add(20)[0] == tour
+    assert plan.remove(63)[0] == tour
+    with pytest.raises(ValueError):
+        plan.remove(1)
@@ -0,0 +1,75 @@
+import json
+import time
+from collections import Counter, defaultdict
+import pytest
+import instrumentation
+from distance_matrix import compute_distance_matrix
+
+
+@pytest.fixture(autouse=True)
+def fresh_profile(monkeypatch):
+    """Give each test empty module state, restored afterwards."""
+    monkeypatch.setattr(instrumentation, "_enabled", False)
+    monkeypatch.setattr(instrumentation, "_phase_seconds", defaultdict(float))
+    monkeypatch.setattr(instrumentation, "_phase_calls", Counter())
+    monkeypatch.setattr(instrumentation, "_phase_order", [])
+    monkeypatch.setattr(instrumentation, "_counters", Counter())
+
+
+def test_everything_is_a_no_op_until_enabled():
+    with instrumentation.phase("work"):
+        instrumentation.add("items", 5)
+    assert instrumentation.phase("work") is instrumentation.phase("other")
+    data = instrumentation.report()
+    assert data["phases"] == [] and data["counters"] == {}
+
+
+def test_phases_are_timed_in_first_use_order():
+    instrumentation.enable()
+    for _ in range(2):
+        with instrumentation.phase("outer"):
+            with instrumentation.phase("inner"):
+                time.sleep(0.01)
+    phases = instrumentation.report()["phases"]
+    assert [(p["name"], p["calls"]) for p in phases] == [("outer", 2), ("inner", 2)]
+    assert phases[0]["seconds"] >= phases[1]["seconds"] >= 0.02
+
+
+def test_phase_is_recorded_when_the_body_raises():
+    instrumentation.enable()
+    with pytest.raises(RuntimeError):
+        with instrumentation.phase("failing"):
+            raise RuntimeError
+    assert instrumentation.report()["phases"][0]["calls"] == 1
+
+
+def test_counters_move_between_processes_by_take_and_merge():
+    instrumentation.enable()
+    instrumentation.add("items", 3)
+    instrumentation.add("items")
+    counts = instrumentation.take_counters()
+    assert counts == {"items": 4} and instrumentation.report()["counters"] == {}
+    instrumentation.merge_counters(counts)
+    instrumentation.merge_counters({"items": 1, "other": 2})
+    assert instrumentation.report()["counters"] == {"items": 5, "other": 2}
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_matrix_search_counts_include_pool_workers(grid, workers):
+    instrumentation.enable()
+    nodes = list(range(1, 49))
+    compute_distance_matrix(grid, nodes, workers=workers)
+    counters = instrumentation.report()["counters"]
+    assert counters["dijkstra searches"] == len(nodes)
+    assert counters["matrix rows computed"] == len(nodes)
+    assert "matrix: shortest-path searches" in [p["name"] for p in instrumentation.report()["phases"]]
+
+
+def test_write_report_saves_json(tmp_path, capsys):
+    instrumentation.enable()
+    with instrumentation.phase("work"):
+        instrumentation.add("items", 2)
+    path = tmp_path / "profile.json"
+    data = instrumentation.write_report(str(path))
+    assert json.loads(path.read_text()) == data
+    assert "work" in capsys.readouterr().out
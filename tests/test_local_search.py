@@ -0,0 +1,65 @@
+import random
+import numpy as np
+import pytest
+from distance_matrix import tour_cost
+from local_search import candidate_neighbors, improve_tour, LazyNeighbors
+from conftest import random_matrix
+
+
+def random_order(n, seed):
+    rest = list(range(1, n))
+    random.Random(seed).shuffle(rest)
+    return [0] + rest + [0]
+
+
+@pytest.mark.parametrize("n", [1, 2, 4, 5, 12, 80])
+def test_improve_keeps_a_valid_tour_and_never_costs_more(n):
+    D = random_matrix(n, seed=n)
+    for seed in range(3):
+        order = random_order(n, seed)
+        improved = improve_tour(order, D)
+        assert improved[0] == improved[-1] == 0
+        assert sorted(improved[:-1]) == list(range(n))
+        assert tour_cost(improved, D) <= tour_cost(order, D) + 1e-3
+
+
+def test_improve_keeps_a_non_zero_start():
+    D = random_matrix(30, seed=3)
+    order = random_order(30, 1)
+    order = order[5:-1] + order[:5] + [order[5]]
+    improved = improve_tour(order, D)
+    assert improved[0] == improved[-1] == order[0]
+
+
+def test_improve_untangles_a_crossing():
+    # Square corners visited diagonally: 2-opt must find the perimeter
+    points = np.array([[0, 0], [1, 1], [1, 0], [0, 1], [0.5, -0.1]], dtype=np.float64)
+    D = np.hypot(points[:, None, 0] - points[None, :, 0], points[:, None, 1] - points[None, :, 1])
+    improved = improve_tour([0, 1, 2, 3, 4, 0], D.astype(np.float32))
+    assert tour_cost(improved, D) == pytest.approx(4.0 - 1.0 + 2 * np.hypot(0.5, 0.1), rel=1e-5)
+
+
+def test_active_subset_still_returns_a_valid_tour():
+    D = random_matrix(60, seed=7)
+    order = improve_tour(random_order(60, 2), D)
+    improved = improve_tour(order, D, active=order[10:15])
+    assert sorted(improved[:-1]) == list(range(60))
+    assert tour_cost(improved, D) <= tour_cost(order, D) + 1e-3
+
+
+def test_candidate_neighbors_are_nearest_first():
+    D = random_matrix(40, seed=4)
+    near = candidate_neighbors(D, k=5)
+    for a, row in enumerate(near):
+        assert a not in row
+        expected = [b for b in np.argsort(D[a], kind="stable").tolist() if b != a][:5]
+        assert sorted(D[a, row].tolist()) == sorted(D[a, expected].tolist())
+        assert D[a, row].tolist() == sorted(D[a, row].tolist())
+
+
+def test_lazy_neighbors_match_dense_lists():
+    D = random_matrix(40, seed=5)
+    lazy = LazyNeighbors(D, range(40), k=5)
+    dense = candidate_neighbors(D, k=5)
+    for a in (0, 17, 39):
+        assert lazy[a] == dense[a]
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+from distance_matrix import compute_distance_matrix
+from matrix_cache import MatrixRowCache
+from conftest import road_grid
+
+
+def test_put_then_get_returns_the_row(tmp_path, grid):
+    cache = MatrixRowCache(grid, str(tmp_path))
+    assert cache.get(3) is None
+    row = np.arange(grid.num_nodes, dtype=np.float32)
+    cache.put(3, row)
+    assert np.array_equal(cache.get(3), row)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_rows_are_kept_per_graph(tmp_path):
+    a = MatrixRowCache(road_grid(seed=1), str(tmp_path))
+    b = MatrixRowCache(road_grid(seed=2), str(tmp_path))
+    a.put(0, np.zeros(64, dtype=np.float32))
+    assert b.get(0) is None
+
+
+def test_evict_drops_least_recently_used_rows(tmp_path, grid):
+    cache = MatrixRowCache(grid, str(tmp_path), max_bytes=0)
+    for source in range(3):
+        cache.put(source, np.zeros(grid.num_nodes, dtype=np.float32))
+        os.utime(cache._path(source), ns=(source * 10 ** 9, source * 10 ** 9))
+    size = os.path.getsize(cache._path(0))
+    cache.max_bytes = 2 * size
+    assert cache.evict() == 2 * size
+    assert cache.get(0) is None
+    assert cache.get(2) is not None
+
+
+def test_matrix_reads_cached_rows(tmp_path, grid):
+    nodes = [1, 10, 20, 40]
+    cache = MatrixRowCache(grid, str(tmp_path))
+    first = compute_distance_matrix(grid, nodes, workers=1, cache=cache)
+    assert cache.misses == len(nodes)
+    again = MatrixRowCache(grid, str(tmp_path))
+    assert np.array_equal(compute_distance_matrix(grid, nodes, workers=1, cache=again), first)
+    assert again.hits == len(nodes) and again.misses == 0
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from graph_artifact import read_graph_artifact
+from osm_import import (is_drivable, read_drivable_ways, read_node_coordinates, build_street_graph,
+                        haversine, import_osm_extract)
+
+# (row, column) of each node on a 0.001 degree lattice
+POINTS = {1: (0, 0), 2: (0, 1), 3: (0, 2), 4: (0, 3), 5: (-1, 1), 6: (1, 1), 7: (1, 3),
+          9: (5, 5), 11: (-1, 2), 12: (-2, 3), 13: (-1, 3)}
+WAYS = [
+    (100, [1, 2, 3, 4], {"highway": "residential", "name": "Main Road"}),
+    (101, [5, 2, 6], {"highway": "primary", "maxspeed": "60"}),
+    (102, [4, 7], {"highway": "footway"}),
+    (103, [3, 11, 12, 13, 3], {"highway": "residential", "name": "Ring Road"}),  # loop back to 3
+]
+
+
+def coordinates(node):
+    row, column = POINTS[node]
+    return 24.82 + row * 0.001, 67.07 + column * 0.001
+
+
+@pytest.fixture
+def extract(tmp_path):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    lines += [f'<node id="{node}" lat="{lat}" lon="{lon}"/>' for node, (lat, lon) in
+              ((node, coordinates(node)) for node in POINTS)]
+    for way_id, refs, tags in WAYS:
+        lines.append(f'<way id="{way_id}">')
+        lines += [f'<nd ref="{ref}"/>' for ref in refs]
+        lines += [f'<tag k="{k}" v="{v}"/>' for k, v in tags.items()]
+        lines.append('</way>')
+    lines.append('</osm>')
+    path = tmp_path / "extract.osm"
+    path.write_text("\n".join(lines), encoding="utf-8")
+    return str(path)
+
+
+def neighbors(adjacency, node):
+    return sorted(v for v, _, _ in adjacency[node])
+
+
+def test_is_drivable_matches_the_drive_filter():
+    assert is_drivable({"highway": "residential"})
+    assert not is_drivable({"name": "No highway tag"})
+    assert not is_drivable({"highway": "footway"})
+    assert not is_drivable({"highway": "service", "service": "driveway"})
+    assert not is_drivable({"highway": "primary", "access": "private"})
+    assert not is_drivable({"highway": "tertiary", "motor_vehicle": "no"})
+
+
+def test_streaming_passes_keep_drivable_ways_and_their_nodes(extract):
+    ways = read_drivable_ways(extract)
+    assert [way_id for way_id, _, _ in ways] == [100, 101, 103]
+    assert ways[1][2] == {"highway": "primary", "maxspeed": "60"}
+    coords = read_node_coordinates(extract, {1, 2, 12})
+    assert set(coords) == {1, 2, 12}
+    assert coords[12] == pytest.approx(coordinates(12))
+
+
+def test_ways_are_split_at_intersections(extract):
+    ways = read_drivable_ways(extract)
+    adjacency = build_street_graph(ways, read_node_coordinates(extract, set(POINTS)))
+    assert neighbors(adjacency, 2) == [1, 3, 5, 6]
+    assert neighbors(adjacency, 1) == [2]
+    assert 7 not in adjacency
+    length = next(d for v, d, _ in adjacency[1] if v == 2)
+    assert length == pytest.approx(haversine(coordinates(1), coordinates(2)))
+
+
+def test_ring_roads_are_split_instead_of_dropped(extract):
+    ways = read_drivable_ways(extract)
+    adjacency = build_street_graph(ways, read_node_coordinates(extract, set(POINTS)))
+    assert neighbors(adjacency, 3) == [2, 4, 12, 12]
+    assert neighbors(adjacency, 12) == [3, 3]
+    ring = [coordinates(node) for node in (3, 11, 12, 13, 3)]
+    total = sum(haversine(a, b) for a, b in zip(ring, ring[1:]))
+    assert sum(d for _, d, _ in adjacency[12]) == pytest.approx(total)
+
+
+def test_clipped_ways_restart_after_the_missing_node(extract):
+    ways = read_drivable_ways(extract)
+    coords = read_node_coordinates(extract, set(POINTS) - {11})
+    adjacency = build_street_graph(ways, coords)
+    assert neighbors(adjacency, 3) == [2, 4, 12]
+    assert neighbors(adjacency, 12) == [3]
+    length = haversine(coordinates(12), coordinates(13)) + haversine(coordinates(13), coordinates(3))
+    assert adjacency[12][0][1] == pytest.approx(length)
+
+
+def test_import_writes_the_region(tmp_path, extract):
+    graphml, artifact = str(tmp_path / "graph.graphml"), str(tmp_path / "graph.csr")
+    hq, region, num_edges = import_osm_extract(extract, *coordinates(1), target_node_count=7,
+                                               graphml=graphml, artifact=artifact)
+    assert hq == 1 and region[0] == 1 and sorted(region) == [1, 2, 3, 4, 5, 6, 12]
+    assert num_edges == 6  # the ring's two parallel edges keep the shorter one
+    graph = read_graph_artifact(artifact)
+    assert graph.num_nodes == 7 and graph.num_edges == 2 * num_edges
+    assert np.asarray(graph.node_ids).tolist() == list(range(1, 8))
+    with pytest.raises(ValueError):
+        import_osm_extract(extract, *coordinates(1), target_node_count=8, graphml=graphml, artifact=artifact)
@@ -0,0 +1,67 @@
+import csv
+import json
+import pytest
+from distance_matrix import compute_distance_matrix, tour_cost
+from route_export import export_tour, street_sequence, CSV_COLUMNS
+from sparse_distances import SparseDistances
+from conftest import road_grid
+
+NODES = [1, 12, 30, 47, 64, 20]
+ORDER = [0, 2, 1, 5, 3, 4, 0]
+
+
+@pytest.fixture(scope="module")
+def planned(grid):
+    D, trees = compute_distance_matrix(grid, NODES, workers=1, predecessors=True)
+    return D, trees
+
+
+def test_geojson_legs_add_up_to_the_tour(tmp_path, grid, planned):
+    D, trees = planned
+    path = tmp_path / "tour.geojson"
+    total = export_tour(str(path), grid, NODES, ORDER, trees)
+    assert total == pytest.approx(tour_cost(ORDER, D), rel=1e-5)
+
+    features = json.loads(path.read_text(encoding="utf-8"))["features"]
+    points, lines = features[0::2], features[1::2]
+    assert [f["properties"]["node"] for f in points] == [NODES[i] for i in ORDER[:-1]]
+    assert sum(f["properties"]["length_m"] for f in lines) == pytest.approx(total, abs=0.1 * len(lines))
+    for point, line in zip(points, lines):
+        assert line["geometry"]["coordinates"][0] == point["geometry"]["coordinates"]
+    first = grid.index(NODES[ORDER[1]])
+    assert lines[0]["geometry"]["coordinates"][-1] == [float(grid.x[first]), float(grid.y[first])]
+
+
+def test_csv_rows_follow_the_roads(tmp_path, grid, planned):
+    D, trees = planned
+    path = tmp_path / "tour.csv"
+    total = export_tour(str(path), grid, NODES, ORDER, trees)
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert tuple(rows[0]) == CSV_COLUMNS
+    assert float(rows[-1]["distance_m"]) == pytest.approx(total, abs=0.1)
+    assert int(rows[0]["from_node"]) == NODES[0] and int(rows[-1]["to_node"]) == NODES[0]
+    for prev, row in zip(rows, rows[1:]):
+        assert row["from_node"] == prev["to_node"]
+    assert len({row["leg"] for row in rows}) == len(ORDER) - 1
+
+
+def test_sparse_distances_expand_the_same_paths(tmp_path, grid, planned):
+    D, trees = planned
+    sparse = SparseDistances(grid, NODES, k=2)
+    dense_total = export_tour(str(tmp_path / "dense.csv"), grid, NODES, ORDER, trees)
+    assert export_tour(str(tmp_path / "sparse.csv"), grid, NODES, ORDER, sparse) == pytest.approx(dense_total)
+
+
+def test_street_sequence_drops_repeats_and_unnamed(grid):
+    names = {grid.street_name(k): k for k in range(grid.num_edges)}
+    a, b = list(names.values())[:2]
+    assert street_sequence(grid, [a, a, b, a]) == [grid.street_name(a), grid.street_name(b), grid.street_name(a)]
+    graph = road_grid(side=2, isolated=2)
+    unnamed = [k for k in range(graph.num_edges) if not graph.street_name(k)]
+    assert unnamed and street_sequence(graph, unnamed) == []
+
+
+def test_unknown_format_is_rejected(tmp_path, grid, planned):
+    with pytest.raises(ValueError):
+        export_tour(str(tmp_path / "tour.kml"), grid, NODES, ORDER, planned[1])
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import numpy as np
+import pytest
+from distance_matrix import compute_distance_matrix
+from matrix_cache import MatrixRowCache
+from route_service import HotRows, RouteService, EVICT_EVERY
+
+
+@pytest.fixture(scope="module")
+def service(grid):
+    service = RouteService(grid, hq=1, workers=1)
+    yield service
+    service.close()
+
+
+async def exchange(port, method, path, body=None):
+    """One HTTP exchange over TCP, read until the server closes the connection."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+    response = await asyncio.wait_for(reader.read(), timeout=30)
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+def fetch_all(service, requests):
+    """Send (method, path, body) requests to the service at the same time; returns (status, body) each."""
+    async def run():
+        server = await asyncio.start_server(service.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await asyncio.gather(*(exchange(port, *request) for request in requests))
+    return asyncio.run(run())
+
+
+def fetch(service, method, path, body=None):
+    return fetch_all(service, [(method, path, body)])[0]
+
+
+def test_hot_rows_evict_least_recently_used():
+    rows = HotRows(None, max_rows=2)
+    for source in range(3):
+        rows.put(source, np.full(4, source, dtype=np.float32))
+        rows.get(0)
+    assert rows.get(1) is None
+    assert rows.get(0) is not None and rows.get(2) is not None
+
+
+def test_hot_rows_fall_back_to_disk(tmp_path, grid):
+    disk = MatrixRowCache(grid, str(tmp_path))
+    HotRows(disk).save(7, np.arange(grid.num_nodes, dtype=np.float32))
+    rows = HotRows(disk)
+    assert np.array_equal(rows.get(7), np.arange(grid.num_nodes, dtype=np.float32))
+    assert 7 in rows.rows
+
+
+def test_matrix_matches_the_distance_matrix(service, grid):
+    nodes = [1, 9, 30, 64, 12]
+    D = asyncio.run(service.matrix(nodes))
+    assert np.array_equal(D, compute_distance_matrix(grid, nodes, workers=1))
+
+
+def test_route_request_returns_a_tour(service):
+    stops = [5, 18, 33, 47, 60]
+    status, body = fetch(service, "POST", "/route", {"deliveries": stops, "algorithm": "mst"})
+    assert status == 200
+    assert body["tour"][0] == body["tour"][-1] == 1 and sorted(body["tour"][1:-1]) == stops
+    assert body["cost_m"] <= body["initial_cost_m"] + 1e-3
+
+
+def test_health_and_errors(service):
+    status, body = fetch(service, "GET", "/health")
+    assert status == 200 and body["status"] == "ok" and body["nodes"] == 64
+    assert fetch(service, "POST", "/route", {"deliveries": [5, 999]})[0] == 400
+    assert fetch(service, "POST", "/route", {"deliveries": [5], "algorithm": "nope"})[0] == 400
+    assert fetch(service, "POST", "/route", {})[0] == 400
+    assert fetch(service, "GET", "/missing")[0] == 404
+
+
+def test_saved_rows_are_evicted_to_the_size_limit(tmp_path, grid):
+    row = np.zeros(grid.num_nodes, dtype=np.float32)
+    disk = MatrixRowCache(grid, str(tmp_path))
+    disk.put(0, row)
+    size = os.path.getsize(disk._path(0))
+    disk.max_bytes = 4 * size
+    rows = HotRows(disk)
+    for source in range(EVICT_EVERY):
+        rows.save(source, row)
+    assert len(os.listdir(disk.row_dir)) <= 4
+
+
+def test_concurrent_requests_share_the_service(tmp_path, grid):
+    service = RouteService(grid, hq=1, workers=1, cache_dir=str(tmp_path), cache_bytes=0)
+    try:
+        deliveries = [[5, 18, 33], [18, 33, 47, 60], [2, 64, 33], [9, 10, 11, 12], [5, 60]]
+        requests = [("POST", "/route", {"deliveries": stops}) for stops in deliveries]
+        responses = fetch_all(service, requests + [("GET", "/health", None)])
+        for stops, (status, body) in zip(deliveries, responses):
+            assert status == 200 and sorted(body["tour"][1:-1]) == sorted(stops)
+        assert responses[-1][0] == 200
+        assert service.served == len(deliveries)
+    finally:
+        service.close()
+    # Every row was written to disk, and closing trimmed the cache to its limit
+    assert service.rows.saved == len({1, *sum(deliveries, [])})
+    assert os.listdir(service.rows.disk.row_dir) == []
+
+
+def test_time_matrix_matches_the_distance_matrix(service, grid):
+    nodes = [1, 9, 30, 64, 12]
+    D, T = asyncio.run(service.matrix(nodes, travel_time=True))
+    expected_D, expected_T = compute_distance_matrix(grid, nodes, workers=1, travel_time=True)
+    assert np.array_equal(D, expected_D)
+    assert np.allclose(T, expected_T, rtol=1e-5)
+
+
+def test_time_weight_plans_by_driving_time(service):
+    stops = [5, 18, 33, 47, 60]
+    status, body = fetch(service, "POST", "/route", {"deliveries": stops, "time_weight": 1})
+    assert status == 200 and "cost_m" not in body
+    assert body["cost"] == pytest.approx(body["time_s"], rel=1e-5)
+    assert body["distance_m"] > body["time_s"] > 0
@@ -0,0 +1,48 @@
+import math
+import numpy as np
+import pytest
+from routing import dijkstra, path_edges, shortest_path, shortest_path_length
+from conftest import road_grid, all_pairs
+
+
+def test_dijkstra_matches_all_pairs(grid):
+    reference = all_pairs(grid)
+    for source in (0, 17, 63):
+        assert np.allclose(dijkstra(grid, source), reference[source], rtol=1e-6)
+
+
+def test_targets_are_final_when_search_stops_early(grid):
+    full = dijkstra(grid, 5)
+    early = dijkstra(grid, 5, targets=[6, 40])
+    assert early[6] == pytest.approx(full[6])
+    assert early[40] == pytest.approx(full[40])
+
+
+def test_unreachable_nodes_stay_infinite():
+    graph = road_grid(side=4, isolated=2)
+    dist = dijkstra(graph, 0)
+    assert math.isinf(dist[16]) and math.isinf(dist[17])
+    assert shortest_path_length(graph, 16, 17) == pytest.approx(100.0)
+
+
+def test_path_edges_add_up_to_the_distance(grid):
+    dist, pred = dijkstra(grid, 3, predecessors=True)
+    for target in (3, 20, 60):
+        edges = path_edges(grid, pred, 3, target)
+        assert sum(float(grid.lengths[k]) for k in edges) == pytest.approx(dist[target], rel=1e-5)
+        if edges:
+            assert grid.edge_source(edges[0]) == 3
+            assert int(grid.neighbors[edges[-1]]) == target
+
+
+def test_shortest_path_raises_when_unreachable():
+    graph = road_grid(side=4, isolated=2)
+    with pytest.raises(ValueError):
+        shortest_path(graph, 0, 17)
+
+
+def test_travel_time_sums_along_the_shortest_path(grid):
+    dist, pred, seconds = dijkstra(grid, 9, predecessors=True, travel_time=True)
+    for target in (0, 33, 62):
+        edges = path_edges(grid, pred, 9, target)
+        assert seconds[target] == pytest.approx(sum(float(grid.times[k]) for k in edges), rel=1e-5)
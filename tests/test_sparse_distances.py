@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from distance_matrix import compute_distance_matrix, tour_cost
+from sparse_distances import GridIndex, SparseDistances
+from tour_planner import greedy_edge_order, mst_tour, priority_based_tour
+from conftest import road_grid
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return road_grid(side=12, seed=7)
+
+
+@pytest.fixture(scope="module")
+def stops():
+    return list(range(1, 145, 3))
+
+
+def brute_nearest(px, py, i, k):
+    dist = np.hypot(px - px[i], py - py[i])
+    dist[i] = np.inf
+    return np.sort(dist)[:min(k, len(px) - 1)]
+
+
+@pytest.mark.parametrize("seed, k", [(0, 1), (1, 5), (2, 12), (3, 300)])
+def test_grid_index_nearest_matches_brute_force(seed, k):
+    rng = np.random.default_rng(seed)
+    # Uneven density: a dense cluster inside a sparse field
+    points = np.concatenate([rng.random((150, 2)) * 5000.0, 2000.0 + rng.random((100, 2)) * 50.0])
+    index = GridIndex(points[:, 0], points[:, 1])
+    for i in (0, 77, 160, 249):
+        near = index.nearest(i, k)
+        assert i not in near and len(near) == len(set(near))
+        dist = np.hypot(points[near, 0] - points[i, 0], points[near, 1] - points[i, 1])
+        assert np.allclose(dist, brute_nearest(points[:, 0], points[:, 1], i, k))
+
+
+def test_grid_index_handles_tiny_inputs():
+    assert GridIndex([5.0], [5.0]).nearest(0, 3) == []
+    assert GridIndex([0.0, 0.0, 3.0], [0.0, 0.0, 4.0]).nearest(2, 1) in ([0], [1])
+
+
+def test_known_pairs_are_road_distances(graph, stops):
+    D = SparseDistances(graph, stops, k=4)
+    dense = compute_distance_matrix(graph, stops, workers=1)
+    assert len(D) == len(stops) and D.num_pairs >= len(stops) * 4 // 2
+    for a, near in enumerate(D.neighbors):
+        assert len(near) >= 4
+        assert [D.rows[a][b] for b in near] == pytest.approx([float(dense[a, b]) for b in near], rel=1e-5)
+
+
+def test_other_pairs_are_searched_on_demand(graph, stops):
+    D = SparseDistances(graph, stops, k=3)
+    dense = compute_distance_matrix(graph, stops, workers=1)
+    assert D.item(0, len(stops) - 1) == pytest.approx(float(dense[0, -1]), rel=1e-5)
+    rows, cols = [0, 5, 9, 30], [40, 1, 33, 2]
+    assert np.allclose(D[rows, cols], dense[rows, cols], rtol=1e-5)
+    order = list(range(len(stops))) + [0]
+    assert tour_cost(order, D) == pytest.approx(tour_cost(order, dense), rel=1e-5)
+
+
+def test_add_pairs_extends_the_candidate_lists(graph, stops):
+    D = SparseDistances(graph, stops, k=2)
+    far = int(np.argmax(np.hypot(D.grid.px - D.grid.px[0], D.grid.py - D.grid.py[0])))
+    assert far not in D.neighbors[0]
+    D.add_pairs([0], [far])
+    assert far in D.neighbors[0] and 0 in D.neighbors[far]
+    D.add_pairs([1], [far], dists=[1.0])
+    assert D.neighbors[far][0] == 1 and D.item(far, 1) == 1.0
+
+
+def test_candidate_pairs_and_nearest_among(graph, stops):
+    D = SparseDistances(graph, stops, k=3)
+    us, vs = D.candidate_pairs()
+    assert (us < vs).all() and len(us) == D.num_pairs
+    members = [0, 4, 8, 12, 20]
+    us, vs = D.nearest_among(members, 2)
+    assert (us < vs).all() and set(us.tolist()) | set(vs.tolist()) <= set(members)
+
+
+def test_tour_builders_accept_sparse_distances(graph, stops):
+    D = SparseDistances(graph, stops, k=4)
+    order = greedy_edge_order(D)
+    assert order[0] == order[-1] == 0 and sorted(order[:-1]) == list(range(len(stops)))
+    tour, cost = mst_tour(stops[0], stops[1:], D)
+    assert sorted(tour[:-1]) == sorted(stops)
+    with pytest.raises(ValueError):
+        priority_based_tour(stops[0], stops[1:], D, {node: 1 for node in stops})
+
+
+def test_disconnected_stops_use_the_sentinel():
+    graph = road_grid(side=4, isolated=3)
+    D = SparseDistances(graph, [1, 2, 17, 18, 19], k=1)
+    order = greedy_edge_order(D)
+    assert sorted(order[:-1]) == list(range(5))
+    assert D.item(0, 3) == compute_distance_matrix(graph, [1, 18], workers=1)[0, 1]
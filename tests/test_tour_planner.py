@@ -0,0 +1,242 @@
+import itertools
+import os
+import pickle
+import subprocess
+import sys
+import numpy as np
+import pytest
+from distance_matrix import compute_distance_matrix, tour_cost, UNREACHABLE
+from tour_planner import (dijkstra_tsp_tour, greedy_edge_order, prim_mst, mst_preorder, mst_tour,
+                          priority_based_tour, weighted_score, split_giant_tour, plan_fleet, solve,
+                          PlannerSession)
+from conftest import random_matrix, road_grid
+
+
+def assert_closed_tour(order, n, start=0):
+    assert order[0] == order[-1] == start
+    assert sorted(order[:-1]) == list(range(n))
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 10, 50])
+def test_greedy_edge_order_is_a_closed_tour(n):
+    assert_closed_tour(greedy_edge_order(random_matrix(n, seed=n)), n)
+
+
+def test_greedy_edge_order_joins_fragments_beyond_k():
+    # Two far-apart groups: the k nearest lists never cross between them
+    D = random_matrix(40, seed=2)
+    D[:20, 20:] += 1e5
+    D[20:, :20] += 1e5
+    assert_closed_tour(greedy_edge_order(D, k=3), 40)
+
+
+def test_dijkstra_tsp_tour_builds_its_own_matrix(grid):
+    hq, stops = 1, [5, 18, 33, 47, 64, 60, 12]
+    tour, cost = dijkstra_tsp_tour(hq, stops, grid)
+    assert tour[0] == tour[-1] == hq and sorted(tour[1:-1]) == sorted(stops)
+    D = compute_distance_matrix(grid, [hq] + stops, workers=1)
+    position = {node: i for i, node in enumerate([hq] + stops)}
+    assert cost == pytest.approx(tour_cost([position[node] for node in tour], D), rel=1e-6)
+    assert dijkstra_tsp_tour(hq, stops, None, D) == (tour, cost)
+
+
+def kruskal_weight(W):
+    n = len(W)
+    group = list(range(n))
+
+    def find(a):
+        while group[a] != a:
+            a = group[a]
+        return a
+
+    total = 0.0
+    for w, u, v in sorted((W[u, v], u, v) for u in range(n) for v in range(u + 1, n)):
+        if find(u) != find(v):
+            group[find(u)] = find(v)
+            total += w
+    return total
+
+
+@pytest.mark.parametrize("n", [2, 5, 30])
+def test_prim_mst_has_minimum_weight(n):
+    parent, W = prim_mst(random_matrix(n, seed=n))
+    assert parent[0] == -1
+    assert sum(W[v, parent[v]] for v in range(1, n)) == pytest.approx(kruskal_weight(W), rel=1e-9)
+
+
+def test_prim_mst_reads_the_upper_triangle():
+    D = random_matrix(12, seed=3)
+    D[np.tril_indices(12, -1)] = 0.0
+    parent, W = prim_mst(D)
+    assert np.array_equal(W, W.T)
+    assert sum(W[v, parent[v]] for v in range(1, 12)) == pytest.approx(kruskal_weight(W), rel=1e-9)
+
+
+def test_preorder_visits_shorter_children_first():
+    parent = np.array([-1, 0, 0, 1])
+    W = np.array([[0, 5, 2, 0], [5, 0, 0, 1], [2, 0, 0, 0], [0, 1, 0, 0]], dtype=np.float64)
+    assert mst_preorder(parent, W) == [0, 2, 1, 3]
+
+
+def networkx_mst_tour(D):
+    """The networkx MST tour mst_tour replaced: Kruskal over the upper triangle, then a preorder walk."""
+    nx = pytest.importorskip("networkx")
+    complete = nx.Graph()
+    for u, v in itertools.combinations(range(len(D)), 2):
+        complete.add_edge(u, v, weight=float(D[u, v]))
+    return list(nx.dfs_preorder_nodes(nx.minimum_spanning_tree(complete), source=0)) + [0]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_mst_tour_matches_the_networkx_version(seed):
+    n = 5 + 3 * seed
+    D = random_matrix(n, seed=100 + seed)
+    # Lower triangle noise: both versions must read the upper triangle only
+    D = D + np.tril(np.random.default_rng(seed).random((n, n)) * 50, -1).astype(np.float32)
+    tour, _ = mst_tour(0, list(range(1, n)), D)
+    assert tour == networkx_mst_tour(D)
+
+
+def test_mst_tour_matches_the_networkx_version_on_roads():
+    graph = road_grid(side=6, seed=3, isolated=3)
+    nodes = [1, 8, 15, 22, 29, 36, 37, 38, 39, 3, 33]
+    D = compute_distance_matrix(graph, nodes, workers=1)
+    assert (D == UNREACHABLE).any()
+    tour, _ = mst_tour(nodes[0], nodes[1:], D)
+    assert tour == [nodes[i] for i in networkx_mst_tour(D)]
+
+
+def test_mst_tour_is_within_twice_the_tree(grid):
+    nodes = [1, 8, 20, 27, 38, 45, 57, 64]
+    D = compute_distance_matrix(grid, nodes, workers=1)
+    tour, cost = mst_tour(nodes[0], nodes[1:], D)
+    assert tour[0] == tour[-1] == nodes[0] and sorted(tour[:-1]) == sorted(nodes)
+    parent, W = prim_mst(D)
+    assert cost <= 2 * sum(W[v, parent[v]] for v in range(1, len(nodes))) + 1e-3
+
+
+def nearest_neighbor_order(D):
+    order, left = [0], set(range(1, len(D)))
+    while left:
+        order.append(min(left, key=lambda b: (D[order[-1], b], b)))
+        left.remove(order[-1])
+    return order + [0]
+
+
+def test_priority_weight_one_follows_priorities():
+    D = random_matrix(8, seed=1)
+    stops = list(range(101, 108))
+    priority_map = {node: node - 100 for node in stops}
+    tour, _ = priority_based_tour(100, stops, D, priority_map, score=weighted_score(1.0))
+    assert tour == [100] + sorted(stops, key=priority_map.get, reverse=True) + [100]
+
+
+def test_priority_weight_zero_is_nearest_neighbor():
+    D = random_matrix(15, seed=2)
+    stops = list(range(1, 15))
+    tour, cost = priority_based_tour(0, stops, D, {node: 1 for node in stops}, score=weighted_score(0.0))
+    assert tour == nearest_neighbor_order(D)
+    assert cost == pytest.approx(tour_cost(tour, D), rel=1e-6)
+
+
+def test_tiers_finish_each_priority_class_first():
+    D = random_matrix(20, seed=5)
+    stops = list(range(1, 20))
+    priority_map = {node: 1 + node % 3 for node in stops}
+    tour, _ = priority_based_tour(0, stops, D, priority_map, tiers=True)
+    levels = [priority_map[node] for node in tour[1:-1]]
+    assert levels == sorted(levels, reverse=True)
+    assert sorted(tour[1:-1]) == stops
+
+
+def test_custom_score_is_used():
+    D = random_matrix(10, seed=6)
+    stops = list(range(1, 10))
+    # Farthest remaining stop first
+    tour, _ = priority_based_tour(0, stops, D, {node: 1 for node in stops},
+                                  score=lambda priority, distance, mask: distance)
+    assert tour[1] == int(np.argmax(D[0, 1:])) + 1
+
+
+def route_length(run, D):
+    return tour_cost([0] + run + [0], D)
+
+
+@pytest.mark.parametrize("vehicles, capacity", [(1, None), (3, None), (3, 7), (6, 4)])
+def test_split_keeps_the_tour_order_and_capacity(vehicles, capacity):
+    D = random_matrix(21, seed=8)
+    giant = greedy_edge_order(D)
+    runs = split_giant_tour(giant, D, vehicles, capacity)
+    assert len(runs) <= vehicles
+    assert [stop for run in runs for stop in run] == giant[1:-1]
+    assert all(len(run) <= (capacity or 20) for run in runs)
+
+
+def test_split_respects_the_distance_limit():
+    D = random_matrix(21, seed=9)
+    giant = greedy_edge_order(D)
+    single = max(route_length([stop], D) for stop in giant[1:-1])
+    runs = split_giant_tour(giant, D, 20, max_distance=single * 1.5)
+    assert all(route_length(run, D) <= single * 1.5 + 1e-3 for run in runs)
+
+
+def test_split_balances_the_longest_route():
+    D = random_matrix(21, seed=10)
+    giant = greedy_edge_order(D)
+    one = split_giant_tour(giant, D, 1)
+    three = split_giant_tour(giant, D, 3)
+    assert max(route_length(run, D) for run in three) < route_length(one[0], D)
+
+
+def test_split_raises_when_the_fleet_cannot_cover_the_stops():
+    D = random_matrix(11, seed=11)
+    giant = greedy_edge_order(D)
+    with pytest.raises(ValueError):
+        split_giant_tour(giant, D, 2, capacity=4)
+    with pytest.raises(ValueError):
+        split_giant_tour(giant, D, 10, max_distance=1.0)
+    with pytest.raises(ValueError):
+        split_giant_tour(giant, D, 3, capacity=0)
+    assert split_giant_tour([0, 0], D[:1, :1], 3) == []
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_plan_fleet_serves_every_stop_once(workers):
+    D = random_matrix(25, seed=12)
+    stops = list(range(1, 25))
+    plan = plan_fleet(0, stops, D, 3, capacity=10, algorithm="greedy", workers=workers)
+    assert 1 <= len(plan) <= 3
+    served = [node for tour, _ in plan for node in tour[1:-1]]
+    assert sorted(served) == stops
+    for tour, cost in plan:
+        assert tour[0] == tour[-1] == 0 and len(tour) - 2 <= 10
+        assert cost == pytest.approx(tour_cost(tour, D), rel=1e-6)
+
+
+def test_import_loads_nothing(tmp_path):
+    # An empty working directory: any data read at import time would fail
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import sys, tour_planner; print(sorted({'networkx', 'matplotlib'} & set(sys.modules)))"
+    done = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True,
+                          env={**os.environ, "PYTHONPATH": root}, timeout=60)
+    assert done.returncode == 0, done.stderr
+    assert done.stdout == "[]\n"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_session_loads_on_first_use(tmp_path):
+    session = PlannerSession(str(tmp_path / "missing.graphml"), str(tmp_path / "missing.json"))
+    with pytest.raises(FileNotFoundError):
+        session.data
+    copy = pickle.loads(pickle.dumps(session))
+    assert (copy.graphml, copy.deliveries, copy._graph) == (session.graphml, session.deliveries, None)
+
+
+def test_session_plans_from_the_artifact(planner_session, grid):
+    stops = planner_session.delivery_list("delivery_nodes_20")
+    assert planner_session.hq_node == 1 and planner_session.index is None
+    tour, cost, initial_cost = planner_session.plan(stops, algorithm="mst")
+    D = compute_distance_matrix(grid, [1] + stops, workers=1)
+    assert (tour, cost, initial_cost) == solve(1, stops, D, "mst")
+    _, seconds, _ = planner_session.plan(stops, algorithm="mst", time_weight=1.0)
+    assert seconds < cost  # driving seconds, not meters
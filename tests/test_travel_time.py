@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from graph_artifact import RoadGraph
+from travel_time import (parse_maxspeed, edge_speed_kph, travel_seconds, objective_matrix, objective_units,
+                         DEFAULT_SPEED_KPH, HIGHWAY_SPEEDS_KPH, REFERENCE_SPEED_KPH)
+
+
+@pytest.mark.parametrize("value, kph", [
+    ("50", 50.0),
+    ("30 mph", 30 * 1.609344),
+    ("60 km/h", 60.0),
+    ("40;60", 50.0),
+    ("['30', '50']", 40.0),
+    ("signals", None),
+    ("0", None),
+    (None, None),
+])
+def test_parse_maxspeed(value, kph):
+    assert parse_maxspeed(value) == (pytest.approx(kph) if kph is not None else None)
+
+
+def test_edge_speed_falls_back_to_the_highway_class():
+    assert edge_speed_kph("primary", "70") == 70.0
+    assert edge_speed_kph("primary", "none") == HIGHWAY_SPEEDS_KPH["primary"]
+    assert edge_speed_kph("['residential', 'tertiary']") == HIGHWAY_SPEEDS_KPH["residential"]
+    assert edge_speed_kph("bus_stop") == edge_speed_kph(None) == DEFAULT_SPEED_KPH
+
+
+def test_travel_seconds():
+    assert travel_seconds(1000.0, maxspeed="36") == pytest.approx(100.0)
+    assert travel_seconds(0.0, "motorway") == 0.0
+
+
+def test_objective_matrix_mixes_distance_and_time():
+    D = np.array([[0, 1000], [1000, 0]], dtype=np.float32)
+    T = np.array([[0, 60], [60, 0]], dtype=np.float32)
+    assert objective_matrix(D, T, 0) is D and objective_matrix(D, None, 0.5) is D
+    assert objective_matrix(D, T, 1) is T
+    mixed = objective_matrix(D, T, 0.25)
+    assert mixed.dtype == np.float32
+    assert mixed[0, 1] == pytest.approx(0.75 * 1000 + 0.25 * 60 * REFERENCE_SPEED_KPH / 3.6)
+
+
+def test_objective_units():
+    assert objective_units(0) == ("distance", "km", 1000.0)
+    assert objective_units(1) == ("driving time", "min", 60.0)
+    assert objective_units(0.5)[0] == "cost"
+
+
+def test_graphml_edges_get_times_from_their_tags():
+    nx = pytest.importorskip("networkx")
+    graph = nx.Graph()
+    graph.add_node("1", x=67.0, y=24.8)
+    graph.add_node("2", x=67.001, y=24.8)
+    graph.add_node("3", x=67.002, y=24.8)
+    graph.add_edge("1", "2", d10="100.0", d7="primary", d12="", d13="Main Road")
+    graph.add_edge("2", "3", d10="200.0", d7="residential", d12="40", d13="")
+    road = RoadGraph.from_networkx(graph)
+    seconds = {(road.edge_source(k), int(road.neighbors[k])): float(road.times[k]) for k in range(road.num_edges)}
+    assert seconds[(0, 1)] == seconds[(1, 0)] == pytest.approx(travel_seconds(100.0, "primary"))
+    assert seconds[(1, 2)] == pytest.approx(200.0 * 3.6 / 40.0)
@@ -1,112 +1,238 @@
-import networkx as nx
 import json
+import argparse
 import random
-import itertools
-import matplotlib.pyplot as plt
-
-# Load Graph
-G = nx.read_graphml("karachi_graph.graphml")
-
-# Load delivery node info
-with open("delivery_nodes.json", "r") as f:
-    data = json.load(f)
-
-# Convert all node IDs to strings to match GraphML format
-hq_node = str(data["hq_node"])  # Convert HQ node to string
-selected = list(map(str, data["delivery_nodes_200"]))  # Convert delivery nodes to strings
-
-# ----------------------------------------------
-# Pre-processing Block (safe and debug-friendly)
-# ----------------------------------------------
-
-# Peek into one edge's data to understand available attributes
-edges_sample = list(G.edges(data=True))[:5]
-if edges_sample:
-    print("Sample edge attributes:", list(edges_sample[0][2].keys()))
-else:
-    print("Graph has no edges! Please check the GraphML file.")
-    exit()
-
-# Determine which attribute to use for edge weight
-# Try 'd10', else fall back to 'length', else raise error
-sample_edge_attrs = edges_sample[0][2]
-if 'd10' in sample_edge_attrs:
-    weight_attr = 'd10'
-elif 'length' in sample_edge_attrs:
-    weight_attr = 'length'
-else:
-    raise ValueError("No usable weight attribute ('d10' or 'length') found in graph edges.")
-
-# Remove edges that don't have the selected attribute
-edges_to_remove = [(u, v) for u, v, d in G.edges(data=True) if weight_attr not in d]
-print(f"Removing {len(edges_to_remove)} edges without '{weight_attr}'...")
-G.remove_edges_from(edges_to_remove)
-
-# Assign the length attribute for routing, convert to km if needed
-for u, v, edge_data in G.edges(data=True):
-    raw_value = float(edge_data[weight_attr])
-    edge_data['length'] = raw_value / 1000 if raw_value > 1000 else raw_value  # auto scale meters to km
-
-# Print edge length statistics
-lengths = [d['length'] for _, _, d in G.edges(data=True)]
-if lengths:
-    print(f"Edge length stats — min: {min(lengths)}, max: {max(lengths)}, avg: {sum(lengths)/len(lengths):.2f}")
-else:
-    print("No valid edges remain after filtering. Please check the graph data.")
-    exit()
-
-
-# 2. Compute Distance Matrix
-def compute_distance_matrix(G, nodes):
-    """Compute all-pairs Dijkstra distances for given nodes."""
-    D = {}
-    for u in nodes:
-        try:
-            # Use networkx's dijkstra_path_length to get distances
-            lengths = nx.single_source_dijkstra_path_length(G, u, weight='length')
-            for v in nodes:
-                # Only add if the node is reachable
-                if v in lengths:
-                    D[(u, v)] = lengths[v]
-                else:
-                    # If no path exists, use a very large number instead of infinity
-                    D[(u, v)] = 1e9
-        except nx.NetworkXNoPath:
-            for v in nodes:
-                D[(u, v)] = 1e9
-    return D
+import os
+import sys
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from graph_artifact import load_road_graph
+from distance_matrix import compute_distance_matrix, tour_cost
+from matrix_cache import MatrixRowCache
+from local_search import improve_tour, candidate_neighbors
+from exact_solver import solve_exact, held_karp_memory, DEFAULT_MEMORY_LIMIT
+from contraction_hierarchy import load_hierarchy
+from sparse_distances import SparseDistances, DEFAULT_K
+from route_export import export_tour
+from anytime_solver import solve_anytime
+from travel_time import objective_matrix, objective_units
+from cluster_solver import (DEFAULT_CLUSTER_SIZE, hilbert_clusters, kmeans_clusters, cluster_order,
+                            open_cycle, repair_boundaries)
+import instrumentation
+
+# Importing this module loads nothing: the road graph, delivery data and hierarchy
+# index live in a PlannerSession and are read on first use, so worker processes and
+# other tools can import the solver functions for free.
+
+# 1. Planning Session
+class PlannerSession:
+    """Road graph, delivery data and contraction hierarchy, each loaded on first use.
+
+    The graph is memory-mapped from its artifact (karachi_graph.csr, re-parsed from
+    the GraphML only if missing or stale), so every process mapping it shares the
+    same pages. A session pickles as its file names; a worker that receives one
+    maps the files again on first use instead of copying the arrays.
+    """
+
+    def __init__(self, graphml="karachi_graph.graphml", deliveries="delivery_nodes.json", use_index=True):
+        self.graphml = graphml
+        self.deliveries = deliveries
+        self.use_index = use_index
+        self._graph = None
+        self._data = None
+        self._index = None
+        self._index_loaded = False
+
+    def __reduce__(self):
+        return (PlannerSession, (self.graphml, self.deliveries, self.use_index))
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = load_road_graph(self.graphml)
+        return self._graph
+
+    @property
+    def data(self):
+        if self._data is None:
+            with open(self.deliveries, "r") as f:
+                self._data = json.load(f)
+        return self._data
+
+    @property
+    def hq_node(self):
+        # Node IDs are the integer GraphML IDs stored in the graph artifact
+        return int(self.data["hq_node"])
+
+    def delivery_list(self, key="delivery_nodes_200"):
+        """Node IDs of a delivery list in delivery_nodes.json."""
+        return list(map(int, self.data[key]))
+
+    @property
+    def index(self):
+        """The saved contraction hierarchy for this graph, or None (missing, stale or disabled)."""
+        if not self._index_loaded:
+            self._index = load_hierarchy(self.graph) if self.use_index else None
+            self._index_loaded = True
+        return self._index
+
+    def distance_matrix(self, nodes, cache=None, workers=None, travel_time=False):
+        """Dense road-distance matrix between node IDs, or (D, T) with travel_time (see compute_distance_matrix)."""
+        return compute_distance_matrix(self.graph, nodes, workers=workers, cache=cache, index=self.index,
+                                       travel_time=travel_time)
+
+    def plan(self, delivery_nodes, algorithm="greedy", priority_map=None, hq=None, optimize=True, time_weight=0.0):
+        """
+        Build and optionally improve one tour from HQ. Returns (tour, cost, cost before
+        local search), with costs in meters, or the objective_matrix mix for time_weight > 0.
+        """
+        hq = self.hq_node if hq is None else hq
+        if time_weight > 0:
+            D, T = self.distance_matrix([hq] + list(delivery_nodes), travel_time=True)
+            D = objective_matrix(D, T, time_weight)
+        else:
+            D = self.distance_matrix([hq] + list(delivery_nodes))
+        return solve(hq, list(delivery_nodes), D, algorithm, priority_map, optimize)
+
+
+# 2. Distance Matrix: compute_distance_matrix (distance_matrix.py) returns a dense
+#    float32 array; D[i, j] is the distance between positions i and j of [hq] + delivery_nodes.
+#    The same searches can return the travel-time matrix T; every solver below
+#    minimizes whatever matrix it is given, so objective_matrix(D, T, w) plans by
+#    distance, driving time or a mix of the two.
+def tour_distance_time(hq, delivery_nodes, tour, D, T):
+    """Meters and seconds driven along a tour of node IDs, from the distance and time matrices."""
+    position = {node: i for i, node in enumerate([hq] + delivery_nodes)}
+    order = [position[node] for node in tour]
+    return tour_cost(order, D), tour_cost(order, T)
+
 
 # 3. Random Tour
 def random_tour(hq, delivery_nodes, D):
     """Return a tour starting/ending at HQ in random order."""
-    tour = random.sample(delivery_nodes, len(delivery_nodes))
-    full_tour = [hq] + tour + [hq]
-    
-    # Handle potential missing connections
-    try:
-        cost = sum(D.get((full_tour[i], full_tour[i+1]), 1e9) for i in range(len(full_tour) - 1))
-        return full_tour, cost
-    except KeyError:
-        return full_tour, float('inf')
+    nodes = [hq] + delivery_nodes
+    order = [0] + random.sample(range(1, len(nodes)), len(delivery_nodes)) + [0]
+    return [nodes[i] for i in order], tour_cost(order, D)
 
 # 4. Equal-Priority Tour via MST
+def prim_mst(D):
+    """
+    Dense O(n^2) Prim's algorithm on the distance matrix, rooted at position 0.
+    Uses the upper-triangle distances for both directions. Returns the parent
+    array (parent[0] == -1) and the symmetric weights it used.
+    """
+    n = len(D)
+    W = np.triu(np.asarray(D, dtype=np.float64), 1)
+    W = W + W.T
+    parent = np.zeros(n, dtype=np.int64)
+    parent[0] = -1
+    in_tree = np.zeros(n, dtype=bool)
+    in_tree[0] = True
+    best = W[0].copy()
+    best[0] = np.inf
+    for _ in range(n - 1):
+        v = int(np.argmin(best))
+        in_tree[v] = True
+        best[v] = np.inf
+        closer = ~in_tree & (W[v] < best)
+        best[closer] = W[v, closer]
+        parent[closer] = v
+    return parent, W
+
+
+def mst_preorder(parent, W):
+    """
+    Preorder walk of the tree from position 0. Children are visited shortest
+    edge first (ties by position), the order networkx's dfs_preorder_nodes took
+    over its Kruskal tree. With distinct distances the tour is the one the old
+    networkx version built; with tied distances Prim may pick a different (equally
+    short) tree, and so a different tour.
+    """
+    n = len(parent)
+    children = [[] for _ in range(n)]
+    for v in range(1, n):
+        children[parent[v]].append(v)
+    for p, kids in enumerate(children):
+        kids.sort(key=lambda c: (W[p, c], min(p, c), max(p, c)))
+
+    order = []
+    stack = [0]
+    while stack:
+        v = stack.pop()
+        order.append(v)
+        stack.extend(reversed(children[v]))
+    return order
+
+
+def sparse_spanning_tree(D):
+    """
+    Kruskal's algorithm over the candidate pairs of a SparseDistances. Components
+    the candidate graph leaves apart are joined through their members' nearest
+    outside stops (straight line, road distance computed on demand), widening the
+    search until one tree remains. Returns the parent array rooted at position 0.
+    """
+    n = len(D)
+    group = list(range(n))  # union-find over positions
+    tree = [[] for _ in range(n)]
+    components = n
+
+    def find(a):
+        while group[a] != a:
+            group[a] = group[group[a]]
+            a = group[a]
+        return a
+
+    def scan(us, vs):
+        nonlocal components
+        for i in np.argsort(D[us, vs], kind="stable").tolist():
+            u, v = int(us[i]), int(vs[i])
+            ru, rv = find(u), find(v)
+            if ru != rv:
+                group[ru] = rv
+                tree[u].append(v)
+                tree[v].append(u)
+                components -= 1
+
+    scan(*D.candidate_pairs())
+    k = max(D.k, 1)
+    while components > 1:
+        roots = [find(i) for i in range(n)]
+        largest = max(set(roots), key=roots.count)
+        us, vs = [], []
+        for u in range(n):
+            if roots[u] != largest:
+                for v in D.grid.nearest(u, min(k, n - 1)):
+                    if roots[v] != roots[u]:
+                        us.append(u)
+                        vs.append(v)
+        scan(np.array(us, dtype=np.int64), np.array(vs, dtype=np.int64))
+        k *= 2
+
+    # Orient the tree from position 0
+    parent = np.full(n, -1, dtype=np.int64)
+    seen = [False] * n
+    seen[0] = True
+    stack = [0]
+    while stack:
+        u = stack.pop()
+        for v in tree[u]:
+            if not seen[v]:
+                seen[v] = True
+                parent[v] = u
+                stack.append(v)
+    return parent
+
+
 def mst_tour(hq, delivery_nodes, D):
     """Return approximate tour using MST + preorder traversal."""
     nodes = [hq] + delivery_nodes
-    G_complete = nx.Graph()
-    
-    for u, v in itertools.combinations(nodes, 2):
-        G_complete.add_edge(u, v, weight=D.get((u, v), 1e9))
+    if isinstance(D, SparseDistances):
+        order = mst_preorder(sparse_spanning_tree(D), D) + [0]
+        return [nodes[i] for i in order], tour_cost(order, D)
+    parent, W = prim_mst(D)
+    order = mst_preorder(parent, W)
+    order.append(0)  # return to HQ
 
-    try:
-        mst = nx.minimum_spanning_tree(G_complete)
-        tour = list(nx.dfs_preorder_nodes(mst, source=hq))
-        tour.append(hq)  # return to HQ
-
-        cost = sum(D.get((tour[i], tour[i+1]), 1e9) for i in range(len(tour) - 1))
-        return tour, cost
-    except nx.NetworkXError:
-        return [hq], float('inf')
+    return [nodes[i] for i in order], tour_cost(order, D)
 
 # 5. greedy_priority_tour
 def get_user_priorities(nodes):
@@ -127,95 +253,642 @@ def get_user_priorities(nodes):
     return priorities
 
 # Modified Priority-Based Tour with enhanced priority weighting
-def priority_based_tour(hq, delivery_nodes, D, priority_map):
-    """Tour that balances both priority and distance using a weighted score."""
-    unvisited = delivery_nodes.copy()
-    tour = [hq]
-    current = hq
-    
-    while unvisited:
-        # Calculate scores: 70% weight to priority, 30% to inverse distance
-        scores = {
-            node: (0.7 * priority_map[node]) + (0.3 * (1/D.get((current, node), 1e9)))
-            for node in unvisited
-        }
-        
-        next_node = max(unvisited, key=lambda x: scores[x])
-        tour.append(next_node)
-        unvisited.remove(next_node)
-        current = next_node
-    
-    tour.append(hq)  # Return to HQ
-    total_cost = sum(D.get((tour[i], tour[i+1]), 1e9) for i in range(len(tour)-1))
-    return tour, total_cost
+def weighted_score(priority_weight=0.7):
+    """
+    Scoring function for priority_based_tour: priority_weight * priority plus
+    (1 - priority_weight) * closeness. Priorities arrive scaled to [0, 1] and
+    closeness is 1 - distance / (largest candidate distance), so the weight
+    really splits the decision between the two.
+    """
+    distance_weight = 1.0 - priority_weight
+
+    def score(priority, distance, mask):
+        farthest = (distance + mask).max()
+        if farthest <= 0:
+            return priority_weight * priority
+        # priority_weight * priority + distance_weight * (1 - distance / farthest), minus the constant
+        return priority_weight * priority - distance * np.float32(distance_weight / farthest)
+    return score
 
 
-def dijkstra_tsp_tour(hq, delivery_nodes, G):
+def priority_based_tour(hq, delivery_nodes, D, priority_map, score=None, tiers=False):
+    """
+    Tour that balances both priority and distance using a weighted score.
+    Each step takes one argmax over the current row of D. score(priority,
+    distance, mask) returns one value per position, where mask is 0 for
+    candidates and -inf for excluded stops (default weighted_score()).
+    With tiers=True priority classes are strict: every stop of a higher
+    priority is visited before any lower one. Needs a dense D, since every
+    step scores all remaining stops.
+    """
+    if isinstance(D, SparseDistances):
+        raise ValueError("the priority tour scores every remaining stop and needs a dense distance matrix")
+    if score is None:
+        score = weighted_score()
+    nodes = [hq] + delivery_nodes
+    n = len(nodes)
+    priority = np.array([0] + [priority_map[node] for node in delivery_nodes], dtype=np.float32)
+    scaled = priority / priority.max() if n > 1 and priority.max() > 0 else priority
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+
+    # Remaining stops per priority class, for the strict tier mode
+    levels = sorted(set(priority[1:].tolist()), reverse=True)
+    remaining = {level: int((priority[1:] == level).sum()) for level in levels}
+
+    mask = np.zeros(n, dtype=np.float32)
+    mask[0] = -np.inf
+    tier = None
+    order = [0]
+    current = 0
+    for _ in range(n - 1):
+        if tiers:
+            while not remaining[levels[0]]:
+                levels.pop(0)
+            if levels[0] != tier:
+                tier = levels[0]
+                mask = np.where(~visited & (priority == tier), 0, -np.inf).astype(np.float32)
+        current = int(np.argmax(score(scaled, D[current], mask) + mask))
+        visited[current] = True
+        mask[current] = -np.inf
+        remaining[float(priority[current])] -= 1
+        order.append(current)
+
+    order.append(0)  # Return to HQ
+    return [nodes[i] for i in order], tour_cost(order, D)
+
+
+def greedy_edge_order(D, k=16):
+    """
+    Greedy-edge TSP construction on a dense distance matrix. Edges are taken
+    shortest-first as long as no node gets degree 3 and no early cycle forms.
+    Only each node's k nearest neighbours are scanned first; any fragments left
+    are joined by scanning edges between their endpoints. Returns a closed
+    order of positions starting and ending at 0.
+
+    With a SparseDistances the candidates are its known pairs, and fragments are
+    joined through each endpoint's nearest other endpoints by straight line,
+    widening until a single path remains.
     """
-    Solves the TSP using Dijkstra distances between nodes, ensuring each location
-    and edge is visited only once. Returns an approximate tour.
+    n = len(D)
+    if n <= 3:
+        return list(range(n)) + [0]
+
+    degree = [0] * n
+    parent = list(range(n))
+    adj = [[] for _ in range(n)]
+    edges = 0
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    def scan(us, vs):
+        nonlocal edges
+        order = np.argsort(D[us, vs], kind="stable")
+        for u, v in zip(us[order].tolist(), vs[order].tolist()):
+            if degree[u] == 2 or degree[v] == 2:
+                continue
+            ru, rv = find(u), find(v)
+            if ru == rv:
+                continue
+            parent[ru] = rv
+            degree[u] += 1
+            degree[v] += 1
+            adj[u].append(v)
+            adj[v].append(u)
+            edges += 1
+            if edges == n - 1:
+                return
+
+    if isinstance(D, SparseDistances):
+        scan(*D.candidate_pairs())
+        width = 4
+        while edges < n - 1:
+            ends = [i for i in range(n) if degree[i] < 2]
+            scan(*D.nearest_among(ends, width))
+            width *= 2
+    else:
+        # Candidate edges: each node to its k nearest neighbours, each pair once
+        k = min(k, n - 1)
+        masked = D + np.diag(np.full(n, np.inf, dtype=D.dtype))
+        near = np.argpartition(masked, k - 1, axis=1)[:, :k]
+        us = np.repeat(np.arange(n), k)
+        vs = near.ravel()
+        keep = us < vs
+        pairs = np.unique(np.concatenate([np.stack([us[keep], vs[keep]], axis=1),
+                                          np.stack([vs[~keep], us[~keep]], axis=1)]), axis=0)
+        scan(pairs[:, 0], pairs[:, 1])
+
+        # Join the remaining fragments through their endpoints
+        if edges < n - 1:
+            ends = np.array([i for i in range(n) if degree[i] < 2])
+            eu, ev = np.triu_indices(len(ends), k=1)
+            scan(ends[eu], ends[ev])
+
+    # Walk the Hamiltonian path from one end, close it, and rotate to start at 0
+    start = next(i for i in range(n) if degree[i] < 2)
+    path = [start]
+    prev, current = -1, start
+    while len(path) < n:
+        nxt = adj[current][0] if adj[current][0] != prev else adj[current][1]
+        prev, current = current, nxt
+        path.append(current)
+    i = path.index(0)
+    return path[i:] + path[:i] + [0]
+
+
+def dijkstra_tsp_tour(hq, delivery_nodes, G, D=None, index=None):
     """
-    import networkx as nx
-    from networkx.algorithms.approximation import traveling_salesman_problem, greedy_tsp
+    Solves the TSP on Dijkstra road distances with a greedy-edge construction.
+    Reuses the distance matrix when given, otherwise builds it with one
+    one-to-many search per node (or from the contraction hierarchy index).
+    Returns an approximate tour.
+    """
+    nodes = [hq] + delivery_nodes
+    if D is None:
+        D = compute_distance_matrix(G, nodes, index=index)
 
-    # Create complete graph with shortest path distances as edge weights
-    all_nodes = [hq] + delivery_nodes
-    complete_graph = nx.Graph()
+    order = greedy_edge_order(D)
+    return [nodes[i] for i in order], tour_cost(order, D)
+
+
+# 6. Local Search Improvement
+def optimize_tour(hq, delivery_nodes, tour, D):
+    """Improve any tour from the builders above with 2-opt and Or-opt moves."""
+    nodes = [hq] + delivery_nodes
+    index = {node: i for i, node in enumerate(nodes)}
+    order = improve_tour([index[node] for node in tour], D)
+    return [nodes[i] for i in order], tour_cost(order, D)
 
-    for u, v in itertools.combinations(all_nodes, 2):
-        try:
-            dist = nx.dijkstra_path_length(G, u, v, weight='length')
-        except nx.NetworkXNoPath:
-            dist = 1e9
-        complete_graph.add_edge(u, v, weight=dist)
 
-    # Approximate TSP using greedy heuristic
-    tsp_tour = traveling_salesman_problem(complete_graph, cycle=True, method=greedy_tsp)
+# 7. Exact Tour (Held-Karp, or branch-and-bound when the DP would not fit in memory)
+def exact_tour(hq, delivery_nodes, D, memory_limit=DEFAULT_MEMORY_LIMIT, time_limit=60.0):
+    """Return (tour, cost, proven_optimal, method) from the exact solver."""
+    nodes = [hq] + delivery_nodes
+    order, cost, optimal, method = solve_exact(D, memory_limit=memory_limit, time_limit=time_limit)
+    return [nodes[i] for i in order], cost, optimal, method
 
-    # Calculate total cost based on complete_graph weights
-    total_cost = sum(complete_graph[tsp_tour[i]][tsp_tour[i + 1]]['weight'] for i in range(len(tsp_tour) - 1))
 
-    return tsp_tour, total_cost
+# 8. Multi-Vehicle Planning
+TOUR_BUILDERS = {
+    "random": lambda hq, stops, D, priority_map: random_tour(hq, stops, D),
+    "mst": lambda hq, stops, D, priority_map: mst_tour(hq, stops, D),
+    "greedy": lambda hq, stops, D, priority_map: dijkstra_tsp_tour(hq, stops, None, D),
+    "priority": lambda hq, stops, D, priority_map: priority_based_tour(hq, stops, D, priority_map),
+}
 
 
-if __name__ == "__main__":
+def solve(hq, delivery_nodes, D, algorithm="greedy", priority_map=None, optimize=True):
+    """
+    Build a tour with one of TOUR_BUILDERS over D (covering [hq] + delivery_nodes) and
+    improve it with local search unless optimize is False; priority tours keep their
+    order. priority_map defaults to equal priorities. Returns (tour, cost, cost
+    before local search, or None if it was not run).
+    """
+    if algorithm not in TOUR_BUILDERS:
+        raise ValueError(f"unknown algorithm {algorithm!r}")
+    if priority_map is None:
+        priority_map = {node: 1 for node in delivery_nodes}
+        priority_map[hq] = 0
+    tour, cost = TOUR_BUILDERS[algorithm](hq, delivery_nodes, D, priority_map)
+    if not optimize or algorithm == "priority":
+        return tour, cost, None
+    opt_tour, opt_cost = optimize_tour(hq, delivery_nodes, tour, D)
+    return opt_tour, opt_cost, cost
+
+
+def split_giant_tour(order, D, vehicles, capacity=None, max_distance=None):
+    """
+    Cut a giant tour (closed order of positions from 0) into at most `vehicles`
+    consecutive runs of stops, each served as HQ -> run -> HQ. Binary search on
+    the longest route finds the smallest limit the greedy cut can meet while
+    respecting the per-vehicle stop capacity (None for no limit) and distance limit.
+    Returns a list of runs (lists of positions).
+    """
+    if capacity is not None and capacity < 1:
+        raise ValueError(f"vehicle capacity must be at least 1 stop, got {capacity}")
+    stops = order[1:-1]
+    if not stops:
+        return []
+    W = np.asarray(D, dtype=np.float64)
+    legs = np.concatenate([[0.0], np.cumsum(W[stops[:-1], stops[1:]])])
+    out = W[0, stops]
+    back = W[stops, 0]
+    if capacity is None:
+        capacity = len(stops)
+
+    def route(i, j):  # HQ -> stops[i..j] -> HQ
+        return out[i] + legs[j] - legs[i] + back[j]
+
+    def cut(limit):
+        runs, i = [], 0
+        while i < len(stops):
+            if route(i, i) > limit:
+                return None
+            j = i
+            while j + 1 < len(stops) and j + 1 - i < capacity and route(i, j + 1) <= limit:
+                j += 1
+            runs.append(stops[i:j + 1])
+            i = j + 1
+        return runs
+
+    hi = route(0, len(stops) - 1)
+    if max_distance is not None:
+        hi = min(hi, max_distance)
+    best = cut(hi)
+    if best is None or len(best) > vehicles:
+        raise ValueError(f"{vehicles} vehicles cannot cover {len(stops)} stops within the given stop and distance limits")
+    lo = max(route(i, i) for i in range(len(stops)))
+    for _ in range(50):
+        if hi - lo <= 1.0:  # meter precision is plenty
+            break
+        mid = (lo + hi) / 2
+        runs = cut(mid)
+        if runs is not None and len(runs) <= vehicles:
+            hi, best = mid, runs
+        else:
+            lo = mid
+    return best
+
+
+def solve_vehicle(hq, stops, D, algorithm, priority_map):
+    """
+    Build one vehicle's tour with the chosen heuristic and improve it with local
+    search. D covers [hq] + stops. The stops arrive in giant-tour order, which is
+    kept if it is still the shorter route (so a distance limit met by the split
+    stays met). Priority tours keep their visiting order.
+    """
+    tour, cost = TOUR_BUILDERS[algorithm](hq, stops, D, priority_map)
+    if algorithm == "priority":
+        return tour, cost
+    tour, cost = optimize_tour(hq, stops, tour, D)
+    run_tour, run_cost = optimize_tour(hq, stops, [hq] + stops + [hq], D)
+    return (tour, cost) if cost <= run_cost else (run_tour, run_cost)
+
+
+def plan_fleet(hq, delivery_nodes, D, vehicles, capacity=None, max_distance=None,
+               algorithm="mst", priority_map=None, workers=None):
+    """
+    Multi-vehicle plan: partition the deliveries by cutting a locally optimized
+    giant tour into balanced runs, then solve each vehicle's tour in a process
+    pool. Returns a list of (tour, cost) per vehicle (vehicles with no stops
+    are left out).
+    """
+    giant = improve_tour(greedy_edge_order(D), D)
+    runs = split_giant_tour(giant, D, vehicles, capacity, max_distance)
+
+    jobs = []
+    for run in runs:
+        index = [0] + run
+        jobs.append((hq, [delivery_nodes[i - 1] for i in run], D[np.ix_(index, index)],
+                     algorithm, priority_map))
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return [solve_vehicle(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(solve_vehicle, *zip(*jobs)))
+
+
+# 9. Cluster-First Planning for tens of thousands of stops (see cluster_solver.py)
+CLUSTER_METHODS = {"hilbert": hilbert_clusters, "kmeans": kmeans_clusters}
+
+# Per-process state set up by _init_cluster_worker
+_cluster_worker = {}
+
+
+def _init_cluster_worker(session):
+    _cluster_worker["session"] = session
 
+
+def solve_cluster(session, nodes, k=DEFAULT_K):
+    """
+    Greedy-edge tour and local search over one cluster's own matrix. Returns the
+    closed order of positions into nodes, the length of each of its edges, and
+    each position's k nearest other positions with their road distances.
+    """
+    D = session.distance_matrix(nodes, workers=1)
+    order = improve_tour(greedy_edge_order(D), D)
+    near = candidate_neighbors(D, k)
+    dists = [D[a, row].tolist() for a, row in enumerate(near)]
+    return order, D[order[:-1], order[1:]].tolist(), near, dists
+
+
+def _solve_cluster_worker(nodes):
+    return solve_cluster(_cluster_worker["session"], nodes)
+
+
+def plan_clustered(session, hq, delivery_nodes, method="hilbert", cluster_size=DEFAULT_CLUSTER_SIZE,
+                   workers=None):
+    """
+    One tour over a very large delivery set without a full matrix: partition the
+    stops with CLUSTER_METHODS[method] on the graph coordinates, solve the clusters
+    in a process pool (each worker maps the session's files once), chain the
+    cluster tours along a tour of their centres and repair the junctions.
+    Returns (tour, cost, cost before the repair, number of clusters, D), where D is
+    the SparseDistances holding every road distance used; it also expands the
+    tour's legs for export_tour.
+    """
+    if method not in CLUSTER_METHODS:
+        raise ValueError(f"unknown cluster method {method!r}")
+    nodes = [hq] + delivery_nodes
+    D = SparseDistances(session.graph, nodes, k=0, index=session.index)
+    px, py = D.grid.px, D.grid.py
+    with instrumentation.phase("clusters: partition"):
+        clusters = [(c + 1).tolist() for c in CLUSTER_METHODS[method](px[1:], py[1:], cluster_size)]
+
+    jobs = [[nodes[i] for i in members] for members in clusters]
+    with instrumentation.phase("clusters: solve"):
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        if workers <= 1:
+            solved = [solve_cluster(session, job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_cluster_worker,
+                                     initargs=(session,)) as pool:
+                solved = list(pool.map(_solve_cluster_worker, jobs))
+
+    # Every distance a cluster solve saw near its stops becomes a known pair of D
+    for members, (cycle, edges, near, dists) in zip(clusters, solved):
+        D.add_pairs([members[a] for a, row in enumerate(near) for _ in row],
+                    [members[b] for row in near for b in row],
+                    [d for row in dists for d in row])
+        D.add_pairs([members[a] for a in cycle[:-1]], [members[b] for b in cycle[1:]], edges)
+
+    with instrumentation.phase("clusters: stitch"):
+        centres = [(float(np.mean(px[members])), float(np.mean(py[members]))) for members in clusters]
+        sequence = cluster_order(px, py, clusters, (px[0], py[0]))
+        order, junctions = [0], []
+        for i, c in enumerate(sequence):
+            members = np.asarray(clusters[c])
+            cycle, edges = solved[c][0], solved[c][1]
+            after = centres[sequence[i + 1]] if i + 1 < len(sequence) else (px[0], py[0])
+            path = open_cycle(cycle, edges, px[members], py[members], (px[order[-1]], py[order[-1]]), after)
+            junctions.append(len(order))
+            order.extend(members[path].tolist())
+        junctions.append(len(order))
+        order.append(0)
+        stitched = tour_cost(order, D)
+    with instrumentation.phase("clusters: boundary repair"):
+        order = repair_boundaries(order, D, junctions)
+    return [nodes[i] for i in order], tour_cost(order, D), stitched, len(clusters), D
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plan delivery tours from HQ over the Karachi road graph.")
+    parser.add_argument("--deliveries", default="delivery_nodes_200",
+                        help="key of the delivery list in delivery_nodes.json (default: delivery_nodes_200)")
+    parser.add_argument("--exact", action="store_true",
+                        help="also solve exactly and report each heuristic's gap to the optimum")
+    parser.add_argument("--memory-limit", type=float, default=DEFAULT_MEMORY_LIMIT / 1024 ** 3,
+                        help="GB the exact solver may use before switching to branch-and-bound (default: 2)")
+    parser.add_argument("--time-limit", type=float, default=60.0,
+                        help="seconds allowed for branch-and-bound before returning its best tour (default: 60)")
+    parser.add_argument("--priority-weight", type=float, default=0.7,
+                        help="share of the priority tour score given to priority vs. closeness (default: 0.7)")
+    parser.add_argument("--priority-tiers", action="store_true",
+                        help="visit every stop of a higher priority before any lower one")
+    parser.add_argument("--vehicles", type=int, default=1,
+                        help="plan routes for this many vehicles from HQ (default: 1)")
+    parser.add_argument("--capacity", type=int, default=None,
+                        help="maximum stops per vehicle")
+    parser.add_argument("--max-distance", type=float, default=None,
+                        help="maximum route length per vehicle in km (in minutes with --time-weight 1)")
+    parser.add_argument("--vehicle-algorithm", choices=sorted(TOUR_BUILDERS), default="mst",
+                        help="heuristic used for each vehicle's tour (default: mst)")
+    parser.add_argument("--time-weight", type=float, default=0.0, metavar="W",
+                        help="plan by distance (0, default), driving time (1) or a mix in between; "
+                             "both matrices come from the same searches")
+    parser.add_argument("--no-index", action="store_true",
+                        help="ignore the contraction hierarchy index and run plain Dijkstra searches")
+    parser.add_argument("--sparse", type=int, nargs="?", const=DEFAULT_K, default=None, metavar="K",
+                        help="for very large delivery sets: road distances only to each stop's K nearest "
+                             f"stops, other pairs computed on demand (default K: {DEFAULT_K})")
+    parser.add_argument("--clusters", type=int, nargs="?", const=DEFAULT_CLUSTER_SIZE, default=None, metavar="SIZE",
+                        help="for tens of thousands of stops: solve geographic clusters of about SIZE stops in "
+                             f"parallel and stitch their tours into one (default SIZE: {DEFAULT_CLUSTER_SIZE})")
+    parser.add_argument("--cluster-method", choices=sorted(CLUSTER_METHODS), default="hilbert",
+                        help="how --clusters partitions the stops: Hilbert curve runs or k-means (default: hilbert)")
+    parser.add_argument("--anytime", type=float, default=None, metavar="SECONDS",
+                        help="keep improving the best tour with seeded parallel iterated local search "
+                             "until this many seconds have passed (Ctrl+C stops early)")
+    parser.add_argument("--seed", type=int, default=0, help="first seed of the --anytime runs (default: 0)")
+    parser.add_argument("--trace", default="anytime_trace.json",
+                        help="where --anytime writes each run's convergence trace (default: anytime_trace.json)")
+    parser.add_argument("--export", default=None, metavar="FILE",
+                        help="write the shortest tour found, expanded to street level, as GeoJSON "
+                             "(.geojson/.json) or CSV (.csv)")
+    parser.add_argument("--profile", nargs="?", const="profile_report.json", default=None,
+                        help="time each phase, count search work and write a report (default: profile_report.json)")
+    args = parser.parse_args(argv)
+    if args.clusters is not None and args.sparse is not None:
+        parser.error("--clusters and --sparse are alternatives; use one")
+    if args.profile:
+        instrumentation.enable()
+
+    session = PlannerSession(use_index=not args.no_index)
+    G = session.graph
+    hq_node = session.hq_node
+    selected = session.delivery_list(args.deliveries)
+
+    # Print edge length statistics (lengths are stored in meters)
+    if G.num_edges:
+        print(f"Edge length stats — min: {G.lengths.min()}, max: {G.lengths.max()}, avg: {G.lengths.mean():.2f}")
+    else:
+        print("No valid edges remain after filtering. Please check the graph data.")
+        sys.exit(1)
     
     # Verify that all nodes are in the graph
-    print("Graph nodes:", list(G.nodes())[:10], "...")  # Show first 10 nodes to verify format
+    print("Graph nodes:", G.node_ids[:10].tolist(), "...")  # Show first 10 nodes to verify format
     'print("Selected nodes:", [hq_node] + selected)'
     
-    # Compute the distance matrix
-    D = compute_distance_matrix(G, [hq_node] + selected)
-
-    # Create priority map (ensure keys are strings)
+    if args.clusters is not None:
+        # Whole-instance heuristics and the full matrix are what cluster mode avoids
+        print(f"\n--- Cluster-First Tour ({args.cluster_method}, about {args.clusters} stops per cluster) ---")
+        with instrumentation.phase("tour: clustered"):
+            ctour, ccost, stitched, num_clusters, D = plan_clustered(session, hq_node, selected,
+                                                                     args.cluster_method, args.clusters)
+        print("Tour:", ctour)
+        print("Total distance (km):", round(ccost / 1000, 2))
+        print(f"{num_clusters} cluster tours stitched into {round(stitched / 1000, 2)} km before boundary repair; "
+              f"{D.num_pairs} road distances used")
+        if args.export:
+            position = {node: i for i, node in enumerate([hq_node] + selected)}
+            with instrumentation.phase("export"):
+                length = export_tour(args.export, G, [hq_node] + selected, [position[node] for node in ctour], D)
+            print(f"\nExported the {round(ccost / 1000, 2)} km tour street by street to {args.export} "
+                  f"({round(length / 1000, 2)} km of road)")
+        skipped = [flag for flag, used in (("--time-weight", args.time_weight > 0),
+                                           ("--anytime", args.anytime is not None),
+                                           ("--exact", args.exact), ("--vehicles", args.vehicles > 1)) if used]
+        if skipped:
+            print(f"\nCluster mode plans one tour by distance; {', '.join(skipped)} not applied")
+        if args.profile:
+            instrumentation.write_report(args.profile)
+        return
+
+    # Compute the distance matrix from the contraction hierarchy when data-prep.py built one,
+    # otherwise by Dijkstra, reusing rows cached on disk by earlier runs
+    index = session.index
+    if args.sparse is not None:
+        with instrumentation.phase("sparse distances"):
+            D = SparseDistances(G, [hq_node] + selected, args.sparse, index=index)
+        print(f"Sparse distances: {D.num_pairs} road distances to the {D.k} nearest stops of each")
+        if args.time_weight > 0:
+            print("--time-weight needs the full matrices; sparse mode plans by distance")
+            args.time_weight = 0.0
+        paths = D  # searches each exported leg on demand
+        T = None
+    elif args.export:
+        # Keep each search's predecessor edges so the export needs no new searches
+        cache = MatrixRowCache(G)
+        with instrumentation.phase("distance matrix"):
+            D, T, paths = compute_distance_matrix(G, [hq_node] + selected, cache=cache, predecessors=True,
+                                                  travel_time=True)
+        print(f"Distance and time matrices and shortest-path trees from {len(selected) + 1} searches")
+    else:
+        # Times come free with the hierarchy query; without it, cached rows hold only
+        # distances, so they are searched again only when time is being planned for
+        travel_time = index is not None or args.time_weight > 0
+        cache = MatrixRowCache(G)
+        with instrumentation.phase("distance matrix"):
+            D = compute_distance_matrix(G, [hq_node] + selected, cache=cache, index=index, travel_time=travel_time)
+        D, T = D if travel_time else (D, None)
+        if index is not None:
+            print(f"Distance and time matrices from contraction hierarchy {os.path.basename(index.path)}")
+        elif travel_time:
+            print(f"Distance and time rows: {len(selected) + 1} computed (cached rows hold no times)")
+        else:
+            print(f"Distance rows: {cache.hits} read from cache, {cache.misses} computed")
+    D_length = D
+    D = objective_matrix(D_length, T, args.time_weight)
+    label, unit, scale = objective_units(args.time_weight)
+    if args.time_weight > 0:
+        print(f"Planning by {label} (time weight {args.time_weight:g})")
+
+    # Create priority map (keys are node IDs)
     priority_map = {node: random.randint(1, 10) for node in selected}
     priority_map[hq_node] = 0  # HQ has no priority
 
     print("\n--- Random Tour ---")
-    rtour, rcost = random_tour(hq_node, selected, D)
+    with instrumentation.phase("tour: random"):
+        rtour, rcost = random_tour(hq_node, selected, D)
     print("Tour:", rtour)
-    print("Total distance (km):", round(rcost / 1000, 2))
+    print(f"Total {label} ({unit}):", round(rcost / scale, 2))
+    with instrumentation.phase("local search"):
+        rtour_opt, rcost_opt = optimize_tour(hq_node, selected, rtour, D)
+    print(f"After 2-opt/Or-opt ({unit}):", round(rcost_opt / scale, 2))
 
     print("\n--- MST Tour ---")
-    mtour, mcost = mst_tour(hq_node, selected, D)
+    with instrumentation.phase("tour: mst"):
+        mtour, mcost = mst_tour(hq_node, selected, D)
     print("Tour:", mtour)
-    print("Total distance (km):", round(mcost / 1000, 2))
+    print(f"Total {label} ({unit}):", round(mcost / scale, 2))
+    with instrumentation.phase("local search"):
+        mtour_opt, mcost_opt = optimize_tour(hq_node, selected, mtour, D)
+    print(f"After 2-opt/Or-opt ({unit}):", round(mcost_opt / scale, 2))
 
     print("\n--- Minimum Distance Tour (Dijkstra Chaining) ---")
-    dtour, dcost = dijkstra_tsp_tour(hq_node, selected, G)
+    with instrumentation.phase("tour: greedy edge"):
+        dtour, dcost = dijkstra_tsp_tour(hq_node, selected, G, D)
     print("Tour:", dtour)
-    print("Total distance (km):", round(dcost / 1000, 2))
+    print(f"Total {label} ({unit}):", round(dcost / scale, 2))
+    with instrumentation.phase("local search"):
+        dtour_opt, dcost_opt = optimize_tour(hq_node, selected, dtour, D)
+    print(f"After 2-opt/Or-opt ({unit}):", round(dcost_opt / scale, 2))
+
+    nodes = [hq_node] + selected
+    position = {node: i for i, node in enumerate(nodes)}
+    best_tour, best_cost = min((rtour_opt, rcost_opt), (mtour_opt, mcost_opt), (dtour_opt, dcost_opt),
+                               key=lambda item: item[1])
+
+    if args.anytime is not None and isinstance(D, SparseDistances):
+        print("\n--anytime needs the full distance matrix; skipped in sparse mode")
+    elif args.anytime is not None:
+        print(f"\n--- Anytime Search ({args.anytime:g} s) ---")
+        with instrumentation.phase("tour: anytime"):
+            order, acost, runs = solve_anytime(
+                D, [position[node] for node in best_tour], args.anytime, seed=args.seed,
+                on_improve=lambda cost, _, seconds: print(f"  {seconds:7.1f} s  {round(cost / scale, 2)} {unit}"))
+        print("Tour:", [nodes[i] for i in order])
+        print(f"Total {label} ({unit}): {round(acost / scale, 2)} "
+              f"({100 * (1 - acost / best_cost):.1f}% shorter than the best heuristic tour)")
+        print(f"{len(runs)} run(s), {sum(run['iterations'] for run in runs)} kicks")
+        with open(args.trace, "w") as f:
+            json.dump({"time_limit_s": args.anytime, "best_cost": acost, "runs": runs}, f, indent=2)
+        print(f"Convergence traces written to {args.trace}")
+        if acost < best_cost:
+            best_tour, best_cost = [nodes[i] for i in order], acost
+
+    if T is not None:
+        meters, seconds = tour_distance_time(hq_node, selected, best_tour, D_length, T)
+        print(f"\nBest tour: {round(meters / 1000, 2)} km, {round(seconds / 60, 1)} min of driving")
+
+    if args.export:
+        with instrumentation.phase("export"):
+            length = export_tour(args.export, G, nodes, [position[node] for node in best_tour], paths)
+        print(f"\nExported the {round(best_cost / scale, 2)} {unit} tour street by street to {args.export} "
+              f"({round(length / 1000, 2)} km of road)")
+
+    if isinstance(D, SparseDistances):
+        # The exact solver, fleet planning and priority tour all read full rows of D
+        print(f"\nSparse mode: {D.num_pairs} pairs known in the end; "
+              "exact, multi-vehicle and priority tours need the full matrix and were skipped")
+        if args.profile:
+            instrumentation.write_report(args.profile)
+        return
+
+    if args.exact:
+        print("\n--- Exact Tour ---")
+        memory_limit = args.memory_limit * 1024 ** 3
+        print(f"Held-Karp memory estimate: {held_karp_memory(len(selected) + 1) / 1024 ** 2:.1f} MB "
+              f"(limit {memory_limit / 1024 ** 2:.0f} MB)")
+        with instrumentation.phase("tour: exact"):
+            etour, ecost, optimal, method = exact_tour(hq_node, selected, D, memory_limit, args.time_limit)
+        print("Tour:", etour)
+        print(f"Total {label} ({unit}): {round(ecost / scale, 2)} via {method}"
+              + ("" if optimal else " (time limit hit, best found, not proven optimal)"))
+        for name, cost, cost_opt in (("Random", rcost, rcost_opt), ("MST", mcost, mcost_opt),
+                                     ("Minimum Distance", dcost, dcost_opt)):
+            print(f"{name} gap: {100 * (cost / ecost - 1):.1f}% "
+                  f"(after 2-opt/Or-opt: {100 * (cost_opt / ecost - 1):.1f}%)")
+
+    if args.vehicles > 1:
+        print(f"\n--- Multi-Vehicle Plan ({args.vehicles} vehicles, {args.vehicle_algorithm}) ---")
+        max_distance = args.max_distance * scale if args.max_distance is not None else None
+        try:
+            with instrumentation.phase("fleet plan"):
+                routes = plan_fleet(hq_node, selected, D, args.vehicles, args.capacity, max_distance,
+                                    args.vehicle_algorithm, priority_map)
+        except ValueError as e:
+            print("Cannot plan fleet:", e)
+            routes = []
+        for v, (vtour, vcost) in enumerate(routes, start=1):
+            print(f"Vehicle {v}: {len(vtour) - 2} stops, {round(vcost / scale, 2)} {unit}")
+            print("  Tour:", vtour)
+        if routes:
+            print(f"Makespan ({unit}):", round(max(cost for _, cost in routes) / scale, 2))
+            print(f"Total {label} ({unit}):", round(sum(cost for _, cost in routes) / scale, 2))
 
     # Get meaningful priorities from user instead of random
     priority_map = get_user_priorities(selected)
     priority_map[hq_node] = 0  # HQ has no priority
 
     print("\n--- Priority-Based Tour (User Defined) ---")
-    ptour, pcost = priority_based_tour(hq_node, selected, D, priority_map)
+    with instrumentation.phase("tour: priority"):
+        ptour, pcost = priority_based_tour(hq_node, selected, D, priority_map,
+                                           score=weighted_score(args.priority_weight), tiers=args.priority_tiers)
     print("Tour:", ptour, "\n")
-    print("Total distance (km):", round(pcost / 1000, 2), "\n")
+    print(f"Total {label} ({unit}):", round(pcost / scale, 2))
+    with instrumentation.phase("local search"):
+        _, pcost_opt = optimize_tour(hq_node, selected, ptour, D)
+    print(f"After 2-opt/Or-opt ({unit}, ignores priority order):", round(pcost_opt / scale, 2), "\n")
     print("Priority sequence:", [priority_map[node] for node in ptour[1:-1]])
+
+    if args.profile:
+        instrumentation.write_report(args.profile)
     
     '''
     # Print the first 50 nodes and their attributes
@@ -232,9 +905,14 @@ if __name__ == "__main__":
 
     '''   
     # Visualize the graph (Optional)
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(100, 100))
     pos = nx.spring_layout(G)  # You can use other layouts like `circular_layout`, `kamada_kawai_layout`, etc.
     nx.draw(G, pos, node_size=100, node_color='blue', with_labels=True, font_size=16, font_color='black', edge_color='gray')
     plt.title("Graph Visualization of Karachi Delivery Area")
     plt.show()
-    '''
\ No newline at end of file
+    '''
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import re
+
+# Free-flow driving speeds for the road graph's travel-time weights. An edge uses
+# its OSM maxspeed when one can be read, otherwise the default speed of its
+# highway class (urban Karachi values, well under the posted limits).
+
+MPH_TO_KPH = 1.609344
+
+HIGHWAY_SPEEDS_KPH = {
+    "motorway": 80.0, "motorway_link": 50.0,
+    "trunk": 60.0, "trunk_link": 40.0,
+    "primary": 45.0, "primary_link": 35.0,
+    "secondary": 40.0, "secondary_link": 30.0,
+    "tertiary": 35.0, "tertiary_link": 30.0,
+    "unclassified": 30.0, "road": 30.0,
+    "residential": 25.0, "service": 15.0, "living_street": 10.0,
+}
+DEFAULT_SPEED_KPH = 30.0
+
+# Time and distance are mixed by pricing a second of driving at this speed
+REFERENCE_SPEED_KPH = 30.0
+
+_SPEED = re.compile(r"^(\d+(?:\.\d+)?)\s*(mph|km/h|kmh|kph)?$")
+
+
+def _values(value):
+    """Split an attribute that may hold several values ("a;b", or a list written by OSMnx)."""
+    return [part.strip().strip("'\"") for part in re.split(r"[;,|]", str(value).strip("[]"))]
+
+
+def parse_maxspeed(value):
+    """Speed limit in km/h from an OSM maxspeed value (mean of several), or None if unreadable."""
+    if value is None:
+        return None
+    speeds = []
+    for part in _values(value):
+        match = _SPEED.match(part.lower())
+        if match:
+            speed = float(match.group(1)) * (MPH_TO_KPH if match.group(2) == "mph" else 1.0)
+            if speed > 0:
+                speeds.append(speed)
+    return sum(speeds) / len(speeds) if speeds else None
+
+
+def edge_speed_kph(highway, maxspeed=None):
+    """Driving speed for an edge: its maxspeed, else its (first) highway class default."""
+    speed = parse_maxspeed(maxspeed)
+    if speed is not None:
+        return speed
+    classes = _values(highway) if highway is not None else []
+    return HIGHWAY_SPEEDS_KPH.get(classes[0] if classes else "", DEFAULT_SPEED_KPH)
+
+
+def travel_seconds(length_m, highway=None, maxspeed=None):
+    """Seconds to drive length_m meters along an edge with these tags."""
+    return length_m * 3.6 / edge_speed_kph(highway, maxspeed)
+
+
+def objective_matrix(D, T, time_weight):
+    """
+    Cost matrix for the solvers: distances (time_weight 0), travel times (1), or
+    (1 - w) * meters + w * seconds priced at REFERENCE_SPEED_KPH in between.
+    """
+    if T is None or time_weight <= 0:
+        return D
+    if time_weight >= 1:
+        return T
+    return ((1 - time_weight) * D + time_weight * (REFERENCE_SPEED_KPH / 3.6) * T).astype(D.dtype)
+
+
+def objective_units(time_weight):
+    """(label, unit, divisor) for printing costs of objective_matrix(D, T, time_weight)."""
+    if time_weight <= 0:
+        return "distance", "km", 1000.0
+    if time_weight >= 1:
+        return "driving time", "min", 60.0
+    return "cost", "km-equivalent", 1000.0